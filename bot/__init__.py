@@ -42,22 +42,65 @@ try:
     MAX_FILE_SIZE = Config.MAX_FILE_SIZE
     TG_MAX_FILE_SIZE = Config.TG_MAX_FILE_SIZE
     FREE_USER_MAX_FILE_SIZE = Config.FREE_USER_MAX_FILE_SIZE
+    MAX_VIDEO_DURATION = Config.MAX_VIDEO_DURATION
+    MAX_VIDEO_RESOLUTION = Config.MAX_VIDEO_RESOLUTION
+    ADMISSION_HEAD_MB = Config.ADMISSION_HEAD_MB
     MAX_MESSAGE_LENGTH = Config.MAX_MESSAGE_LENGTH
     FINISHED_PROGRESS_STR = Config.FINISHED_PROGRESS_STR
     UN_FINISHED_PROGRESS_STR = Config.UN_FINISHED_PROGRESS_STR
+    EDIT_RATE_PER_CHAT = Config.EDIT_RATE_PER_CHAT
+    EDIT_RATE_GLOBAL = Config.EDIT_RATE_GLOBAL
     SHOULD_USE_BUTTONS = Config.SHOULD_USE_BUTTONS
     BOT_START_TIME = time.time()
     BOT_USERNAME = Config.BOT_USERNAME
     UPDATES_CHANNEL = Config.UPDATES_CHANNEL
+    CACHE_DIRECTORY = Config.CACHE_DIRECTORY
+    PROBE_CACHE_ENTRIES = Config.PROBE_CACHE_ENTRIES
+    ENABLE_RESULT_REUSE = Config.ENABLE_RESULT_REUSE
+    FINGERPRINT_MAX_DISTANCE = Config.FINGERPRINT_MAX_DISTANCE
+    FINGERPRINT_CACHE_ENTRIES = Config.FINGERPRINT_CACHE_ENTRIES
     MAX_CONCURRENT_PROCESSES = Config.MAX_CONCURRENT_PROCESSES
     ENABLE_QUEUE = Config.ENABLE_QUEUE
+    QUEUE_SIZE = Config.QUEUE_SIZE
     ALLOWED_FILE_TYPES = Config.ALLOWED_FILE_TYPES
     COMPRESSION_PRESETS = Config.COMPRESSION_PRESETS
+    DEFAULT_COMPRESSION = Config.DEFAULT_COMPRESSION
+    AUTO_SAMPLE_COUNT = Config.AUTO_SAMPLE_COUNT
+    AUTO_SAMPLE_SECONDS = Config.AUTO_SAMPLE_SECONDS
+    AUTO_SAMPLE_BUDGET = Config.AUTO_SAMPLE_BUDGET
+    AUTO_CRF_MIN = Config.AUTO_CRF_MIN
+    AUTO_CRF_MAX = Config.AUTO_CRF_MAX
+    ENABLE_AUTO_DOWNSCALE = Config.ENABLE_AUTO_DOWNSCALE
+    DOWNSCALE_MIN_BPP = Config.DOWNSCALE_MIN_BPP
+    DOWNSCALE_MIN_HEIGHT = Config.DOWNSCALE_MIN_HEIGHT
+    DOWNSCALE_MAX_FPS = Config.DOWNSCALE_MAX_FPS
+    ENABLE_AUTOTUNE = Config.ENABLE_AUTOTUNE
+    AUTOTUNE_SECONDS = Config.AUTOTUNE_SECONDS
+    AUTOTUNE_PSNR_FLOOR = Config.AUTOTUNE_PSNR_FLOOR
+    ENABLE_STREAM_ENCODE = Config.ENABLE_STREAM_ENCODE
+    ENABLE_STREAM_UPLOAD = Config.ENABLE_STREAM_UPLOAD
+    AUDIO_CODEC = Config.AUDIO_CODEC
+    AUDIO_MIN_BITRATE = Config.AUDIO_MIN_BITRATE
+    AUDIO_MAX_BITRATE = Config.AUDIO_MAX_BITRATE
+    IMAGE_MAX_DIMENSION = Config.IMAGE_MAX_DIMENSION
+    IMAGE_FORMAT = Config.IMAGE_FORMAT
+    IMAGE_QUALITY = Config.IMAGE_QUALITY
+    IMAGE_WORKERS = Config.IMAGE_WORKERS
+    ENABLE_PREVIEW = Config.ENABLE_PREVIEW
+    PREVIEW_SECONDS = Config.PREVIEW_SECONDS
+    PREVIEW_HEIGHT = Config.PREVIEW_HEIGHT
+    PREVIEW_MIN_DURATION = Config.PREVIEW_MIN_DURATION
+    ENABLE_CHECKPOINT_ENCODE = Config.ENABLE_CHECKPOINT_ENCODE
+    CHECKPOINT_CHUNK_SECONDS = Config.CHECKPOINT_CHUNK_SECONDS
+    CHECKPOINT_MIN_DURATION = Config.CHECKPOINT_MIN_DURATION
+    ENABLE_SIZE_MODEL = Config.ENABLE_SIZE_MODEL
 except Exception as e:
     print(f"Configuration Error: {e}")
     print("Please check your environment variables and config.py file")
     sys.exit(1)
 
+os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+
 # Initialize log file (truncate if exists)
 if os.path.exists(LOG_FILE_ZZGEVC):
     with open(LOG_FILE_ZZGEVC, "r+"):
@@ -20,7 +20,8 @@ from bot import (
     BOT_USERNAME,
     SESSION_NAME,
     DATABASE_URL,
-    MAX_CONCURRENT_PROCESSES
+    MAX_CONCURRENT_PROCESSES,
+    ENABLE_AUTOTUNE
 )
 
 # Import all handlers
@@ -35,7 +36,8 @@ from bot.plugins.admin import (
     ban,
     unban,
     _banned_usrs,
-    get_logs
+    get_logs,
+    autotune
 )
 
 from bot.plugins.broadcast import (
@@ -51,13 +53,27 @@ from bot.plugins.new_join_fn import (
     help_message_f
 )
 
+from bot.plugins.media_tools_fn import (
+    trim_message_f,
+    merge_message_f,
+    audio_message_f,
+    screens_message_f
+)
+
 from bot.plugins.call_back_button_handler import button
+from bot.helper_funcs.image import shutdown_image_pool
+from bot.helper_funcs.autotune import run_autotune, is_tuned
+from bot.helper_funcs.ffmpeg import check_ffmpeg_availability
+
+# Seconds between checks for a running job before the startup benchmark begins
+AUTOTUNE_IDLE_POLL = 30
 
 class EnhancedVideoCompressBot:
     def __init__(self):
         self.app = None
         self.running_processes = 0
         self.shutdown = False
+        self.autotune_task = None
         
     async def initialize_bot(self):
         """Initialize the bot and all its components"""
@@ -65,6 +81,14 @@ class EnhancedVideoCompressBot:
             # Create download directory if not exists
             if not os.path.isdir(DOWNLOAD_LOCATION):
                 os.makedirs(DOWNLOAD_LOCATION)
+            
+            # A status.json left by a crashed run would block every /compress, and resume with it
+            self.clear_stale_status()
+            
+            # Probed once per ffmpeg binary; jobs read the cached snapshot
+            if not await check_ffmpeg_availability():
+                LOGGER.error("FFmpeg is required to run the bot")
+                return False
                 
             # Initialize Pyrogram client
             self.app = Client(
@@ -87,6 +111,25 @@ class EnhancedVideoCompressBot:
             LOGGER.error(f"Failed to initialize bot: {e}")
             return False
     
+    def clear_stale_status(self):
+        """Remove the busy lock of a previous run; no job of this process exists yet"""
+        status = os.path.join(DOWNLOAD_LOCATION, "status.json")
+        if not os.path.exists(status):
+            return
+        try:
+            # Checkpoint chunks stay on disk, so the next /compress of the same file resumes
+            os.remove(status)
+            LOGGER.warning("Removed status.json left over from a previous run")
+        except OSError as e:
+            LOGGER.error(f"Could not remove stale status.json: {e}")
+    
+    async def autotune_when_idle(self):
+        """Benchmark once no job holds status.json, as /autotune does, so neither skews the other"""
+        status = os.path.join(DOWNLOAD_LOCATION, "status.json")
+        while os.path.exists(status):
+            await asyncio.sleep(AUTOTUNE_IDLE_POLL)
+        await run_autotune()
+    
     async def register_handlers(self):
         """Register all message and callback handlers"""
         
@@ -121,6 +164,11 @@ class EnhancedVideoCompressBot:
             filters=filters.command(["logs"]) & filters.user(AUTH_USERS)
         ))
         
+        self.app.add_handler(MessageHandler(
+            autotune,
+            filters=filters.command(["autotune"]) & filters.user(AUTH_USERS)
+        ))
+        
         # Public Commands
         self.app.add_handler(MessageHandler(
             incoming_start_message_f,
@@ -137,6 +185,27 @@ class EnhancedVideoCompressBot:
             filters=filters.command(["help", f"help@{BOT_USERNAME}"])
         ))
         
+        # Media Tools
+        self.app.add_handler(MessageHandler(
+            trim_message_f,
+            filters=filters.command(["trim", f"trim@{BOT_USERNAME}"])
+        ))
+        
+        self.app.add_handler(MessageHandler(
+            merge_message_f,
+            filters=filters.command(["merge", f"merge@{BOT_USERNAME}"])
+        ))
+        
+        self.app.add_handler(MessageHandler(
+            audio_message_f,
+            filters=filters.command(["audio", f"audio@{BOT_USERNAME}"])
+        ))
+        
+        self.app.add_handler(MessageHandler(
+            screens_message_f,
+            filters=filters.command(["screens", f"screens@{BOT_USERNAME}"])
+        ))
+        
         # Control Commands
         self.app.add_handler(MessageHandler(
             incoming_cancel_message_f,
@@ -167,6 +236,10 @@ async def main():
             await bot.app.start()
             LOGGER.info("Enhanced VideoCompress Bot v2.0 started successfully!")
             
+            # Benchmark once per host; later starts reuse the saved profile
+            if ENABLE_AUTOTUNE and not is_tuned():
+                bot.autotune_task = asyncio.create_task(bot.autotune_when_idle())
+            
             # Send startup message to log channel
             try:
                 from bot import LOG_CHANNEL
@@ -186,6 +259,9 @@ async def main():
         except KeyboardInterrupt:
             LOGGER.info("Bot stopped by user")
         finally:
+            if bot.autotune_task and not bot.autotune_task.done():
+                bot.autotune_task.cancel()
+                await asyncio.gather(bot.autotune_task, return_exceptions=True)
             if bot.app.is_connected:
                 try:
                     from bot import LOG_CHANNEL
@@ -199,6 +275,7 @@ async def main():
                 except:
                     pass
                 await bot.app.stop()
+            shutdown_image_pool()
     else:
         LOGGER.error("Failed to initialize bot. Exiting...")
         sys.exit(1)
@@ -24,6 +24,13 @@ class Command:
     SETTINGS = get_config("COMMAND_SETTINGS", "settings")
     STATS = get_config("COMMAND_STATS", "stats")
     BACKUP = get_config("COMMAND_BACKUP", "backup")
+    AUTOTUNE = get_config("COMMAND_AUTOTUNE", "autotune")
+    
+    # Media Tools
+    TRIM = get_config("COMMAND_TRIM", "trim")
+    MERGE = get_config("COMMAND_MERGE", "merge")
+    AUDIO = get_config("COMMAND_AUDIO", "audio")
+    SCREENS = get_config("COMMAND_SCREENS", "screens")
     
     # Command aliases for better user experience
     ALIASES = {
@@ -43,18 +50,20 @@ class Command:
             cls.START, cls.COMPRESS, cls.CANCEL, cls.HELP,
             cls.STATUS, cls.EXEC, cls.LOGS, cls.BROADCAST,
             cls.BAN, cls.UNBAN, cls.QUEUE, cls.SETTINGS,
-            cls.STATS, cls.BACKUP
+            cls.STATS, cls.BACKUP, cls.TRIM, cls.MERGE, cls.AUDIO,
+            cls.SCREENS, cls.AUTOTUNE
         ]
     
     @classmethod
     def get_public_commands(cls) -> list:
         """Get public commands available to all users"""
-        return [cls.START, cls.COMPRESS, cls.HELP, cls.QUEUE, cls.SETTINGS]
+        return [cls.START, cls.COMPRESS, cls.HELP, cls.QUEUE, cls.SETTINGS, cls.TRIM, cls.MERGE, cls.AUDIO, cls.SCREENS]
     
     @classmethod
     def get_admin_commands(cls) -> list:
         """Get admin-only commands"""
         return [
             cls.STATUS, cls.EXEC, cls.LOGS, cls.BROADCAST,
-            cls.BAN, cls.UNBAN, cls.STATS, cls.BACKUP, cls.CANCEL
+            cls.BAN, cls.UNBAN, cls.STATS, cls.BACKUP, cls.CANCEL,
+            cls.AUTOTUNE
         ]
@@ -32,6 +32,11 @@ class Config(object):
     TG_MAX_FILE_SIZE = int(get_config("TG_MAX_FILE_SIZE", "2097152000"))  # 2GB
     FREE_USER_MAX_FILE_SIZE = int(get_config("FREE_USER_MAX_FILE_SIZE", "1073741824"))  # 1GB
     
+    # Admission (checked before downloading, from Telegram metadata or a partial head fetch)
+    MAX_VIDEO_DURATION = int(get_config("MAX_VIDEO_DURATION", "0"))  # seconds, 0 = no limit
+    MAX_VIDEO_RESOLUTION = int(get_config("MAX_VIDEO_RESOLUTION", "2160"))  # short side, 0 = no limit
+    ADMISSION_HEAD_MB = int(get_config("ADMISSION_HEAD_MB", "4"))
+    
     # Enhanced File Type Restrictions
     ALLOWED_FILE_TYPES = get_config(
         "ALLOWED_FILE_TYPES", 
@@ -42,6 +47,8 @@ class Config(object):
     MAX_MESSAGE_LENGTH = int(get_config("MAX_MESSAGE_LENGTH", "4096"))
     FINISHED_PROGRESS_STR = get_config("FINISHED_PROGRESS_STR", "▓")
     UN_FINISHED_PROGRESS_STR = get_config("UN_FINISHED_PROGRESS_STR", "░")
+    EDIT_RATE_PER_CHAT = int(get_config("EDIT_RATE_PER_CHAT", "20"))  # progress edits per minute per chat
+    EDIT_RATE_GLOBAL = int(get_config("EDIT_RATE_GLOBAL", "20"))  # progress edits per second, all chats
     
     # UI Configuration - FIXED
     SHOULD_USE_BUTTONS = str(get_config("SHOULD_USE_BUTTONS", "True")).lower() == "true"
@@ -49,6 +56,15 @@ class Config(object):
     # Logging Configuration
     LOG_FILE_ZZGEVC = get_config("LOG_FILE_ZZGEVC", "logs/bot.log")
     
+    # Persistent per-host data (encoder profile, caches); survives download cleanup
+    CACHE_DIRECTORY = get_config("CACHE_DIRECTORY", "cache")
+    PROBE_CACHE_ENTRIES = int(get_config("PROBE_CACHE_ENTRIES", "5000"))
+    
+    # Result Reuse (re-uploads of a clip get the earlier output; needs NumPy)
+    ENABLE_RESULT_REUSE = str(get_config("ENABLE_RESULT_REUSE", "True")).lower() == "true"
+    FINGERPRINT_MAX_DISTANCE = int(get_config("FINGERPRINT_MAX_DISTANCE", "6"))  # bits of 64 per frame
+    FINGERPRINT_CACHE_ENTRIES = int(get_config("FINGERPRINT_CACHE_ENTRIES", "20000"))
+    
     # Enhanced Features Configuration - FIXED
     MAX_CONCURRENT_PROCESSES = int(get_config("MAX_CONCURRENT_PROCESSES", "3"))
     ENABLE_QUEUE = str(get_config("ENABLE_QUEUE", "True")).lower() == "true"
@@ -59,6 +75,24 @@ class Config(object):
     MIN_COMPRESSION = int(get_config("MIN_COMPRESSION", "10"))
     MAX_COMPRESSION = int(get_config("MAX_COMPRESSION", "90"))
     
+    # Auto Mode Configuration (per-title CRF from sampled probe encodes)
+    AUTO_SAMPLE_COUNT = int(get_config("AUTO_SAMPLE_COUNT", "3"))
+    AUTO_SAMPLE_SECONDS = int(get_config("AUTO_SAMPLE_SECONDS", "4"))
+    AUTO_SAMPLE_BUDGET = int(get_config("AUTO_SAMPLE_BUDGET", "4"))  # % of source duration
+    AUTO_CRF_MIN = int(get_config("AUTO_CRF_MIN", "20"))
+    AUTO_CRF_MAX = int(get_config("AUTO_CRF_MAX", "32"))
+    
+    # Resolution / Frame-rate Ladder (downscale when bits-per-pixel runs low)
+    ENABLE_AUTO_DOWNSCALE = str(get_config("ENABLE_AUTO_DOWNSCALE", "True")).lower() == "true"
+    DOWNSCALE_MIN_BPP = float(get_config("DOWNSCALE_MIN_BPP", "0.06"))
+    DOWNSCALE_MIN_HEIGHT = int(get_config("DOWNSCALE_MIN_HEIGHT", "240"))
+    DOWNSCALE_MAX_FPS = int(get_config("DOWNSCALE_MAX_FPS", "30"))
+    
+    # Encoder Autotune (benchmark x264 presets/threads on this host)
+    ENABLE_AUTOTUNE = str(get_config("ENABLE_AUTOTUNE", "False")).lower() == "true"
+    AUTOTUNE_SECONDS = int(get_config("AUTOTUNE_SECONDS", "4"))
+    AUTOTUNE_PSNR_FLOOR = float(get_config("AUTOTUNE_PSNR_FLOOR", "37.0"))
+    
     # Quality Presets - FIXED
     COMPRESSION_PRESETS = {
         'high': {
@@ -93,6 +127,37 @@ class Config(object):
     SUPPORTED_OUTPUT_FORMATS = ['mp4', 'mkv', 'webm', 'avi']
     DEFAULT_OUTPUT_FORMAT = get_config("DEFAULT_OUTPUT_FORMAT", "mp4")
     
+    # Encode While Downloading (falls back to full download for non-streamable inputs)
+    ENABLE_STREAM_ENCODE = str(get_config("ENABLE_STREAM_ENCODE", "False")).lower() == "true"
+    
+    # Upload While Encoding (fragmented MP4 output pushed as Telegram upload parts)
+    ENABLE_STREAM_UPLOAD = str(get_config("ENABLE_STREAM_UPLOAD", "False")).lower() == "true"
+    
+    # Audio-only Compression
+    AUDIO_CODEC = get_config("AUDIO_CODEC", "opus").lower()  # opus or aac
+    AUDIO_MIN_BITRATE = int(get_config("AUDIO_MIN_BITRATE", "24"))  # kbps
+    AUDIO_MAX_BITRATE = int(get_config("AUDIO_MAX_BITRATE", "192"))  # kbps
+    
+    # Image Compression
+    IMAGE_MAX_DIMENSION = int(get_config("IMAGE_MAX_DIMENSION", "2560"))
+    IMAGE_FORMAT = get_config("IMAGE_FORMAT", "jpeg").lower()  # jpeg or webp
+    IMAGE_QUALITY = int(get_config("IMAGE_QUALITY", "80"))  # used for /compress auto
+    IMAGE_WORKERS = int(get_config("IMAGE_WORKERS", "0"))  # 0 = one per CPU
+    
+    # Preview (short low-res clip sent while the full encode runs)
+    ENABLE_PREVIEW = str(get_config("ENABLE_PREVIEW", "False")).lower() == "true"
+    PREVIEW_SECONDS = int(get_config("PREVIEW_SECONDS", "20"))
+    PREVIEW_HEIGHT = int(get_config("PREVIEW_HEIGHT", "360"))
+    PREVIEW_MIN_DURATION = int(get_config("PREVIEW_MIN_DURATION", "300"))
+    
+    # Checkpointed Encoding (long jobs survive restarts, only missing chunks are redone)
+    ENABLE_CHECKPOINT_ENCODE = str(get_config("ENABLE_CHECKPOINT_ENCODE", "False")).lower() == "true"
+    CHECKPOINT_CHUNK_SECONDS = int(get_config("CHECKPOINT_CHUNK_SECONDS", "300"))
+    CHECKPOINT_MIN_DURATION = int(get_config("CHECKPOINT_MIN_DURATION", "1200"))
+    
+    # Output Size Model (per-host correction of the requested bitrate, learnt from past jobs)
+    ENABLE_SIZE_MODEL = str(get_config("ENABLE_SIZE_MODEL", "True")).lower() == "true"
+    
     # Thumbnail Configuration - FIXED
     DEF_THUMB_NAIL_VID_S = get_config(
         "DEF_THUMB_NAIL_VID_S", 
@@ -1,4 +1,32 @@
 # 7. bot/database/__init__.py - Database package init
+# motor/pymongo load on first use, so importing the bot does not pay for them
 
-from .database import Database
-__all__ = ['Database']
+import logging
+
+LOGGER = logging.getLogger(__name__)
+
+_db = None
+_db_ready = False
+
+def get_db():
+    """Shared Database client, created on first use; None when not configured or unavailable"""
+    global _db, _db_ready
+    if not _db_ready:
+        _db_ready = True
+        try:
+            from bot import DATABASE_URL, SESSION_NAME
+            if DATABASE_URL:
+                from .database import Database
+                _db = Database(DATABASE_URL, SESSION_NAME)
+        except Exception as e:
+            LOGGER.error(f"Database initialization failed: {e}")
+            _db = None
+    return _db
+
+def __getattr__(name):
+    if name == 'Database':
+        from .database import Database
+        return Database
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+__all__ = ['Database', 'get_db']
@@ -53,4 +53,3 @@ def save_config_to_file(config: dict, file_path: str) -> bool:
     except Exception as e:
         print(f"Error saving config file {file_path}: {e}")
         return False
-print("Created configuration files")
@@ -0,0 +1,99 @@
+# bot/helper_funcs/admission.py - Accept or reject a video before downloading it
+
+import logging
+import os
+from typing import Optional
+
+import aiofiles
+from pyrogram import Client
+from pyrogram.types import Message
+
+from bot import (
+    DOWNLOAD_LOCATION,
+    TG_MAX_FILE_SIZE,
+    MAX_VIDEO_DURATION,
+    MAX_VIDEO_RESOLUTION,
+    ADMISSION_HEAD_MB
+)
+from bot.helper_funcs.capabilities import has_decoder
+from bot.helper_funcs.display_progress import TimeFormatter
+from bot.helper_funcs.probe import MediaProbe, MediaProbeError
+from bot.helper_funcs.stream_encode import MP4_EXTENSIONS, mp4_moov_first, container_from
+
+LOGGER = logging.getLogger(__name__)
+
+def check_metadata(video) -> Optional[str]:
+    """Reason to reject from what Telegram already knows about the file, or None"""
+    if video.file_size and video.file_size > TG_MAX_FILE_SIZE:
+        return f"File is larger than {TG_MAX_FILE_SIZE // (1024 * 1024)} MB"
+
+    mime_type = getattr(video, 'mime_type', None) or ''
+    if mime_type and not mime_type.startswith('video/'):
+        return f"Not a video ({mime_type})"
+
+    duration = getattr(video, 'duration', 0) or 0
+    if MAX_VIDEO_DURATION and duration > MAX_VIDEO_DURATION:
+        return f"Video is longer than {TimeFormatter(MAX_VIDEO_DURATION * 1000)}"
+
+    return _check_resolution(getattr(video, 'width', 0) or 0, getattr(video, 'height', 0) or 0)
+
+def _check_resolution(width: int, height: int) -> Optional[str]:
+    if MAX_VIDEO_RESOLUTION and width and height and min(width, height) > MAX_VIDEO_RESOLUTION:
+        return f"Resolution {width}x{height} is above the {MAX_VIDEO_RESOLUTION}p limit"
+    return None
+
+def needs_head_probe(video) -> bool:
+    """Telegram leaves these empty for videos sent as files or from some clients"""
+    return not (getattr(video, 'duration', 0) and getattr(video, 'width', 0) and getattr(video, 'height', 0))
+
+async def probe_head(client: Client, message: Message, video) -> Optional[str]:
+    """
+    Fetch the first ADMISSION_HEAD_MB of the file and probe its header.
+    Returns a reason to reject, or None when it looks processable or the
+    head alone cannot tell (an MP4 whose index sits at the end of the file).
+    """
+    head_file = os.path.join(DOWNLOAD_LOCATION, f"{message.chat.id}_{message.id}_head")
+    try:
+        head = b""
+        async with aiofiles.open(head_file, 'wb') as f:
+            # stream_media yields 1 MB chunks; `limit` counts chunks
+            async for chunk in client.stream_media(message, limit=ADMISSION_HEAD_MB):
+                if not head:
+                    head = chunk
+                await f.write(chunk)
+
+        if not head:
+            return "Could not read the file from Telegram"
+
+        container = container_from(getattr(video, 'file_name', None), getattr(video, 'mime_type', None))
+        if (head[4:8] == b'ftyp' or container in MP4_EXTENSIONS) and not mp4_moov_first(head):
+            LOGGER.info("Admission: MP4 index is at the end, head probe inconclusive")
+            return None
+
+        try:
+            probe = await MediaProbe.run(head_file)
+        except MediaProbeError as e:
+            return f"Unreadable video: {str(e).splitlines()[-1].replace(head_file + ': ', '')}"
+
+        if not probe.has_video:
+            return "No video stream found"
+        # A codec the installed ffmpeg cannot decode fails only after the full download
+        if not probe.video['codec'] or not has_decoder(probe.video['codec']):
+            return f"Unsupported video codec: {probe.video['codec'] or 'unknown'}"
+
+        return _check_resolution(probe.video['width'], probe.video['height'])
+
+    except Exception as e:
+        # Admission is an optimisation; a failed check must not block the job
+        LOGGER.warning(f"Admission head probe failed: {e}")
+        return None
+    finally:
+        if os.path.exists(head_file):
+            os.remove(head_file)
+
+async def admit(client: Client, message: Message, video) -> Optional[str]:
+    """Reason to reject `video` before any full download, or None to go ahead"""
+    reason = check_metadata(video)
+    if reason or not needs_head_probe(video):
+        return reason
+    return await probe_head(client, message, video)
@@ -0,0 +1,229 @@
+# bot/helper_funcs/autotune.py - Per-host x264 preset/thread benchmark
+
+import asyncio
+import logging
+import os
+import platform
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from bot import CACHE_DIRECTORY, AUTOTUNE_SECONDS, AUTOTUNE_PSNR_FLOOR
+from bot.get_cfg import load_config_from_file, save_config_to_file
+
+LOGGER = logging.getLogger(__name__)
+
+PROFILE_FILE = "encoder_profile.json"
+
+# Used until a benchmark has run on this host
+DEFAULT_PROFILE = {'preset': 'ultrafast', 'threads': 0}
+
+# Presets worth trying for a throughput-bound bot, fastest first
+AUTOTUNE_PRESETS = ('ultrafast', 'superfast', 'veryfast', 'faster', 'fast')
+
+# Moving test pattern plus temporal noise, so motion search and entropy coding do real work
+BENCH_SOURCE = "testsrc2=size=1280x720:rate=30,noise=alls=4:allf=t+u,format=yuv420p"
+BENCH_FPS = 30
+
+# The clip is pre-rendered as raw frames so decoding costs nothing in the timings
+RAW_INPUT = ["-f", "rawvideo", "-pix_fmt", "yuv420p", "-s", "1280x720", "-r", str(BENCH_FPS)]
+
+# Fixed bitrate, like the percentage mode, so slower presets show up as higher PSNR
+BENCH_BITRATE = "1000k"
+
+_profile = None
+_running = False
+
+def available_cpus() -> int:
+    """CPUs this process may actually use: affinity mask and cgroup v2 quota included"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except Exception:
+        pass
+
+    return cpus
+
+def thread_candidates() -> List[int]:
+    cpus = available_cpus()
+    return sorted({1, max(1, cpus // 2), cpus})
+
+def host_fingerprint() -> str:
+    """Changes when the machine, CPU budget or ffmpeg binary changes, forcing a re-tune"""
+    ffmpeg = shutil.which("ffmpeg") or "ffmpeg"
+    try:
+        mtime = int(os.path.getmtime(ffmpeg))
+    except OSError:
+        mtime = 0
+    return f"{platform.machine()}/{available_cpus()}cpu/{ffmpeg}@{mtime}"
+
+def profile_path() -> str:
+    return os.path.join(CACHE_DIRECTORY, PROFILE_FILE)
+
+def encoder_profile() -> Dict[str, Any]:
+    """The tuned profile for this host, or the defaults when none matches"""
+    global _profile
+    if _profile is None:
+        saved = load_config_from_file(profile_path())
+        _profile = saved if saved.get('fingerprint') == host_fingerprint() else dict(DEFAULT_PROFILE)
+    return _profile
+
+def encoder_args(preset: Optional[str] = None) -> List[str]:
+    """x264 speed arguments for the main encode; `preset` overrides the tuned one, keeping its threads"""
+    profile = encoder_profile()
+    args = ["-preset", preset or profile['preset']]
+    if profile.get('threads'):
+        args += ["-threads", str(profile['threads'])]
+    return args
+
+def is_tuned() -> bool:
+    return 'tuned_at' in encoder_profile()
+
+def is_running() -> bool:
+    return _running
+
+async def _run(command: List[str]) -> Optional[str]:
+    """Run a benchmark step; return its stderr, or None on failure"""
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        _, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        # Shutdown cancels the benchmark; its encoder must not outlive the bot
+        process.kill()
+        raise
+    return stderr.decode(errors='ignore') if process.returncode == 0 else None
+
+async def _bench(reference: str, work_dir: str, preset: str, threads: int, frames: int) -> Optional[Dict[str, Any]]:
+    output = os.path.join(work_dir, f"{preset}_{threads}.mp4")
+
+    started = time.monotonic()
+    if await _run([
+        "ffmpeg", "-hide_banner", "-y", *RAW_INPUT, "-i", reference,
+        "-c:v", "libx264", "-preset", preset, "-threads", str(threads),
+        "-b:v", BENCH_BITRATE, "-maxrate", BENCH_BITRATE, "-bufsize", BENCH_BITRATE,
+        output
+    ]) is None:
+        return None
+    elapsed = time.monotonic() - started
+
+    stderr = await _run([
+        "ffmpeg", "-hide_banner", "-i", output, *RAW_INPUT, "-i", reference,
+        "-lavfi", "psnr", "-f", "null", "-"
+    ])
+    match = re.search(r"average:([\d.]+|inf)", stderr or "")
+    if not match:
+        return None
+
+    result = {
+        'preset': preset,
+        'threads': threads,
+        'fps': round(frames / elapsed, 1),
+        'bytes': os.path.getsize(output),
+        'psnr': float(match.group(1)) if match.group(1) != "inf" else 99.0
+    }
+    os.remove(output)
+    return result
+
+async def run_autotune() -> Optional[Dict[str, Any]]:
+    """
+    Encode a short synthetic clip with every preset/thread combination,
+    keep the fastest one whose PSNR clears AUTOTUNE_PSNR_FLOOR and persist
+    it as this host's profile. Candidates run one at a time so they do not
+    skew each other's timings.
+    """
+    global _profile, _running
+    if _running:
+        return None
+
+    _running = True
+    work_dir = tempfile.mkdtemp(prefix="autotune_")
+    try:
+        frames = AUTOTUNE_SECONDS * BENCH_FPS
+        reference = os.path.join(work_dir, "reference.yuv")
+        if await _run([
+            "ffmpeg", "-hide_banner", "-y",
+            "-f", "lavfi", "-i", BENCH_SOURCE, "-frames:v", str(frames),
+            "-f", "rawvideo", reference
+        ]) is None:
+            LOGGER.error("Autotune could not render the benchmark clip")
+            return None
+
+        results = []
+        try:
+            for preset in AUTOTUNE_PRESETS:
+                for threads in thread_candidates():
+                    result = await _bench(reference, work_dir, preset, threads, frames)
+                    if result:
+                        LOGGER.info(f"Autotune {preset}/{threads} threads: {result['fps']} fps, PSNR {result['psnr']:.2f}")
+                        results.append(result)
+        finally:
+            # The raw clip is ~166 MB; do not keep it past the benchmarks
+            if os.path.exists(reference):
+                os.remove(reference)
+
+        if not results:
+            LOGGER.error("Autotune: every benchmark encode failed")
+            return None
+
+        passing = [r for r in results if r['psnr'] >= AUTOTUNE_PSNR_FLOOR]
+        if passing:
+            best = max(passing, key=lambda r: r['fps'])
+            preset, threads = best['preset'], best['threads']
+        else:
+            # The best-quality candidate is the slowest one; it would slow every encode down
+            previous = encoder_profile()
+            fallback = previous if 'tuned_at' in previous and previous.get('floor_met', True) else DEFAULT_PROFILE
+            preset, threads = fallback['preset'], fallback['threads']
+            best = max((r for r in results if r['preset'] == preset), key=lambda r: r['fps'], default=results[0])
+            LOGGER.warning(
+                f"Autotune: no preset reached PSNR {AUTOTUNE_PSNR_FLOOR} "
+                f"(best {max(r['psnr'] for r in results):.2f}), keeping {preset} with {threads or 'auto'} threads"
+            )
+
+        profile = {
+            'preset': preset,
+            'threads': threads,
+            'fps': best['fps'],
+            'psnr': best['psnr'],
+            'floor_met': bool(passing),
+            'fingerprint': host_fingerprint(),
+            'tuned_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'results': results
+        }
+        save_config_to_file(profile, profile_path())
+        _profile = profile
+
+        LOGGER.info(f"Autotune picked {preset} with {threads or 'auto'} threads ({best['fps']} fps)")
+        return profile
+
+    except Exception as e:
+        LOGGER.error(f"Autotune error: {e}")
+        return None
+    finally:
+        _running = False
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def profile_summary() -> str:
+    """One line for /status"""
+    profile = encoder_profile()
+    threads = profile.get('threads') or "auto"
+    if 'tuned_at' not in profile:
+        return f"{profile['preset']}, {threads} threads (default, not tuned)"
+    return (
+        f"{profile['preset']}, {threads} threads "
+        f"({profile['fps']} fps, PSNR {profile['psnr']:.1f}, tuned {profile['tuned_at']})"
+    )
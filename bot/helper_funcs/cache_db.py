@@ -0,0 +1,38 @@
+# bot/helper_funcs/cache_db.py - Small SQLite stores kept under CACHE_DIRECTORY
+
+import logging
+import os
+import sqlite3
+from typing import Optional
+
+from bot import CACHE_DIRECTORY
+
+LOGGER = logging.getLogger(__name__)
+
+_connections = {}
+
+def cache_db(name: str, schema: str) -> Optional[sqlite3.Connection]:
+    """
+    Open (once per process) CACHE_DIRECTORY/<name>.sqlite and apply `schema`.
+    Queries are small indexed lookups, cheap enough to run on the event loop.
+    Returns None when the store cannot be opened; callers then skip caching.
+    """
+    if name in _connections:
+        return _connections[name]
+
+    try:
+        os.makedirs(CACHE_DIRECTORY, exist_ok=True)
+        connection = sqlite3.connect(
+            os.path.join(CACHE_DIRECTORY, f"{name}.sqlite"),
+            isolation_level=None,
+            check_same_thread=False
+        )
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(schema)
+    except sqlite3.Error as e:
+        LOGGER.error(f"Could not open cache store {name}: {e}")
+        connection = None
+
+    _connections[name] = connection
+    return connection
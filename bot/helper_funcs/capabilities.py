@@ -0,0 +1,179 @@
+# bot/helper_funcs/capabilities.py - What the installed ffmpeg can do, collected once per binary
+
+import asyncio
+import logging
+import os
+import re
+import shutil
+from datetime import datetime
+from typing import Optional, Dict, Any, List
+
+from bot import CACHE_DIRECTORY
+from bot.get_cfg import load_config_from_file, save_config_to_file
+
+LOGGER = logging.getLogger(__name__)
+
+CAPABILITIES_FILE = "ffmpeg_capabilities.json"
+
+# "V.F..D libx264  ..." - type, frame threads, slice threads, experimental, ...
+ENCODER_LINE = re.compile(r"^\s*([VAS])([F.])([S.])([X.])[B.][D.]\s+(\S+)")
+MUXER_LINE = re.compile(r"^\s*[D ]E\s+(\S+)")
+FILTER_LINE = re.compile(r"^\s*[T.][S.][C.]\s+(\S+)\s+\S*->")
+OPTION_LINE = re.compile(r"^-(\w+)")
+# Decoders not named after their codec end with "(codec av1)"
+DECODER_CODEC = re.compile(r"\(codec (\S+)\)\s*$")
+
+_snapshot = None
+
+def binary_key() -> Optional[str]:
+    """Path and mtime of ffmpeg and ffprobe; changes whenever either binary is replaced"""
+    parts = []
+    for name in ("ffmpeg", "ffprobe"):
+        path = shutil.which(name)
+        if not path:
+            return None
+        parts.append(f"{os.path.realpath(path)}@{int(os.path.getmtime(path))}")
+    return "|".join(parts)
+
+def capabilities_path() -> str:
+    return os.path.join(CACHE_DIRECTORY, CAPABILITIES_FILE)
+
+async def _output(*command: str) -> Optional[str]:
+    try:
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+        stdout, _ = await process.communicate()
+    except OSError:
+        return None
+    return stdout.decode(errors='ignore') if process.returncode == 0 else None
+
+def _parse_encoders(text: str) -> Dict[str, Dict[str, Any]]:
+    encoders = {}
+    for line in text.splitlines():
+        match = ENCODER_LINE.match(line)
+        if match and match.group(5) != '=':
+            kind, frame_threads, slice_threads, experimental, name = match.groups()
+            encoders[name] = {
+                'type': {'V': 'video', 'A': 'audio', 'S': 'subtitle'}[kind],
+                'frame_threads': frame_threads == 'F',
+                'slice_threads': slice_threads == 'S',
+                'experimental': experimental == 'X'
+            }
+    return encoders
+
+def _parse_decoders(text: str) -> List[str]:
+    """Codec names (as ffprobe reports them) that some decoder handles"""
+    codecs = set()
+    for line in text.splitlines():
+        match = ENCODER_LINE.match(line)
+        if match and match.group(5) != '=':
+            codec = DECODER_CODEC.search(line)
+            codecs.add(codec.group(1) if codec else match.group(5))
+    return sorted(codecs)
+
+async def collect_capabilities() -> Optional[Dict[str, Any]]:
+    """Run ffmpeg's listing commands once and parse them into a snapshot"""
+    key = binary_key()
+    if key is None:
+        return None
+
+    version, probe_version, encoders, decoders, muxers, filters, options = await asyncio.gather(
+        _output("ffmpeg", "-hide_banner", "-version"),
+        _output("ffprobe", "-hide_banner", "-version"),
+        _output("ffmpeg", "-hide_banner", "-encoders"),
+        _output("ffmpeg", "-hide_banner", "-decoders"),
+        _output("ffmpeg", "-hide_banner", "-muxers"),
+        _output("ffmpeg", "-hide_banner", "-filters"),
+        _output("ffmpeg", "-hide_banner", "-h", "long")
+    )
+    if not version or not probe_version:
+        return None
+
+    return {
+        'key': key,
+        'version': version.splitlines()[0],
+        'ffprobe_version': probe_version.splitlines()[0],
+        'configuration': next((line for line in version.splitlines() if line.startswith("configuration:")), ""),
+        'encoders': _parse_encoders(encoders or ""),
+        'decoders': _parse_decoders(decoders or ""),
+        'muxers': sorted({m.group(1) for m in map(MUXER_LINE.match, (muxers or "").splitlines()) if m}),
+        'filters': sorted({m.group(1) for m in map(FILTER_LINE.match, (filters or "").splitlines()) if m}),
+        'options': sorted({m.group(1) for m in map(OPTION_LINE.match, (options or "").splitlines()) if m}),
+        'collected_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+async def load_capabilities() -> Optional[Dict[str, Any]]:
+    """
+    Load the snapshot for the installed binaries at boot: from disk when
+    their path and mtime still match, otherwise collect and save a new one.
+    Returns None when ffmpeg or ffprobe is missing or does not run.
+    """
+    global _snapshot
+    key = binary_key()
+    if key is None:
+        LOGGER.error("FFmpeg or FFprobe not found in PATH")
+        return None
+
+    saved = load_config_from_file(capabilities_path())
+    # Snapshots saved before decoders were listed are collected again
+    if saved.get('key') == key and 'decoders' in saved:
+        _snapshot = saved
+        return _snapshot
+
+    snapshot = await collect_capabilities()
+    if snapshot is None:
+        LOGGER.error("FFmpeg or FFprobe not working")
+        return None
+
+    save_config_to_file(snapshot, capabilities_path())
+    _snapshot = snapshot
+    LOGGER.info(
+        f"FFmpeg capabilities collected: {len(snapshot['encoders'])} encoders, "
+        f"{len(snapshot['decoders'])} decodable codecs, "
+        f"{len(snapshot['muxers'])} muxers, {len(snapshot['filters'])} filters"
+    )
+    return _snapshot
+
+def capabilities() -> Dict[str, Any]:
+    """The boot-time snapshot; empty until load_capabilities has run"""
+    return _snapshot or {}
+
+# Before the snapshot exists every check answers True, so behaviour stays as it was without one
+
+def has_encoder(name: str) -> bool:
+    snapshot = capabilities()
+    return not snapshot or name in snapshot['encoders']
+
+def has_decoder(codec: str) -> bool:
+    """Whether any decoder handles `codec`, by ffprobe's codec name (av1, not libdav1d)"""
+    snapshot = capabilities()
+    return not snapshot or codec in snapshot['decoders']
+
+def has_muxer(name: str) -> bool:
+    snapshot = capabilities()
+    return not snapshot or name in snapshot['muxers']
+
+def has_filter(name: str) -> bool:
+    snapshot = capabilities()
+    return not snapshot or name in snapshot['filters']
+
+def has_option(name: str) -> bool:
+    snapshot = capabilities()
+    return not snapshot or name in snapshot['options']
+
+def fps_mode_args(mode: str) -> List[str]:
+    """-fps_mode on FFmpeg 5.1+, the older -vsync spelling before it"""
+    return ["-fps_mode", mode] if has_option("fps_mode") else ["-vsync", mode]
+
+def capabilities_summary() -> str:
+    """One line for /status"""
+    snapshot = capabilities()
+    if not snapshot:
+        return "not checked"
+    # "ffmpeg version 6.0-static https://... Copyright ..." -> "6.0-static"
+    version = (snapshot['version'].split()[2:3] or ["unknown"])[0]
+    video = [name for name in ("libx264", "libx265", "libsvtav1", "libvpx-vp9") if name in snapshot['encoders']]
+    return f"{version} ({', '.join(video) or 'no software video encoders'})"
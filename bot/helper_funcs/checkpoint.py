@@ -0,0 +1,103 @@
+# bot/helper_funcs/checkpoint.py - Resumable chunked encode bookkeeping
+
+import hashlib
+import json
+import logging
+import math
+import os
+import shutil
+from typing import Optional, Dict, Any, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Sub-directory of the download location holding one folder per job
+CHECKPOINT_DIRECTORY = "checkpoints"
+
+MANIFEST_NAME = "manifest.json"
+
+# Bytes hashed from each end of the source to identify it cheaply
+IDENTITY_SAMPLE_BYTES = 1024 * 1024
+
+def source_identity(video_file: str) -> str:
+    """
+    Stable key for a source file: its size plus a hash of the head and tail.
+    A re-downloaded copy of the same Telegram file maps to the same key.
+    """
+    size = os.path.getsize(video_file)
+    digest = hashlib.sha1(str(size).encode())
+
+    with open(video_file, 'rb') as f:
+        digest.update(f.read(IDENTITY_SAMPLE_BYTES))
+        if size > IDENTITY_SAMPLE_BYTES:
+            f.seek(max(size - IDENTITY_SAMPLE_BYTES, IDENTITY_SAMPLE_BYTES))
+            digest.update(f.read(IDENTITY_SAMPLE_BYTES))
+
+    return digest.hexdigest()[:16]
+
+def plan_chunks(total_time: float, chunk_seconds: int) -> List[Tuple[float, float]]:
+    """Split the timeline into (start, length) windows of at most chunk_seconds"""
+    count = max(1, math.ceil(total_time / chunk_seconds))
+    return [
+        (index * chunk_seconds, min(chunk_seconds, total_time - index * chunk_seconds))
+        for index in range(count)
+    ]
+
+def chunk_path(job_dir: str, index: int) -> str:
+    return os.path.join(job_dir, f"chunk_{index:05d}.mp4")
+
+def open_checkpoint(video_file: str, output_directory: str, total_time: float, chunk_seconds: int,
+                    settings: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Return (job_dir, manifest) for this source, resuming an existing manifest
+    when it was written for the same duration, chunk size and `settings`
+    (the request's quality, encoder arguments and scaling). A manifest for
+    other settings is discarded together with its chunks.
+    """
+    try:
+        job_dir = os.path.join(output_directory, CHECKPOINT_DIRECTORY, source_identity(video_file))
+        os.makedirs(job_dir, exist_ok=True)
+
+        manifest = {}
+        manifest_file = os.path.join(job_dir, MANIFEST_NAME)
+        if os.path.exists(manifest_file):
+            try:
+                with open(manifest_file, 'r') as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                LOGGER.warning(f"Ignoring unreadable checkpoint manifest: {e}")
+
+        if (manifest.get('duration') != total_time or manifest.get('chunk_seconds') != chunk_seconds
+                or manifest.get('settings') != settings):
+            if manifest:
+                LOGGER.info(f"Discarding checkpoint in {job_dir}: written for other settings")
+                shutil.rmtree(job_dir, ignore_errors=True)
+                os.makedirs(job_dir, exist_ok=True)
+            manifest = {
+                'duration': total_time,
+                'chunk_seconds': chunk_seconds,
+                'settings': settings,
+                'rate_control': None,
+                'chunks': None,
+                'done': []
+            }
+
+        # Chunks can be aged out by the download cleanup; only trust what is on disk
+        manifest['done'] = [i for i in manifest['done'] if os.path.exists(chunk_path(job_dir, i))]
+
+        if manifest['done']:
+            LOGGER.info(f"Resuming checkpointed encode in {job_dir}: {len(manifest['done'])} chunks done")
+
+        return job_dir, manifest
+
+    except Exception as e:
+        LOGGER.error(f"Could not open checkpoint: {e}")
+        return None
+
+def save_manifest(job_dir: str, manifest: Dict[str, Any]):
+    """Write the manifest atomically so a crash never leaves it half written"""
+    manifest_file = os.path.join(job_dir, MANIFEST_NAME)
+    temp_file = manifest_file + ".tmp"
+
+    with open(temp_file, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(temp_file, manifest_file)
@@ -8,6 +8,8 @@ import logging
 from typing import Optional, Callable, Any
 from pyrogram.types import Message
 
+from bot.helper_funcs.edit_scheduler import schedule_edit, edit_now
+
 LOGGER = logging.getLogger(__name__)
 
 def humanbytes(size: int) -> str:
@@ -108,10 +110,7 @@ async def progress_for_pyrogram(
                 f"⏰ **Elapsed:** {TimeFormatter(int(diff * 1000))}"
             )
             
-            try:
-                await message.edit_text(progress_text)
-            except Exception as e:
-                LOGGER.error(f"Error updating progress: {e}")
+            schedule_edit(message, progress_text)
                 
     except Exception as e:
         LOGGER.error(f"Progress callback error: {e}")
@@ -168,7 +167,7 @@ class ProgressTracker:
                 f"\\n💡 *Enhanced VideoCompress Bot v2.0*"
             )
             
-            await self.message.edit_text(progress_text)
+            schedule_edit(self.message, progress_text)
             self.last_update = now
             
         except Exception as e:
@@ -192,7 +191,7 @@ class ProgressTracker:
                     f"⏰ **Total Time:** {TimeFormatter(int(elapsed * 1000))}"
                 )
             
-            await self.message.edit_text(completion_text)
+            await edit_now(self.message, completion_text)
             
         except Exception as e:
             LOGGER.error(f"Progress completion error: {e}")
@@ -209,7 +208,7 @@ class ProgressTracker:
                 f"💡 *Please try again or contact support*"
             )
             
-            await self.message.edit_text(error_text)
+            await edit_now(self.message, error_text)
             
         except Exception as e:
             LOGGER.error(f"Progress error display failed: {e}")
@@ -20,6 +20,7 @@ from bot.helper_funcs.display_progress import (
     humanbytes,
     TimeFormatter
 )
+from bot.helper_funcs.edit_scheduler import schedule_edit, edit_now
 from bot.helper_funcs.utils import (
     FileManager,
     ValidationUtils,
@@ -150,7 +151,8 @@ class EnhancedDownloader:
                 self.download_stats['total_size'] += downloaded_size
                 
                 # Final success message
-                await status_message.edit_text(
+                await edit_now(
+                    status_message,
                     f"✅ **Download Completed!**\n\n"
                     f"📄 **File:** {file_name}\n"
                     f"📏 **Size:** {humanbytes(downloaded_size)}\n"
@@ -169,7 +171,8 @@ class EnhancedDownloader:
                 # Update failed download stats
                 self.download_stats['failed_downloads'] += 1
                 
-                await status_message.edit_text(
+                await edit_now(
+                    status_message,
                     f"❌ **Download Failed!**\n\n"
                     f"📄 **File:** {file_name}\n"
                     f"🔍 **Error:** {str(download_error)[:100]}...\n"
@@ -208,7 +211,7 @@ class EnhancedDownloader:
                 f"⏳ *Please wait...*"
             )
             
-            await message.edit_text(progress_text)
+            schedule_edit(message, progress_text)
             
         except Exception as e:
             LOGGER.error(f"Progress update error: {e}")
@@ -0,0 +1,245 @@
+# bot/helper_funcs/edit_scheduler.py - One rate-limited queue for every progress message edit
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, Any
+
+from pyrogram.errors import FloodWait, MessageNotModified
+
+from bot import EDIT_RATE_PER_CHAT, EDIT_RATE_GLOBAL
+
+LOGGER = logging.getLogger(__name__)
+
+# Edits a chat may burst before its per-minute rate applies
+CHAT_BURST = 3
+
+# Texts remembered per message to drop edits that would change nothing
+SENT_TEXTS = 1024
+
+# Longest edit_now waits on a FloodWait before leaving the edit queued instead
+MAX_WAIT = 30
+
+class TokenBucket:
+    """`rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.stamp = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+class EditScheduler:
+    """
+    Progress callbacks hand their latest text to schedule(), which returns at
+    once. A single worker sends it when the chat's and the bot's budgets
+    allow, so a slow or flood-limited edit never stalls a transfer or an
+    encode. Only the newest pending text per message is kept, text equal to
+    what the message already shows is dropped, and a FloodWait pauses just
+    that chat for as long as Telegram asks.
+    """
+
+    def __init__(self, per_chat_per_minute: float, global_per_second: float):
+        self.per_chat = max(per_chat_per_minute, 1) / 60
+        self.global_bucket = TokenBucket(max(global_per_second, 1), max(global_per_second, 1))
+        self.chat_buckets: Dict[int, TokenBucket] = {}
+        self.blocked_until: Dict[int, float] = {}
+        self.pending: "OrderedDict[Tuple[int, int], Tuple[Any, str, Any]]" = OrderedDict()
+        self.in_flight: Dict[Tuple[int, int], asyncio.Task] = {}
+        self.sent: "OrderedDict[Tuple[int, int], str]" = OrderedDict()
+        self.stats = {'sent': 0, 'coalesced': 0, 'unchanged': 0, 'flood_waits': 0}
+        self.wake: Optional[asyncio.Event] = None
+        self.worker: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _key(message) -> Tuple[int, int]:
+        return message.chat.id, message.id
+
+    @staticmethod
+    def _signature(text: str, reply_markup) -> str:
+        return text if reply_markup is None else f"{text}\0{reply_markup}"
+
+    def _bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self.chat_buckets) >= SENT_TEXTS:
+                # Chats with nothing queued have a full bucket again by the time they return
+                busy = {key[0] for key in self.pending} | {key[0] for key in self.in_flight}
+                self.chat_buckets = {chat: b for chat, b in self.chat_buckets.items() if chat in busy}
+            bucket = self.chat_buckets[chat_id] = TokenBucket(self.per_chat, CHAT_BURST)
+        return bucket
+
+    def _remember(self, key: Tuple[int, int], signature: str):
+        self.sent[key] = signature
+        self.sent.move_to_end(key)
+        while len(self.sent) > SENT_TEXTS:
+            self.sent.popitem(last=False)
+
+    def schedule(self, message, text: str, reply_markup=None):
+        """Queue `text` for `message`, replacing any edit still waiting for it"""
+        key = self._key(message)
+        signature = self._signature(text, reply_markup)
+        if signature == self.sent.get(key):
+            # Whatever was queued is older than what the message already shows
+            if self.pending.pop(key, None):
+                self.stats['coalesced'] += 1
+            self.stats['unchanged'] += 1
+            return
+        if key in self.pending:
+            self.stats['coalesced'] += 1
+        self.pending[key] = (message, text, reply_markup)
+        self._start()
+
+    def discard(self, message):
+        """Forget queued edits for `message`; it is about to get a final text or be deleted"""
+        self.pending.pop(self._key(message), None)
+
+    async def settle(self, message):
+        """Forget queued edits for `message` and wait until none is in flight"""
+        key = self._key(message)
+        self.pending.pop(key, None)
+        task = self.in_flight.get(key)
+        if task:
+            await asyncio.wait([task])
+            # A flood-limited send re-queues its text; whatever follows supersedes it
+            self.pending.pop(key, None)
+
+    async def edit_now(self, message, text: str, reply_markup=None):
+        """
+        Edit `message` ahead of the queue, after any edit already in flight
+        for it. Waits for the chat's budget; a FloodWait longer than
+        MAX_WAIT leaves the text queued instead. Errors are logged, not raised.
+        """
+        key = self._key(message)
+        await self.settle(message)
+
+        now = time.monotonic()
+        wait = max(self.blocked_until.get(key[0], 0) - now, self._bucket(key[0]).wait(now))
+        if wait > MAX_WAIT:
+            self.schedule(message, text, reply_markup)
+            return None
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+        now = time.monotonic()
+        self._bucket(key[0]).take(now)
+        self.global_bucket.take(now)
+        try:
+            result = await message.edit_text(text, reply_markup=reply_markup)
+            self._remember(key, self._signature(text, reply_markup))
+            self.stats['sent'] += 1
+            return result
+        except MessageNotModified:
+            self._remember(key, self._signature(text, reply_markup))
+        except FloodWait as e:
+            self._flood(key[0], e.value)
+            self.schedule(message, text, reply_markup)
+        except Exception as e:
+            LOGGER.warning(f"Message edit failed: {e}")
+        return None
+
+    def _flood(self, chat_id: int, seconds: float):
+        self.stats['flood_waits'] += 1
+        self.blocked_until[chat_id] = time.monotonic() + seconds
+        LOGGER.warning(f"FloodWait {seconds}s on chat {chat_id}; its progress edits are paused")
+
+    def _start(self):
+        if self.wake is None:
+            self.wake = asyncio.Event()
+        self.wake.set()
+        if self.worker is None or self.worker.done():
+            self.worker = asyncio.create_task(self._run())
+
+    async def _send(self, key: Tuple[int, int], message, text: str, reply_markup):
+        try:
+            await message.edit_text(text, reply_markup=reply_markup)
+            self._remember(key, self._signature(text, reply_markup))
+            self.stats['sent'] += 1
+        except MessageNotModified:
+            self._remember(key, self._signature(text, reply_markup))
+        except FloodWait as e:
+            self._flood(key[0], e.value)
+            # Retry after the wait unless a newer text has been queued meanwhile
+            if key not in self.pending:
+                self.pending[key] = (message, text, reply_markup)
+        except Exception as e:
+            # Usually the message was deleted once its job finished
+            LOGGER.debug(f"Progress edit dropped: {e}")
+        finally:
+            self.in_flight.pop(key, None)
+            self.wake.set()
+
+    async def _run(self):
+        while True:
+            self.wake.clear()
+            delay = None
+            now = time.monotonic()
+
+            for key in list(self.pending):
+                if key in self.in_flight:
+                    # Its completion wakes the worker again
+                    continue
+                chat_wait = max(self.blocked_until.get(key[0], 0) - now, self._bucket(key[0]).wait(now))
+                if chat_wait > 0:
+                    delay = chat_wait if delay is None else min(delay, chat_wait)
+                    continue
+                global_wait = self.global_bucket.wait(now)
+                if global_wait > 0:
+                    delay = global_wait if delay is None else min(delay, global_wait)
+                    break
+                self._bucket(key[0]).take(now)
+                self.global_bucket.take(now)
+                message, text, reply_markup = self.pending.pop(key)
+                # Sent as their own tasks so Pyrogram's short flood sleeps hold up only that message
+                self.in_flight[key] = asyncio.create_task(self._send(key, message, text, reply_markup))
+
+            for chat_id, until in list(self.blocked_until.items()):
+                if until <= now:
+                    del self.blocked_until[chat_id]
+
+            try:
+                await asyncio.wait_for(self.wake.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def summary(self) -> str:
+        """One line for /status"""
+        return (
+            f"{self.stats['sent']} sent, {self.stats['coalesced']} coalesced, "
+            f"{self.stats['unchanged']} unchanged skipped, {self.stats['flood_waits']} flood waits"
+        )
+
+_scheduler = EditScheduler(EDIT_RATE_PER_CHAT, EDIT_RATE_GLOBAL)
+
+def schedule_edit(message, text: str, reply_markup=None):
+    """Queue a progress edit; returns immediately"""
+    _scheduler.schedule(message, text, reply_markup)
+
+def discard_edits(message):
+    """Drop progress edits still queued for `message`"""
+    _scheduler.discard(message)
+
+async def settle_edits(message):
+    """Drop queued progress edits for `message` and wait out one already being sent"""
+    await _scheduler.settle(message)
+
+async def edit_now(message, text: str, reply_markup=None):
+    """Edit a message that progress edits may also target (stage changes, final results)"""
+    return await _scheduler.edit_now(message, text, reply_markup)
+
+def edit_scheduler_summary() -> str:
+    return _scheduler.summary()
@@ -16,7 +16,9 @@ import time
 import re
 import json
 import subprocess
+import shutil
 import math
+from collections import deque
 from typing import Optional, Dict, Any, Tuple # Added imports from new file
 from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot.helper_funcs.display_progress import (
@@ -26,385 +28,1248 @@ from bot.localisation import Localisation
 from bot import (
     FINISHED_PROGRESS_STR,
     UN_FINISHED_PROGRESS_STR,
-    DOWNLOAD_LOCATION
+    DOWNLOAD_LOCATION,
+    DEFAULT_COMPRESSION,
+    AUTO_SAMPLE_COUNT,
+    AUTO_SAMPLE_SECONDS,
+    AUTO_SAMPLE_BUDGET,
+    AUTO_CRF_MIN,
+    AUTO_CRF_MAX,
+    ENABLE_AUTO_DOWNSCALE,
+    DOWNSCALE_MIN_BPP,
+    DOWNSCALE_MIN_HEIGHT,
+    DOWNSCALE_MAX_FPS,
+    PREVIEW_SECONDS,
+    PREVIEW_HEIGHT,
+    ENABLE_CHECKPOINT_ENCODE,
+    CHECKPOINT_CHUNK_SECONDS,
+    CHECKPOINT_MIN_DURATION,
+    ENABLE_SIZE_MODEL
 )
+from bot.helper_funcs.keyframes import get_keyframe_index
+from bot.helper_funcs.probe import get_media_probe, MediaProbe
+from bot.helper_funcs.autotune import encoder_profile, encoder_args
+from bot.helper_funcs.capabilities import load_capabilities, has_encoder, fps_mode_args
+from bot.helper_funcs.size_model import plan_size, record_job
+from bot.helper_funcs.edit_scheduler import schedule_edit
+from bot.helper_funcs.checkpoint import (
+    open_checkpoint,
+    save_manifest,
+    plan_chunks,
+    chunk_path
+)
+
+# Output ladder rungs, as the short side of the frame
+RESOLUTION_LADDER = (2160, 1440, 1080, 720, 576, 480, 360, 240)
+
+# Cheaper scalers for faster presets; scaling must not eat the preset's savings
+SCALER_FLAGS = {
+    'ultrafast': 'fast_bilinear',
+    'superfast': 'fast_bilinear',
+    'veryfast': 'bilinear',
+    'faster': 'bilinear',
+    'fast': 'bicubic',
+    'medium': 'bicubic'
+}
+
+# Lines of ffmpeg stderr kept per job for diagnostics
+STDERR_TAIL_LINES = 50
+
+# Minimum seconds between progress message edits
+PROGRESS_EDIT_INTERVAL = 3
+
+# Telegram thumbnail limits: JPEG, at most 320 px per side and 200 KB
+THUMBNAIL_MAX_SIDE = 320
+THUMBNAIL_MAX_BYTES = 200 * 1024
+THUMBNAIL_QUALITY = 4
+
+# /screens contact sheet: frame count bounds and the width of one tile
+SCREENS_DEFAULT = 9
+SCREENS_MAX = 36
+SCREENS_TILE_WIDTH = 480
+
+# MP4 muxer flags for append-only output: nothing is rewritten once on disk
+FRAGMENTED_MP4_FLAGS = ["-movflags", "+frag_keyframe+empty_moov+default_base_moof"]
 
 # Enhanced video conversion from ffmpeg (1).py
-async def convert_video(video_file, output_directory, total_time, bot, message, target_percentage, isAuto=False, bug=None):
-    """Enhanced video conversion with better error handling, based on ffmpeg (1).py"""
+async def convert_video(video_file, output_directory, total_time, bot, message, target_percentage, isAuto=False, bug=None,
+                        input_stream=None, source_size=None, video_info=None, fragmented=False, output_file=None,
+                        progress=None, keep_status=False, thumbnail=None):
+    """
+    Enhanced video conversion with better error handling, based on ffmpeg (1).py
+
+    With `input_stream` (an async iterator of source bytes) ffmpeg reads from
+    stdin, so encoding overlaps the download; `source_size` and `video_info`
+    (a MediaProbe.video-style dict) then stand in for the stat/probe of the
+    not yet complete file.
+    With `fragmented` the MP4 is written append-only (empty moov + fragments)
+    so `output_file` can be uploaded while it is still being encoded.
+    Long on-disk sources are encoded in checkpointed chunks when
+    ENABLE_CHECKPOINT_ENCODE is set, so a restart only redoes missing chunks.
+    `progress` replaces the default status message updates and `keep_status`
+    leaves status.json to the caller (batch jobs). `thumbnail` is a
+    (path, seconds) pair written as a second output of the same decode;
+    checkpointed encodes skip it, so callers check it with usable_thumbnail.
+    """
     try:
         # https://stackoverflow.com/a/13891070/4723940
-        out_put_file_name = output_directory + "/" + str(round(time.time())) + ".mp4"
-        progress = output_directory + "/" + "progress.txt"
+        out_put_file_name = output_file or output_directory + "/" + str(round(time.time())) + ".mp4"
+        status = output_directory + "/status.json"
+        
+        speed_args = encoder_args()
+        preset = encoder_profile()['preset']
+        
+        rate_control = []
+        ladder_filter = None
+        size_job = None
+        if not isAuto:
+            try:
+                filesize = source_size or os.stat(video_file).st_size
+                # Streamed sources have no probe yet; their audio is left in the budget
+                probe = await get_media_probe(video_file) if input_stream is None else None
+                video = video_info or (probe.video if probe else {})
+                audio_bitrate = probe.audio.get('bitrate', 0) if probe else 0
+                target_bitrate, rate_control = bitrate_args(filesize, target_percentage, total_time, audio_bitrate)
+                
+                if ENABLE_SIZE_MODEL:
+                    size_job = plan_size(target_bitrate, preset, video, filesize, total_time, audio_bitrate, target_percentage)
+                    rate_control = video_bitrate_args(size_job['requested_bitrate'])
+                
+                if ENABLE_AUTO_DOWNSCALE:
+                    ladder_filter = select_output_ladder(video, target_bitrate, preset)
+                    if ladder_filter:
+                        rate_control += ["-vf", ladder_filter]
+            except Exception as e:
+                LOGGER.error(f"Error calculating bitrate: {e}")
+                # Continue with default settings
+        
+        checkpoint = None
+        if ENABLE_CHECKPOINT_ENCODE and input_stream is None and total_time >= CHECKPOINT_MIN_DURATION:
+            # Chunks are only resumed for the same request; the auto CRF is
+            # chosen by sampling, so it is kept with the chunks it encoded
+            settings = {
+                'target_percentage': None if isAuto else target_percentage,
+                'auto': bool(isAuto),
+                'encoder_args': speed_args,
+                'ladder': ladder_filter
+            }
+            checkpoint = open_checkpoint(video_file, output_directory, total_time, CHECKPOINT_CHUNK_SECONDS, settings)
+        
+        if checkpoint and checkpoint[1]['rate_control'] is not None:
+            # Resumed chunks must match the ones already on disk; the size
+            # model's corrections may have moved since they were planned
+            rate_control = checkpoint[1]['rate_control']
+            size_job = None
+        elif isAuto:
+            crf = await select_auto_crf(video_file, output_directory, total_time, preset)
+            if crf is not None:
+                rate_control = ["-crf", str(crf)]
+        if isAuto:
+            target_percentage = 'auto'
         
-        with open(progress, 'w') as f:
-            pass
-
         file_genertor_command = [
             "ffmpeg",
             "-hide_banner",
             "-loglevel",
-            "quiet",
-            "-progress",
-            progress,
+            "error",
             "-i",
-            video_file,
+            "pipe:0" if input_stream is not None else video_file,
             "-c:v",   
             "libx264", # Changed from 'h264' to 'libx264' for explicit encoder
-            "-preset",   
-            "ultrafast",
+            *rate_control,
+            *speed_args,
             "-tune",
             "film",
             "-c:a",
             "copy",
-            out_put_file_name
+            *(FRAGMENTED_MP4_FLAGS if fragmented else []),
+            out_put_file_name,
+            *(thumbnail_output_args(thumbnail[0], thumbnail[1]) if thumbnail else [])
         ]
         
-        if not isAuto:
-            try:
-                filesize = os.stat(video_file).st_size
-                calculated_percentage = 100 - target_percentage
-                target_size = (calculated_percentage / 100) * filesize
-                target_bitrate = int(math.floor(target_size * 8 / total_time))
-                
-                if target_bitrate // 1000000 >= 1:
-                    bitrate = str(target_bitrate//1000000) + "M"
-                elif target_bitrate // 1000 > 1:
-                    bitrate = str(target_bitrate//1000) + "k"
-                else:
-                    bitrate = "500k"  # Minimum bitrate added from new file
-                    
-                extra = ["-b:v", bitrate, "-bufsize", bitrate]
-                for elem in reversed(extra):
-                    file_genertor_command.insert(10, elem)
-            except Exception as e:
-                LOGGER.error(f"Error calculating bitrate: {e}")
-                # Continue with default settings
+        COMPRESSION_START_TIME = time.time()
+        on_progress = progress or progress_reporter(message, bug, total_time, target_percentage)
+        on_spawn = pid_recorder(status, message)
+        
+        if checkpoint:
+            job_dir, manifest = checkpoint
+            manifest['rate_control'] = rate_control
+            returncode, stderr_tail = await encode_checkpointed(
+                video_file, out_put_file_name, job_dir, manifest, rate_control,
+                FRAGMENTED_MP4_FLAGS if fragmented else [], status, on_progress, on_spawn
+            )
         else:
-            target_percentage = 'auto'
+            returncode, stderr_tail = await run_ffmpeg(
+                file_genertor_command,
+                on_progress=on_progress,
+                on_spawn=on_spawn,
+                input_stream=input_stream
+            )
         
-        COMPRESSION_START_TIME = time.time()
+        if returncode != 0:
+            LOGGER.error(f"FFmpeg exited with {returncode}: " + "\n".join(stderr_tail))
+        
+        # On failure status.json stays behind so the caller can tell a failed
+        # encode (still present) from a /cancel (removed by the cancel handler)
+        try:
+            if returncode == 0 and not keep_status and os.path.exists(status):
+                os.remove(status)
+        except:
+            pass
+        
+        if returncode == 0 and os.path.lexists(out_put_file_name):
+            if size_job:
+                record_job(size_job, os.path.getsize(out_put_file_name))
+            return out_put_file_name
+        else:
+            return None
+            
+    except Exception as e:
+        LOGGER.error(f"Video conversion error: {e}")
+        return None
+
+async def encode_checkpointed(video_file, out_put_file_name, job_dir, manifest, rate_control, output_flags,
+                             status, on_progress, on_spawn) -> Tuple[Optional[int], list]:
+    """
+    Encode the video track in time-bounded chunks recorded in the manifest,
+    then losslessly concat them and copy the audio from the source.
+    Returns (returncode, stderr_tail) like run_ffmpeg.
+    """
+    chunks = manifest.get('chunks')
+    if not chunks:
+        # Keyframe-aligned windows let every chunk seek without decoding a preroll
+        keyframe_index = await get_keyframe_index(video_file)
+        if keyframe_index:
+            chunks = keyframe_index.split_points(manifest['chunk_seconds'], manifest['duration'])
+        else:
+            chunks = plan_chunks(manifest['duration'], manifest['chunk_seconds'])
+        manifest['chunks'] = chunks
+        save_manifest(job_dir, manifest)
+    
+    for index, (start, length) in enumerate(chunks):
+        chunk_file = chunk_path(job_dir, index)
+        if index in manifest['done']:
+            continue
         
-        process = await asyncio.create_subprocess_exec(
-            *file_genertor_command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE,
+        # /cancel removes status.json; stop before spawning the next chunk
+        if not os.path.exists(status):
+            return None, ["Cancelled between chunks"]
+        
+        async def chunk_progress(block, offset=start):
+            if block.get('progress') == "end":
+                return
+            shifted = dict(block)
+            shifted['out_time_us'] = str(int((offset + progress_seconds(block)) * 1000000))
+            await on_progress(shifted)
+        
+        part_file = chunk_file + ".part.mp4"
+        returncode, stderr_tail = await run_ffmpeg(
+            [
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-ss", str(start), "-i", video_file, "-t", str(length),
+                "-map", "0:v:0", "-an", "-sn",
+                "-c:v", "libx264", *rate_control,
+                *manifest['settings']['encoder_args'], "-tune", "film",
+                part_file
+            ],
+            on_progress=chunk_progress,
+            on_spawn=on_spawn
         )
+        if returncode != 0:
+            if returncode is not None:
+                # A chunk that fails will fail again; do not keep it for a resume
+                shutil.rmtree(job_dir, ignore_errors=True)
+            return returncode, stderr_tail
+        
+        # Rename before recording so the manifest never lists a partial chunk
+        os.replace(part_file, chunk_file)
+        manifest['done'].append(index)
+        save_manifest(job_dir, manifest)
+        LOGGER.info(f"Checkpoint: chunk {index + 1}/{len(chunks)} done")
+    
+    if not os.path.exists(status):
+        return None, ["Cancelled before concat"]
+    
+    concat_list = os.path.join(job_dir, "concat.txt")
+    with open(concat_list, 'w') as f:
+        for index in range(len(chunks)):
+            f.write(f"file '{os.path.basename(chunk_path(job_dir, index))}'\n")
+    
+    returncode, stderr_tail = await run_ffmpeg(
+        [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-i", video_file,
+            "-map", "0:v:0", "-map", "1:a:0?",
+            "-c", "copy",
+            *output_flags,
+            out_put_file_name
+        ],
+        on_spawn=on_spawn
+    )
+    
+    # The chunks are only worth keeping for a resume after a crash or restart
+    if returncode is not None:
+        shutil.rmtree(job_dir, ignore_errors=True)
+    return returncode, stderr_tail
+
+def progress_reporter(message, bug, total_time, target_percentage):
+    """Build an ffmpeg progress callback that edits the status message (and log message)"""
+    last_edit = 0
+    
+    async def on_progress(block):
+        nonlocal last_edit
+        
+        if block.get('progress') == "end":
+            LOGGER.info("ffmpeg progress: end")
+            return
+        
+        now = time.time()
+        if now - last_edit < PROGRESS_EDIT_INTERVAL:
+            return
+        
+        elapsed_time = progress_seconds(block)
+        try:
+            speed = float(block.get('speed', '1x').rstrip('x'))
+            difference = math.floor((total_time - elapsed_time) / speed)
+        except (ValueError, ZeroDivisionError):
+            difference = 0
+        
+        ETA = "-"
+        if difference > 0:
+            ETA = TimeFormatter(difference * 1000)
         
+        percentage = math.floor(elapsed_time * 100 / total_time) if total_time > 0 else 0 # Added check for total_time > 0
+        percentage = min(percentage, 100)  # Cap at 100%
+        
+        # Updated to use markdown bold for telegram compatibility and consistency with new file
+        progress_str = "📊 **Progress:** {0}%\\n[{1}{2}]".format( 
+            round(percentage, 2),
+            ''.join([FINISHED_PROGRESS_STR for i in range(math.floor(percentage / 10))]),
+            ''.join([UN_FINISHED_PROGRESS_STR for i in range(10 - math.floor(percentage / 10))])
+        )
+        
+        stats = f'📦️ **Compressing** {target_percentage}%\\n\\n' \
+               f'⏰️ **ETA:** {ETA}\\n\\n' \
+               f'{progress_str}\\n'
+        
+        last_edit = now
+        
+        # Queued, never awaited: a flood-limited edit must not hold up reading ffmpeg's progress
+        schedule_edit(
+            message,
+            stats,
+            InlineKeyboardMarkup([[
+                InlineKeyboardButton('❌ Cancel ❌', callback_data='cancel_compression') # Updated callback_data
+            ]])
+        )
+        if bug:
+            schedule_edit(bug, stats)
+    
+    return on_progress
+
+def pid_recorder(status, message):
+    """Build an on_spawn callback that records the ffmpeg pid in status.json for /cancel"""
+    def on_spawn(process):
         LOGGER.info("ffmpeg_process: " + str(process.pid))
         
-        status = output_directory + "/status.json"
         try:
             with open(status, 'r+') as f:
                 statusMsg = json.load(f)
         except:
             statusMsg = {}
-            
+        
         statusMsg['pid'] = process.pid
         statusMsg['message'] = message.id # Changed from message.message_id
         
+        # Batch jobs run several encoders at once; /cancel stops them all
+        statusMsg['pids'] = statusMsg.get('pids', []) + [process.pid]
+        
         with open(status, 'w') as f:
             json.dump(statusMsg, f, indent=2)
+    
+    return on_spawn
 
-        isDone = False
-        while process.returncode is None: # Corrected condition from `!= 0` to `is None`
-            await asyncio.sleep(3)
-            
-            try:
-                # Read from `progress` file in the output_directory, not hardcoded DOWNLOAD_LOCATION
-                with open(progress, 'r') as file: 
-                    text = file.read()
-                    
-                frame = re.findall("frame=(\\d+)", text)
-                time_in_us = re.findall("out_time_ms=(\\d+)", text)
-                progress_match = re.findall("progress=(\\w+)", text) # Used progress_match for clarity
-                speed = re.findall("speed=([\\d.]+)", text) # Used regex from new file
-                
-                if len(frame):
-                    frame = int(frame[-1])
-                else:
-                    frame = 1
-                    
-                if len(speed):
-                    speed = speed[-1]
-                else:
-                    speed = "1" # Default speed as string "1"
-                    
-                if len(time_in_us):
-                    time_in_us = time_in_us[-1]
-                else:
-                    time_in_us = "1"
-                    
-                if len(progress_match):
-                    if progress_match[-1] == "end":
-                        LOGGER.info(progress_match[-1])
-                        isDone = True
-                        break
-                
-                execution_time = TimeFormatter((time.time() - COMPRESSION_START_TIME) * 1000)
-                elapsed_time = int(time_in_us) / 1000000
-                
-                try:
-                    difference = math.floor((total_time - elapsed_time) / float(speed))
-                except:
-                    difference = 0
-                
-                ETA = "-"
-                if difference > 0:
-                    ETA = TimeFormatter(difference * 1000)
+async def run_ffmpeg(command, on_progress=None, on_spawn=None, input_stream=None) -> Tuple[Optional[int], list]:
+    """
+    Run ffmpeg, streaming `-progress pipe:1` blocks to on_progress as they arrive.
+    Chunks from `input_stream` are written to ffmpeg's stdin (`-i pipe:0`).
+    Returns the exit code and the last STDERR_TAIL_LINES lines of stderr.
+    """
+    if on_progress:
+        command = [command[0], "-progress", "pipe:1", "-nostats", *command[1:]]
+    
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if input_stream is not None else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    
+    if on_spawn:
+        on_spawn(process)
+    
+    stderr_tail = deque(maxlen=STDERR_TAIL_LINES)
+    tasks = [
+        _read_progress(process.stdout, on_progress),
+        _read_stderr(process.stderr, stderr_tail)
+    ]
+    if input_stream is not None:
+        tasks.append(_feed_stdin(process, input_stream))
+    try:
+        await asyncio.gather(*tasks)
+        await process.wait()
+    except asyncio.CancelledError:
+        # A cancelled caller must not leave the encoder running
+        if process.returncode is None:
+            process.kill()
+        raise
+    
+    return process.returncode, list(stderr_tail)
 
-                percentage = math.floor(elapsed_time * 100 / total_time) if total_time > 0 else 0 # Added check for total_time > 0
-                percentage = min(percentage, 100)  # Cap at 100%
-                
-                # Updated to use markdown bold for telegram compatibility and consistency with new file
-                progress_str = "📊 **Progress:** {0}%\\n[{1}{2}]".format( 
-                    round(percentage, 2),
-                    ''.join([FINISHED_PROGRESS_STR for i in range(math.floor(percentage / 10))]),
-                    ''.join([UN_FINISHED_PROGRESS_STR for i in range(10 - math.floor(percentage / 10))])
-                )
-                
-                stats = f'📦️ **Compressing** {target_percentage}%\\n\\n' \
-                       f'⏰️ **ETA:** {ETA}\\n\\n' \
-                       f'{progress_str}\\n'
-                
-                try:
-                    await message.edit_text(
-                        text=stats,
-                        reply_markup=InlineKeyboardMarkup([[
-                            InlineKeyboardButton('❌ Cancel ❌', callback_data='cancel_compression') # Updated callback_data
-                        ]])
-                    )
-                except:
-                    pass
-                
-                try:
-                    if bug:
-                        await bug.edit_text(text=stats)
-                except:
-                    pass
-                    
+async def _feed_stdin(process, input_stream):
+    """Write source chunks into ffmpeg as they arrive, then signal EOF"""
+    try:
+        async for chunk in input_stream:
+            process.stdin.write(chunk)
+            await process.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        LOGGER.warning("ffmpeg closed its input before the stream ended")
+    except Exception as e:
+        # A truncated input must not look like a finished encode
+        LOGGER.error(f"Input stream error: {e}")
+        process.kill()
+    finally:
+        process.stdin.close()
+
+async def _read_progress(stream, on_progress):
+    """Parse -progress key=value lines incrementally, one event per block"""
+    block = {}
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        if not on_progress:
+            continue
+        
+        key, sep, value = line.decode(errors='ignore').strip().partition('=')
+        if not sep:
+            continue
+        block[key] = value
+        
+        # `progress=` terminates every block ffmpeg writes
+        if key == "progress":
+            try:
+                await on_progress(block)
             except Exception as e:
                 LOGGER.error(f"Progress monitoring error: {e}")
-                continue # Continue loop on error
+            block = {}
+
+async def _read_stderr(stream, tail):
+    """Keep only the most recent stderr lines in a bounded ring buffer"""
+    while True:
+        line = await stream.readline()
+        if not line:
+            break
+        tail.append(line.decode(errors='ignore').rstrip())
+
+def progress_seconds(block) -> float:
+    """Encoded output position of a progress block, in seconds"""
+    # out_time_ms is in microseconds too; older ffmpeg builds only emit that one
+    for key in ("out_time_us", "out_time_ms"):
+        value = block.get(key, "")
+        if value.isdigit():
+            return int(value) / 1000000
+    return 0
+
+# Automatic resolution / frame-rate ladder driven by bits-per-pixel
+def select_output_ladder(video: Dict[str, Any], target_bitrate: int, preset: str = "ultrafast") -> Optional[str]:
+    """Return a -vf chain that downscales / caps fps for the target bitrate, or None"""
+    width = video.get('width', 0)
+    height = video.get('height', 0)
+    fps = video.get('fps', 0) or 30
+    if not width or not height or target_bitrate <= 0:
+        return None
+    
+    # Work on the short side so portrait and rotated sources get the same rungs
+    short_side = min(width, height)
+    aspect = max(width, height) / short_side
+    
+    def bits_per_pixel(side, rate):
+        return target_bitrate / (side * side * aspect * rate)
+    
+    # Dropping every n-th frame is the cheapest pixel-rate cut, so try it first;
+    # an integer divisor keeps motion even, otherwise clamp to the cap
+    out_fps = fps
+    if fps > DOWNSCALE_MAX_FPS and bits_per_pixel(short_side, fps) < DOWNSCALE_MIN_BPP:
+        divisor = math.ceil(fps / DOWNSCALE_MAX_FPS)
+        out_fps = fps / divisor if fps / divisor >= 24 else DOWNSCALE_MAX_FPS
+    
+    candidates = [short_side] + [
+        rung for rung in RESOLUTION_LADDER
+        if DOWNSCALE_MIN_HEIGHT <= rung < short_side
+    ]
+    out_side = candidates[-1]
+    for side in candidates:
+        if bits_per_pixel(side, out_fps) >= DOWNSCALE_MIN_BPP:
+            out_side = side
+            break
+    
+    filters = []
+    if out_fps != fps:
+        filters.append(f"fps={round(out_fps, 3)}")
+    if out_side != short_side:
+        filters.append(scale_filter(out_side, preset))
+    
+    if not filters:
+        return None
+    
+    LOGGER.info(
+        f"Output ladder: {width}x{height}@{fps:.2f} -> short side {out_side}@{out_fps:.2f} "
+        f"for {target_bitrate} bps"
+    )
+    return ",".join(filters)
+
+def scale_filter(short_side: int, preset: str = "ultrafast") -> str:
+    """Scale so the short side becomes short_side, for landscape and portrait alike"""
+    flags = SCALER_FLAGS.get(preset, 'lanczos')
+    return f"scale='if(gte(iw,ih),-2,{short_side})':'if(gte(iw,ih),{short_side},-2)':flags={flags}"
 
-        # Wait for the subprocess to finish
-        stdout, stderr = await process.communicate()
+def bitrate_args(filesize, target_percentage, total_time, audio_bitrate=0) -> Tuple[int, list]:
+    """
+    Video bitrate that shrinks filesize by target_percentage, and its ffmpeg
+    args. Audio is stream-copied, so its audio_bitrate (bits/s) comes out of
+    the budget, leaving the video at least half of it.
+    """
+    calculated_percentage = 100 - target_percentage
+    target_size = (calculated_percentage / 100) * filesize
+    total_bitrate = int(math.floor(target_size * 8 / total_time))
+    target_bitrate = max(total_bitrate - int(audio_bitrate or 0), total_bitrate // 2)
+    
+    return target_bitrate, video_bitrate_args(target_bitrate)
+
+def video_bitrate_args(target_bitrate) -> list:
+    """ffmpeg args asking for target_bitrate (bits/s) of video"""
+    # Whole kilobits: rounding to "2M" would turn 2.9 Mbit/s into 2
+    if target_bitrate // 1000 > 1:
+        bitrate = str(int(target_bitrate) // 1000) + "k"
+    else:
+        bitrate = "500k"  # Minimum bitrate added from new file
+    
+    return ["-b:v", bitrate, "-bufsize", bitrate]
+
+async def encode_renditions(video_file, output_directory, total_time, profiles, message=None, bug=None,
+                            start: float = 0) -> Dict[str, str]:
+    """
+    Encode several outputs from one decode of video_file, read from `start`.
+
+    Each profile is a dict with a 'name' and either 'target_percentage'
+    (bitrate mode, auto-downscaled like convert_video) or 'crf'. Optional
+    keys: 'height' (short side), 'preset' (otherwise the tuned one; threads
+    always come from the tuned profile), 'duration' (seconds from `start`)
+    and 'audio' (False drops the audio track).
+    Returns {name: output path} for the outputs that were written.
+    """
+    try:
+        if not profiles:
+            return {}
         
-        e_response = stderr.decode().strip() if stderr else "" # Better handling for empty stderr/stdout
-        t_response = stdout.decode().strip() if stdout else ""
+        filesize = os.stat(video_file).st_size
         
-        LOGGER.info(f"FFmpeg stdout: {t_response}")
-        if e_response:
-            LOGGER.error(f"FFmpeg stderr: {e_response}")
+        graph = [f"[0:v]split={len(profiles)}" + "".join(f"[s{i}]" for i in range(len(profiles)))]
+        outputs = []
+        paths = {}
+        stamp = str(round(time.time()))
         
-        # Clean up progress files added from new file
-        try:
-            if os.path.exists(progress):
-                os.remove(progress)
-            if os.path.exists(status):
-                os.remove(status)
-        except:
-            pass
+        for i, profile in enumerate(profiles):
+            preset = profile.get('preset') or encoder_profile()['preset']
+            filters = []
+            
+            if profile.get('crf') is not None:
+                rate_control = ["-crf", str(profile['crf'])]
+            else:
+                target_bitrate, rate_control = bitrate_args(filesize, profile['target_percentage'], total_time)
+                if ENABLE_AUTO_DOWNSCALE and not profile.get('height'):
+                    probe = await get_media_probe(video_file)
+                    ladder_filter = select_output_ladder(probe.video, target_bitrate, preset)
+                    if ladder_filter:
+                        filters.append(ladder_filter)
+            
+            if profile.get('height'):
+                filters.append(scale_filter(profile['height'], preset))
+            
+            graph.append(f"[s{i}]{','.join(filters) or 'null'}[v{i}]")
+            
+            paths[profile['name']] = os.path.join(output_directory, f"{stamp}_{profile['name']}.mp4")
+            outputs += [
+                "-map", f"[v{i}]",
+                *(["-map", "0:a:0?", "-c:a", "copy"] if profile.get('audio', True) else ["-an"]),
+                "-c:v", "libx264", *rate_control,
+                *encoder_args(preset), "-tune", "film",
+                *(["-t", str(profile['duration'])] if profile.get('duration') else []),
+                paths[profile['name']]
+            ]
         
-        if os.path.lexists(out_put_file_name):
-            return out_put_file_name
+        command = [
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            *(["-ss", str(start)] if start else []), "-i", video_file,
+            "-filter_complex", ";".join(graph),
+            *outputs
+        ]
+        
+        on_progress = None
+        on_spawn = None
+        if message:
+            label = "/".join(str(p.get('target_percentage', 'auto')) for p in profiles)
+            on_progress = progress_reporter(message, bug, total_time, label)
+            on_spawn = pid_recorder(output_directory + "/status.json", message)
+        
+        returncode, stderr_tail = await run_ffmpeg(command, on_progress=on_progress, on_spawn=on_spawn)
+        if returncode != 0:
+            LOGGER.error(f"Rendition encode exited with {returncode}: " + "\n".join(stderr_tail))
+            for path in paths.values():
+                if os.path.exists(path):
+                    os.remove(path)
+            return {}
+        
+        return {name: path for name, path in paths.items() if os.path.lexists(path)}
+        
+    except Exception as e:
+        LOGGER.error(f"Rendition encode error: {e}")
+        return {}
+
+async def encode_preview(video_file, output_directory, total_time, target_percentage, isAuto=False) -> Optional[str]:
+    """
+    Encode a short low-res clip from the middle of the source at the requested
+    quality, fast enough to send while the full encode is still running
+    """
+    try:
+        out_put_file_name = os.path.join(output_directory, str(round(time.time())) + "_preview.mp4")
+        length = min(PREVIEW_SECONDS, total_time)
+        start = max(0, total_time / 2 - length / 2)
+        
+        index = await get_keyframe_index(video_file)
+        if index:
+            # The first keyframe is at 0.0, which is a valid start, not a missing one
+            keyframe = index.keyframe_before(start)
+            start = keyframe if keyframe is not None else start
+        
+        video = (await get_media_probe(video_file)).video
+        short_side = min(video.get('width', 0), video.get('height', 0))
+        out_side = min(PREVIEW_HEIGHT, short_side) if short_side else PREVIEW_HEIGHT
+        
+        if isAuto:
+            rate_control = ["-crf", str((AUTO_CRF_MIN + AUTO_CRF_MAX) // 2)]
         else:
+            # Same bits per pixel as the full encode, so the preview shows its quality
+            target_bitrate, _ = bitrate_args(os.stat(video_file).st_size, target_percentage, total_time)
+            if short_side:
+                target_bitrate = target_bitrate * (out_side / short_side) ** 2
+            bitrate = str(max(int(target_bitrate // 1000), 100)) + "k"
+            rate_control = ["-b:v", bitrate, "-bufsize", bitrate]
+        
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", str(start), "-i", video_file, "-t", str(length),
+            "-map", "0:v:0", "-map", "0:a:0?",
+            "-vf", scale_filter(out_side, encoder_profile()['preset']),
+            "-c:v", "libx264", *rate_control,
+            *encoder_args(), "-tune", "film",
+            "-c:a", "copy",
+            "-movflags", "+faststart",
+            out_put_file_name
+        ])
+        
+        if returncode != 0:
+            LOGGER.warning("Preview encode failed: " + "\n".join(stderr_tail))
             return None
-            
+        
+        return out_put_file_name if os.path.lexists(out_put_file_name) else None
+        
     except Exception as e:
-        LOGGER.error(f"Video conversion error: {e}")
+        LOGGER.error(f"Preview encode error: {e}")
         return None
 
-# Updated media_info to use asyncio.create_subprocess_exec (from new file)
-async def media_info(saved_file_path):
-    """Get media information using ffmpeg"""
+# Per-title auto mode: short probe encodes on sampled windows pick the CRF
+async def select_auto_crf(video_file, output_directory, total_time, preset="ultrafast") -> Optional[int]:
+    """Pick a CRF that brings this source to DEFAULT_COMPRESSION% smaller output"""
+    # Per-source directory, so concurrent batch encodes do not share samples
+    sample_dir = os.path.join(output_directory, "auto_samples_" + os.path.basename(video_file))
     try:
-        process = await asyncio.create_subprocess_exec(
-            'ffmpeg',   
-            "-hide_banner",   
-            '-i',   
-            saved_file_path,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+        if not total_time or total_time <= 0:
+            return None
+        
+        # Every window is encoded once per probe CRF, so the window length is
+        # shrunk until the whole sampling pass fits the configured budget
+        probe_crfs = sorted({AUTO_CRF_MIN, (AUTO_CRF_MIN + AUTO_CRF_MAX) // 2, AUTO_CRF_MAX})
+        budget = total_time * AUTO_SAMPLE_BUDGET / 100
+        window = min(AUTO_SAMPLE_SECONDS, budget / (AUTO_SAMPLE_COUNT * len(probe_crfs)))
+        if window < 1:
+            LOGGER.info("Source too short for sampled auto mode, using encoder defaults")
+            return None
+        
+        os.makedirs(sample_dir, exist_ok=True)
+        starts = [
+            max(0, total_time * (i + 0.5) / AUTO_SAMPLE_COUNT - window / 2)
+            for i in range(AUTO_SAMPLE_COUNT)
+        ]
+        
+        # Start windows on keyframes so the probe encodes skip the seek preroll.
+        # With long GOPs several windows snap to the same keyframe; those keep
+        # their own start, so the samples still cover different parts of the video
+        keyframe_index = await get_keyframe_index(video_file)
+        if keyframe_index:
+            snapped = []
+            for start in starts:
+                keyframe = keyframe_index.keyframe_before(start)
+                snapped.append(start if keyframe is None or keyframe in snapped else keyframe)
+            starts = snapped
+        
+        probe = await get_media_probe(video_file)
+        samples = await asyncio.gather(*[
+            _encode_sample_window(video_file, sample_dir, index, start, window, probe_crfs, preset)
+            for index, start in enumerate(starts)
+        ])
+        samples = [sample for sample in samples if sample]
+        if not samples:
+            LOGGER.warning("All auto mode probe encodes failed, using encoder defaults")
+            return None
+        
+        sampled_seconds = window * len(samples)
+        video_rates = [
+            (crf, sum(sample.get(crf, 0) for sample in samples) * 8 / sampled_seconds)
+            for crf in probe_crfs
+        ]
+        video_rates = [(crf, rate) for crf, rate in video_rates if rate > 0]
+        if not video_rates:
+            return None
         
-        stdout, stderr = await process.communicate()
-        output = stderr.decode().strip() if stderr else "" # ffmpeg often prints info to stderr
+        # Audio is stream-copied, so only what is left of the goal goes to video
+        filesize = os.stat(video_file).st_size
+        goal_bytes = filesize * (100 - DEFAULT_COMPRESSION) / 100
+        audio_bitrate = probe.audio.get('bitrate', 0)
+        video_budget = (goal_bytes * 8 - audio_bitrate * total_time) / total_time
         
-        # Regex from new file for consistency, though old one was functional
-        duration = re.search("Duration:\\s*(\\d*):(\\d*):(\\d+\\.?\\d*)[\\s\\w*$]", output)
-        bitrates = re.search("bitrate:\\s*(\\d+)[\\s\\w*$]", output)
+        crf = _interpolate_crf(video_rates, video_budget)
+        LOGGER.info(
+            f"Auto mode: sampled {len(samples)}x{window:.1f}s, "
+            f"rates {[(c, int(r)) for c, r in video_rates]}, budget {int(video_budget)} bps -> CRF {crf}"
+        )
+        return crf
+        
+    except Exception as e:
+        LOGGER.error(f"Auto CRF selection error: {e}")
+        return None
+    finally:
+        shutil.rmtree(sample_dir, ignore_errors=True)
 
-        if duration is not None:
-            hours = int(duration.group(1))
-            minutes = int(duration.group(2))
-            seconds = math.floor(float(duration.group(3)))
-            total_seconds = (hours * 60 * 60) + (minutes * 60) + seconds
-        else:
-            total_seconds = None
-            
-        if bitrates is not None:
-            bitrate = bitrates.group(1)
-        else:
-            bitrate = None
-            
-        return total_seconds, bitrate
+async def _encode_sample_window(video_file, sample_dir, index, start, length, crfs, preset) -> Dict[int, int]:
+    """Encode one sampled window at every probe CRF from a single decode"""
+    outputs = await encode_renditions(
+        video_file, sample_dir, length,
+        [
+            {'name': f"{index}_{crf}", 'crf': crf, 'preset': preset, 'duration': length, 'audio': False}
+            for crf in crfs
+        ],
+        start=start
+    )
+    if not outputs:
+        LOGGER.warning(f"Probe encode at {start:.1f}s failed")
+        return {}
+    
+    return {crf: os.path.getsize(outputs[f"{index}_{crf}"]) for crf in crfs if f"{index}_{crf}" in outputs}
+
+def _interpolate_crf(video_rates, video_budget) -> int:
+    """Solve for the CRF whose bitrate meets the budget, log-linear between probes"""
+    if video_budget <= 0:
+        return AUTO_CRF_MAX
+    
+    # Already under budget at the best probed quality: spend no more bits
+    if video_rates[0][1] <= video_budget:
+        return video_rates[0][0]
+    
+    for (low_crf, low_rate), (high_crf, high_rate) in zip(video_rates, video_rates[1:]):
+        if high_rate <= video_budget <= low_rate:
+            if low_rate == high_rate:
+                return high_crf
+            fraction = (math.log(low_rate) - math.log(video_budget)) / (math.log(low_rate) - math.log(high_rate))
+            return min(high_crf, math.ceil(low_crf + fraction * (high_crf - low_crf)))
+    
+    # Even the worst allowed quality misses the goal; the quality floor wins
+    return AUTO_CRF_MAX
+
+# Encoders whose output can sit next to stream-copied packets of the same codec
+SMART_CUT_ENCODERS = {'h264': 'libx264', 'hevc': 'libx265'}
+
+# Rewrite copied packets with their parameter sets in-band, so they still decode behind another part's headers
+INBAND_HEADER_FILTERS = {'h264': 'h264_mp4toannexb', 'hevc': 'hevc_mp4toannexb'}
+
+def smart_cut_encoder(codec) -> Optional[str]:
+    """Encoder for `codec` that this ffmpeg build actually has, else None"""
+    encoder = SMART_CUT_ENCODERS.get(codec)
+    return encoder if encoder and has_encoder(encoder) else None
+
+# Seconds past the re-encoded head that an exact trim decodes to check the join
+JOIN_CHECK_SECONDS = 2
+
+async def trim_video(video_file, output_directory, start, end, exact=False, on_spawn=None) -> Optional[str]:
+    """
+    Cut [start, end) by stream copy. Copy cuts begin on the keyframe at or
+    before start; with `exact` only the GOP before the first keyframe inside
+    the range is re-encoded and joined to the copied remainder. The joined
+    file is decoded across the boundary, and a keyframe cut is returned
+    instead when any frame there fails to decode.
+    """
+    work_dir = os.path.join(output_directory, "trim_" + str(round(time.time())))
+    try:
+        out_put_file_name = os.path.join(output_directory, str(round(time.time())) + "_trim.mp4")
+        os.makedirs(work_dir, exist_ok=True)
+        
+        index = await get_keyframe_index(video_file)
+        key_before = index.keyframe_before(start) if index else None
+        if key_before is None:
+            key_before = start
+        
+        if not exact or abs(key_before - start) < 0.001:
+            return await _copy_segment(video_file, key_before, end, out_put_file_name, on_spawn)
+        
+        probe = await get_media_probe(video_file)
+        encoder = smart_cut_encoder(probe.video.get('codec', ''))
+        key_after = index.keyframe_after(start) if index else None
+        
+        if encoder is None or key_after is None or key_after >= end:
+            # Nothing to copy after the boundary, or a codec we cannot match: encode it all
+            returncode, stderr_tail = await run_ffmpeg([
+                "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+                "-ss", str(start), "-i", video_file, "-t", str(end - start),
+                "-map", "0:v:0", "-map", "0:a?",
+                "-c:v", "libx264", "-crf", "18", "-preset", "veryfast",
+                "-c:a", "copy",
+                out_put_file_name
+            ], on_spawn=on_spawn)
+            if returncode != 0:
+                LOGGER.error("Trim encode failed: " + "\n".join(stderr_tail))
+                return None
+            return out_put_file_name
+        
+        # The joined MP4 keeps only the head's codec headers, so both parts carry
+        # their SPS/PPS in-band as well; the head also uses the source's profile
+        # and level so one decoder setup fits both. The parts are video only:
+        # copied audio keeps its pre-roll, which concat would play as a delay,
+        # so the audio is copied from the source in the final mux instead
+        head = os.path.join(work_dir, "head.mp4")
+        tail = os.path.join(work_dir, "tail.mp4")
+        head_task = run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", str(start), "-i", video_file, "-t", str(key_after - start),
+            "-map", "0:v:0",
+            "-c:v", encoder, "-crf", "18", "-preset", "veryfast",
+            *h264_profile_args(encoder, probe.video.get('profile'), probe.video.get('level', 0)),
+            *REPEAT_HEADERS.get(encoder, []),
+            head
+        ], on_spawn=on_spawn)
+        tail_task = run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-ss", str(key_after), "-i", video_file, "-t", str(end - key_after),
+            "-map", "0:v:0",
+            "-c", "copy", "-bsf:v", INBAND_HEADER_FILTERS[probe.video['codec']],
+            tail
+        ], on_spawn=on_spawn)
+        for returncode, stderr_tail in await asyncio.gather(head_task, tail_task):
+            if returncode != 0:
+                LOGGER.error("Trim boundary encode failed: " + "\n".join(stderr_tail))
+                return None
+        
+        concat_list = os.path.join(work_dir, "concat.txt")
+        with open(concat_list, 'w') as f:
+            f.write("file 'head.mp4'\nfile 'tail.mp4'\n")
+        
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "concat", "-safe", "0", "-i", concat_list,
+            "-ss", str(start), "-i", video_file,
+            "-map", "0:v", "-map", "1:a?", "-c", "copy", "-t", str(end - start),
+            out_put_file_name
+        ], on_spawn=on_spawn)
+        if returncode != 0 or not await _decodes_cleanly(out_put_file_name, key_after - start + JOIN_CHECK_SECONDS):
+            LOGGER.warning("Trim join did not verify, falling back to a keyframe cut: " + "\n".join(stderr_tail))
+            return await _copy_segment(video_file, key_before, end, out_put_file_name, on_spawn)
+        return out_put_file_name
         
     except Exception as e:
-        LOGGER.error(f"Error getting media info: {e}")
-        return None, None
+        LOGGER.error(f"Trim error: {e}")
+        return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-# Updated take_screen_shot to include more video extensions and quality flag (from new file)
-async def take_screen_shot(video_file, output_directory, ttl):
-    """Generate video thumbnail"""
+async def _decodes_cleanly(video_file, seconds: float) -> bool:
+    """Whether every video packet in the first `seconds` of video_file decodes to a frame"""
+    process = await asyncio.create_subprocess_exec(
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-count_frames", "-count_packets", "-read_intervals", f"%+{seconds:.3f}",
+        "-show_entries", "stream=nb_read_frames,nb_read_packets", "-of", "json", video_file,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    stdout, stderr = await process.communicate()
     try:
-        out_put_file_name = os.path.join(
-            output_directory,
-            str(time.time()) + ".jpg"
+        stream = json.loads(stdout.decode(errors='ignore'))['streams'][0]
+        frames, packets = int(stream['nb_read_frames']), int(stream['nb_read_packets'])
+    except (ValueError, KeyError, IndexError):
+        return False
+    
+    if process.returncode != 0 or stderr.strip() or not packets or frames != packets:
+        LOGGER.warning(f"Join check: {frames} of {packets} frames decoded {stderr.decode(errors='ignore').strip()[-200:]}")
+        return False
+    return True
+
+async def _copy_segment(video_file, start, end, out_put_file_name, on_spawn=None) -> Optional[str]:
+    """Stream copy [start, end) of video_file"""
+    return await _copy_to_container(
+        ["-ss", str(start), "-i", video_file, "-t", str(end - start)],
+        out_put_file_name,
+        on_spawn
+    )
+
+async def _copy_to_container(input_args, out_put_file_name, on_spawn=None) -> Optional[str]:
+    """Stream copy the inputs to MP4, falling back to MKV when the codecs do not fit in MP4"""
+    for output in (out_put_file_name, os.path.splitext(out_put_file_name)[0] + ".mkv"):
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            *input_args,
+            "-map", "0:v:0", "-map", "0:a?",
+            "-c", "copy", "-avoid_negative_ts", "make_zero",
+            output
+        ], on_spawn=on_spawn)
+        if returncode == 0 and os.path.lexists(output):
+            return output
+        LOGGER.warning(f"Stream copy to {output} failed: " + "\n".join(stderr_tail))
+        if os.path.exists(output):
+            os.remove(output)
+    return None
+
+# Audio encoders for normalising merge inputs to the common audio codec
+MERGE_AUDIO_ENCODERS = {'aac': 'aac', 'opus': 'libopus', 'mp3': 'libmp3lame', 'ac3': 'ac3'}
+
+# Re-encoded parts carry their parameter sets in-band so decoders pick them up mid-stream
+# ffprobe profile names -> libx264 -profile:v, so normalised parts match the copied ones
+X264_PROFILES = {
+    'Constrained Baseline': 'baseline', 'Baseline': 'baseline', 'Main': 'main',
+    'High': 'high', 'High 10': 'high10', 'High 4:2:2': 'high422', 'High 4:4:4 Predictive': 'high444'
+}
+
+REPEAT_HEADERS = {
+    'libx264': ["-x264-params", "repeat-headers=1"],
+    'libx265': ["-x265-params", "repeat-headers=1"]
+}
+
+def h264_profile_args(encoder: str, profile: Optional[str], level: int) -> list:
+    """libx264 -profile:v/-level for an ffprobe profile name and level (31 -> 3.1)"""
+    if encoder != 'libx264' or profile not in X264_PROFILES:
+        return []
+    args = ["-profile:v", X264_PROFILES[profile]]
+    if level > 0:
+        args += ["-level:v", f"{level / 10:.1f}"]
+    return args
+
+def _stream_signature(probe: MediaProbe) -> tuple:
+    """
+    Everything the concat demuxer needs to match for a stream-copy join. The
+    output keeps one set of codec headers (the first part's), so profile,
+    level, reordering and the parameter sets themselves must match too.
+    """
+    video, audio = probe.video, probe.audio
+    return (
+        video.get('codec'), video.get('width'), video.get('height'),
+        round(video.get('fps', 0), 2), video.get('pix_fmt'),
+        audio.get('codec'), audio.get('sample_rate'), audio.get('channels'),
+        video.get('profile'), video.get('level'), video.get('has_b_frames'), video.get('extradata')
+    )
+
+async def merge_videos(video_files, output_directory, on_spawn=None) -> Optional[str]:
+    """
+    Join video_files in order. Inputs matching the most common stream
+    profile are stream-copied; only the others are transcoded to it first.
+    """
+    work_dir = os.path.join(output_directory, "merge_" + str(round(time.time())))
+    try:
+        out_put_file_name = os.path.join(output_directory, str(round(time.time())) + "_merged.mp4")
+        os.makedirs(work_dir, exist_ok=True)
+        
+        probes = await asyncio.gather(*[get_media_probe(f) for f in video_files])
+        if not all(probe.has_video for probe in probes):
+            LOGGER.error("Merge: every input needs a video stream")
+            return None
+        
+        signatures = [_stream_signature(probe) for probe in probes]
+        target = max(signatures, key=lambda sig: (signatures.count(sig), -signatures.index(sig)))
+        video_codec, width, height, fps, pix_fmt, audio_codec, sample_rate, channels = target[:8]
+        
+        encoder = smart_cut_encoder(video_codec)
+        if audio_codec is None and any(probe.has_audio for probe in probes):
+            # Keep the sound of the clips that have it; silent ones get a silent track
+            audio_codec = 'aac'
+        if encoder is None or (audio_codec and not has_encoder(MERGE_AUDIO_ENCODERS.get(audio_codec, ''))):
+            # No encoder for the common profile: normalise everything to H.264/AAC instead
+            encoder = 'libx264'
+            video_codec, pix_fmt = 'h264', 'yuv420p'
+            audio_codec = 'aac' if audio_codec else None
+        target = (video_codec, width, height, fps, pix_fmt, audio_codec, sample_rate or 48000, channels or 2) + target[8:]
+        video_codec, width, height, fps, pix_fmt, audio_codec, sample_rate, channels = target[:8]
+        
+        # The concat demuxer does not rescale between parts, so every part
+        # must use the video time base of the first copied input
+        time_base = next(
+            (probe.video.get('time_base') for probe, sig in zip(probes, signatures) if sig == target),
+            None
         )
+        timescale = ["-video_track_timescale", time_base.split('/')[1]] if time_base and '/' in time_base else []
         
-        if video_file.upper().endswith(("MKV", "MP4", "WEBM", "AVI", "MOV", "FLV", "WMV")): # Added more extensions
-            file_genertor_command = [
-                "ffmpeg",
-                "-y", # Added -y to overwrite output files without asking
-                "-ss",
-                str(ttl),
-                "-i",
-                video_file,
-                "-vframes",
-                "1",
-                "-q:v", # Added quality flag for better thumbnail generation
-                "2",
-                out_put_file_name
-            ]
+        # The joined file keeps only the first part's codec headers, so every
+        # part carries its parameter sets in-band: copied parts through the
+        # bitstream filter, transcoded ones through REPEAT_HEADERS
+        inband = ["-bsf:v", INBAND_HEADER_FILTERS[video_codec]] if video_codec in INBAND_HEADER_FILTERS else []
+        
+        parts = []
+        for index, (video_file, signature, probe) in enumerate(zip(video_files, signatures, probes)):
+            part = os.path.join(work_dir, f"part_{index}.mp4")
             
-            process = await asyncio.create_subprocess_exec(
-                *file_genertor_command,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE,
-            )
+            if signature == target:
+                if not inband and probe.video.get('time_base') == time_base:
+                    parts.append(video_file)
+                    continue
+                
+                returncode, stderr_tail = await run_ffmpeg([
+                    "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", video_file,
+                    "-map", "0:v:0", "-map", "0:a?", "-c", "copy", *inband, *timescale, part
+                ], on_spawn=on_spawn)
+                if returncode != 0:
+                    LOGGER.error(f"Merge: remuxing input {index + 1} failed: " + "\n".join(stderr_tail))
+                    return None
+                parts.append(part)
+                continue
             
-            stdout, stderr = await process.communicate()
+            LOGGER.info(f"Merge: transcoding input {index + 1} {signature} -> {target}")
             
-            e_response = stderr.decode().strip() if stderr else ""
-            t_response = stdout.decode().strip() if stdout else ""
+            filters = [
+                f"scale={width}:{height}:force_original_aspect_ratio=decrease",
+                f"pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+                "setsar=1",
+                f"fps={fps}"
+            ]
+            if pix_fmt:
+                filters.append(f"format={pix_fmt}")
             
-            if e_response:
-                LOGGER.warning(f"Thumbnail generation warning: {e_response}")
+            command = ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", video_file]
+            needs_silence = audio_codec and not probe.has_audio
+            if needs_silence:
+                layout = 'mono' if channels == 1 else 'stereo'
+                command += ["-f", "lavfi", "-i", f"anullsrc=r={sample_rate}:cl={layout}"]
             
-            if os.path.lexists(out_put_file_name):
-                return out_put_file_name
+            command += ["-map", "0:v:0"]
+            if audio_codec:
+                command += ["-map", "1:a:0", "-shortest"] if needs_silence else ["-map", "0:a:0"]
+                command += ["-c:a", MERGE_AUDIO_ENCODERS[audio_codec], "-ar", str(sample_rate), "-ac", str(channels)]
             else:
-                return None
-        else:
-            return None
+                command += ["-an"]
+            command += [
+                "-vf", ",".join(filters),
+                "-c:v", encoder, "-crf", "20", "-preset", "veryfast",
+                *h264_profile_args(encoder, target[8], target[9]),
+                *REPEAT_HEADERS.get(encoder, []),
+                *timescale,
+                part
+            ]
             
+            returncode, stderr_tail = await run_ffmpeg(command, on_spawn=on_spawn)
+            if returncode != 0:
+                LOGGER.error(f"Merge: transcoding input {index + 1} failed: " + "\n".join(stderr_tail))
+                return None
+            parts.append(part)
+        
+        concat_list = os.path.join(work_dir, "concat.txt")
+        with open(concat_list, 'w') as f:
+            for part in parts:
+                escaped = os.path.abspath(part).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+        
+        return await _copy_to_container(["-f", "concat", "-safe", "0", "-i", concat_list], out_put_file_name, on_spawn)
+        
     except Exception as e:
-        LOGGER.error(f"Error generating thumbnail: {e}")
+        LOGGER.error(f"Merge error: {e}")
         return None
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
 
-# Functions below are from ffmpeg (1).py and are included for completeness/enhancement
+# Containers that take each audio codec as-is, for stream-copy extraction
+AUDIO_CONTAINERS = {
+    'aac': '.m4a', 'alac': '.m4a', 'mp3': '.mp3', 'opus': '.ogg', 'vorbis': '.ogg',
+    'flac': '.flac', 'ac3': '.ac3', 'eac3': '.eac3'
+}
+
+# Target codec -> (encoder, container) for audio-only compression
+AUDIO_ENCODERS = {
+    'opus': ('libopus', '.ogg'),
+    'aac': ('aac', '.m4a')
+}
 
-async def get_media_info_detailed(file_path: str) -> Dict[str, Any]:
-    """Get detailed media information using ffprobe (from ffmpeg (1).py)"""
+async def extract_audio(video_file, output_directory, on_spawn=None) -> Optional[str]:
+    """Pull the first audio track out by stream copy, into a container that fits its codec"""
     try:
-        cmd = [
-            'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_format', '-show_streams', file_path
-        ]
+        codec = (await get_media_probe(video_file)).audio.get('codec')
+        if not codec:
+            LOGGER.warning(f"No audio track in {video_file}")
+            return None
         
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        out_put_file_name = os.path.join(
+            output_directory,
+            str(round(time.time())) + "_audio" + AUDIO_CONTAINERS.get(codec, '.mka')
         )
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", video_file,
+            "-map", "0:a:0", "-vn", "-c:a", "copy",
+            out_put_file_name
+        ], on_spawn=on_spawn)
+        if returncode != 0:
+            LOGGER.error("Audio extraction failed: " + "\n".join(stderr_tail))
+            return None
+        return out_put_file_name
         
-        stdout, stderr = await process.communicate()
+    except Exception as e:
+        LOGGER.error(f"Audio extraction error: {e}")
+        return None
+
+async def compress_audio(audio_file, output_directory, bitrate_kbps, codec="opus", on_spawn=None) -> Optional[str]:
+    """Re-encode only the audio to Opus/AAC at bitrate_kbps; no video decode or filters"""
+    try:
+        encoder, extension = AUDIO_ENCODERS.get(codec, AUDIO_ENCODERS['opus'])
+        if not has_encoder(encoder):
+            LOGGER.warning(f"{encoder} is not in this FFmpeg build, using AAC")
+            encoder, extension = AUDIO_ENCODERS['aac']
+        out_put_file_name = os.path.join(output_directory, str(round(time.time())) + "_compressed" + extension)
+        
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-i", audio_file,
+            "-map", "0:a:0", "-vn", "-sn", "-dn",
+            "-map_metadata", "0",
+            "-c:a", encoder, "-b:a", f"{int(bitrate_kbps)}k",
+            out_put_file_name
+        ], on_spawn=on_spawn)
+        if returncode != 0:
+            LOGGER.error("Audio compression failed: " + "\n".join(stderr_tail))
+            return None
+        return out_put_file_name
         
-        if process.returncode == 0:
-            info = json.loads(stdout.decode())
-            return parse_media_info(info)
-        else:
-            LOGGER.error(f"FFprobe error: {stderr.decode()}")
-            return {}
-            
     except Exception as e:
-        LOGGER.error(f"Error getting detailed media info: {e}")
-        return {}
+        LOGGER.error(f"Audio compression error: {e}")
+        return None
 
-def parse_media_info(info: Dict[str, Any]) -> Dict[str, Any]:
-    """Parse ffprobe output into useful information (from ffmpeg (1).py)"""
+async def take_screen_shot(video_file, output_directory, ttl):
+    """
+    Telegram-ready thumbnail from the keyframe at or before ttl. Only
+    keyframes are decoded, so the seek costs one frame, not a GOP.
+    """
     try:
-        format_info = info.get('format', {})
-        streams = info.get('streams', [])
-        
-        video_stream = next((s for s in streams if s['codec_type'] == 'video'), None)
-        audio_stream = next((s for s in streams if s['codec_type'] == 'audio'), None)
-        
-        duration = float(format_info.get('duration', 0))
-        bitrate = int(format_info.get('bit_rate', 0))
-        size = int(format_info.get('size', 0))
-        
-        result = {
-            'duration': duration,
-            'bitrate': bitrate,
-            'size': size,
-            'format': format_info.get('format_name', ''),
-            'video': {},
-            'audio': {}
-        }
-        
-        if video_stream:
-            result['video'] = {
-                'codec': video_stream.get('codec_name', ''),
-                'width': int(video_stream.get('width', 0)),
-                'height': int(video_stream.get('height', 0)),
-                'fps': eval(video_stream.get('r_frame_rate', '0/1')) if video_stream.get('r_frame_rate') else 0,
-                'bitrate': int(video_stream.get('bit_rate', 0)) if video_stream.get('bit_rate') else 0
-            }
+        out_put_file_name = os.path.join(
+            output_directory,
+            str(time.time()) + ".jpg"
+        )
         
-        if audio_stream:
-            result['audio'] = {
-                'codec': audio_stream.get('codec_name', ''),
-                'bitrate': int(audio_stream.get('bit_rate', 0)) if audio_stream.get('bit_rate') else 0,
-                'sample_rate': int(audio_stream.get('sample_rate', 0)) if audio_stream.get('sample_rate') else 0,
-                'channels': int(audio_stream.get('channels', 0)) if audio_stream.get('channels') else 0
-            }
+        # The job's probe is cached, so this costs no extra process
+        probe = await get_media_probe(video_file)
+        if not probe.has_video:
+            return None
         
-        return result
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-skip_frame", "nokey", "-noaccurate_seek",
+            "-ss", str(ttl), "-i", video_file,
+            *thumbnail_output_args(out_put_file_name)
+        ])
+        if returncode != 0:
+            LOGGER.warning("Thumbnail generation failed: " + "\n".join(stderr_tail))
+        
+        return out_put_file_name if usable_thumbnail(out_put_file_name) else None
         
     except Exception as e:
-        LOGGER.error(f"Error parsing media info: {e}")
-        return {}
+        LOGGER.error(f"Error generating thumbnail: {e}")
+        return None
 
-async def check_ffmpeg_availability() -> bool:
-    """Check if ffmpeg and ffprobe are available (from ffmpeg (1).py)"""
+def thumbnail_output_args(out_put_file_name, at: Optional[float] = None) -> list:
+    """
+    ffmpeg output options for one Telegram thumbnail (JPEG, longest side
+    THUMBNAIL_MAX_SIDE). With `at`, the first frame at or after that many
+    seconds is taken, so the output can ride along a full encode's decode.
+    """
+    filters = [f"scale={THUMBNAIL_MAX_SIDE}:{THUMBNAIL_MAX_SIDE}:force_original_aspect_ratio=decrease"]
+    if at is not None:
+        filters.insert(0, f"select=gte(t\\,{at:.3f})")
+    return [
+        "-map", "0:v:0", "-an", "-sn",
+        "-vf", ",".join(filters),
+        "-frames:v", "1", "-q:v", str(THUMBNAIL_QUALITY), "-update", "1",
+        out_put_file_name
+    ]
+
+def usable_thumbnail(path) -> bool:
+    """Telegram silently drops thumbnails over its size limit"""
+    return bool(path) and os.path.isfile(path) and 0 < os.path.getsize(path) <= THUMBNAIL_MAX_BYTES
+
+async def contact_sheet(video_file, output_directory, count: int, on_spawn=None) -> Optional[str]:
+    """
+    Tile `count` evenly spaced frames into one JPEG in a single ffmpeg pass.
+    Only keyframes are decoded: the first keyframe in each of `count` equal
+    slots of the timeline is kept, so a slot with no keyframe is left out and
+    the grid is sized for the slots that have one.
+    """
     try:
-        # Check ffmpeg
-        process = await asyncio.create_subprocess_exec(
-            'ffmpeg', '-version',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        await process.communicate()
+        out_put_file_name = os.path.join(output_directory, str(round(time.time())) + "_screens.jpg")
         
-        if process.returncode != 0:
-            LOGGER.error("FFmpeg not found or not working")
-            return False
+        probe = await get_media_probe(video_file)
+        if not probe.has_video or not probe.duration:
+            LOGGER.error("Contact sheet: no video stream or unknown duration")
+            return None
+        
+        slot = probe.duration / count
         
-        # Check ffprobe
-        process = await asyncio.create_subprocess_exec(
-            'ffprobe', '-version',
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
+        # Sparse-GOP sources have fewer keyframes than slots; size the grid for what will be picked
+        index = await get_keyframe_index(video_file)
+        if index and len(index.key_pts):
+            count = max(1, min(count, len({math.floor(t / slot) for t in index.key_pts if t < probe.duration})))
+        columns = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / columns)
+        
+        # A frame is kept when it falls in a later slot than the last kept one
+        select = (
+            f"select='isnan(prev_selected_t)+gt(floor((t-{probe.start_time:.3f})/{slot:.3f})\\,"
+            f"floor((prev_selected_t-{probe.start_time:.3f})/{slot:.3f}))'"
         )
-        await process.communicate()
+        returncode, stderr_tail = await run_ffmpeg([
+            "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+            "-skip_frame", "nokey", "-i", video_file,
+            "-map", "0:v:0", "-an", "-sn", "-dn",
+            "-vf", f"{select},scale={SCREENS_TILE_WIDTH}:-2,tile={columns}x{rows}:padding=4:margin=4",
+            *fps_mode_args("vfr"), "-frames:v", "1", "-q:v", "3",
+            out_put_file_name
+        ], on_spawn=on_spawn)
         
-        if process.returncode != 0:
-            LOGGER.error("FFprobe not found or not working")
-            return False
+        if returncode != 0 or not os.path.exists(out_put_file_name):
+            LOGGER.error("Contact sheet failed: " + "\n".join(stderr_tail))
+            return None
+        return out_put_file_name
         
-        return True
+    except Exception as e:
+        LOGGER.error(f"Contact sheet error: {e}")
+        return None
+
+# Functions below are from ffmpeg (1).py and are included for completeness/enhancement
+
+async def check_ffmpeg_availability() -> bool:
+    """Check that ffmpeg and ffprobe run, loading their capability snapshot at boot"""
+    try:
+        return await load_capabilities() is not None
         
     except Exception as e:
         LOGGER.error(f"Error checking ffmpeg availability: {e}")
@@ -0,0 +1,188 @@
+# bot/helper_funcs/fingerprint.py - Perceptual fingerprints to reuse results across re-uploads
+
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Optional
+
+from bot import (
+    FINGERPRINT_MAX_DISTANCE,
+    FINGERPRINT_CACHE_ENTRIES,
+    ENABLE_AUTO_DOWNSCALE,
+    DOWNSCALE_MIN_BPP,
+    DOWNSCALE_MIN_HEIGHT,
+    DOWNSCALE_MAX_FPS,
+    ENABLE_SIZE_MODEL
+)
+from bot.helper_funcs.cache_db import cache_db
+from bot.helper_funcs.capabilities import fps_mode_args
+from bot.helper_funcs.autotune import encoder_profile
+from bot.helper_funcs.size_model import corrections_active
+
+LOGGER = logging.getLogger(__name__)
+
+# Frames sampled per video, and the grey thumbnail each is reduced to before hashing
+FINGERPRINT_FRAMES = 8
+SAMPLE_SIDE = 32
+HASH_SIDE = 8
+HASH_BYTES = FINGERPRINT_FRAMES * HASH_SIDE * HASH_SIDE // 8
+
+# Near-identical frames with almost no detail (black, fades) hash to all zeros
+MIN_SET_BITS = 4
+
+# Durations of copies of one clip differ by container rounding, not by seconds
+DURATION_TOLERANCE = 0.5
+
+# Candidates compared per lookup, newest first
+LOOKUP_LIMIT = 500
+
+FINGERPRINT_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    settings TEXT NOT NULL,
+    duration REAL NOT NULL,
+    hash BLOB NOT NULL,
+    file_id TEXT NOT NULL,
+    created REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_lookup ON results (settings, duration);
+"""
+
+def result_settings(target_percentage, isAuto) -> str:
+    """
+    Everything besides the source that shapes an output: quality, the x264
+    preset, the ladder limits and whether size-model corrections apply.
+    Changing any of them starts a new key, so older outputs stop matching.
+    """
+    preset = encoder_profile()['preset']
+    ladder = (
+        f"{DOWNSCALE_MIN_BPP}:{DOWNSCALE_MIN_HEIGHT}:{DOWNSCALE_MAX_FPS}" if ENABLE_AUTO_DOWNSCALE else "off"
+    )
+    sizing = "corrected" if ENABLE_SIZE_MODEL and not isAuto and corrections_active(preset) else "plain"
+    return "|".join([
+        "auto" if isAuto else str(target_percentage),
+        f"preset={preset}",
+        f"ladder={ladder}",
+        f"size={sizing}"
+    ])
+
+async def video_fingerprint(video_file: str, duration: float) -> Optional[bytes]:
+    """
+    Average hash of FINGERPRINT_FRAMES evenly spaced frames, HASH_BYTES long.
+    One ffmpeg process seeks to every sample point, shrinks each frame to
+    SAMPLE_SIDE² grey pixels and pipes them out as rawvideo. Returns None
+    when the video is too short, too uniform or NumPy is missing.
+    """
+    try:
+        import numpy as np
+    except ImportError:
+        LOGGER.warning("NumPy is not installed; result reuse is disabled")
+        return None
+
+    try:
+        if not duration or duration < FINGERPRINT_FRAMES:
+            return None
+
+        inputs, chains = [], []
+        for index in range(FINGERPRINT_FRAMES):
+            # Sample points sit mid-slot so a trailing black frame is never picked
+            inputs += ["-ss", f"{duration * (index + 0.5) / FINGERPRINT_FRAMES:.3f}", "-i", video_file]
+            chains.append(
+                f"[{index}:v:0]trim=end_frame=1,scale={SAMPLE_SIDE}:{SAMPLE_SIDE}:flags=area,"
+                f"format=gray,setsar=1,setpts=PTS-STARTPTS[f{index}]"
+            )
+        labels = "".join(f"[f{index}]" for index in range(FINGERPRINT_FRAMES))
+
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-hide_banner", "-loglevel", "error", *inputs,
+            "-filter_complex", ";".join(chains) + f";{labels}concat=n={FINGERPRINT_FRAMES}:v=1:a=0[out]",
+            "-map", "[out]", *fps_mode_args("passthrough"), "-f", "rawvideo", "-pix_fmt", "gray", "pipe:1",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        stdout, stderr = await process.communicate()
+
+        frame_size = SAMPLE_SIDE * SAMPLE_SIDE
+        if process.returncode != 0 or len(stdout) < FINGERPRINT_FRAMES * frame_size:
+            LOGGER.warning(f"Fingerprint sampling failed: {stderr.decode(errors='ignore').strip()[-200:]}")
+            return None
+
+        # Mean of each block gives HASH_SIDE² cells per frame; a bit is set where a cell is above its frame's mean
+        block = SAMPLE_SIDE // HASH_SIDE
+        frames = np.frombuffer(stdout[:FINGERPRINT_FRAMES * frame_size], dtype=np.uint8)
+        cells = frames.reshape(FINGERPRINT_FRAMES, HASH_SIDE, block, HASH_SIDE, block).mean(axis=(2, 4))
+        bits = (cells > cells.mean(axis=(1, 2), keepdims=True)).reshape(FINGERPRINT_FRAMES, -1)
+
+        if (bits.sum(axis=1) < MIN_SET_BITS).sum() > FINGERPRINT_FRAMES // 2:
+            return None
+        return np.packbits(bits, axis=1).tobytes()
+
+    except Exception as e:
+        LOGGER.error(f"Fingerprint error: {e}")
+        return None
+
+def find_result(fingerprint: Optional[bytes], duration: float, settings: str) -> Optional[str]:
+    """
+    Telegram file_id of an earlier output made with the same settings from a
+    near-identical source: duration within DURATION_TOLERANCE and every
+    sampled frame within FINGERPRINT_MAX_DISTANCE differing bits.
+    """
+    store = cache_db("fingerprints", FINGERPRINT_SCHEMA)
+    if not fingerprint or not store:
+        return None
+    try:
+        import numpy as np
+
+        rows = store.execute(
+            "SELECT hash, file_id FROM results WHERE settings = ? AND duration BETWEEN ? AND ? "
+            "ORDER BY created DESC LIMIT ?",
+            (settings, duration - DURATION_TOLERANCE, duration + DURATION_TOLERANCE, LOOKUP_LIMIT)
+        ).fetchall()
+        rows = [row for row in rows if len(row[0]) == HASH_BYTES]
+        if not rows:
+            return None
+
+        # Hamming distance of every candidate, per sampled frame, in one pass
+        candidates = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.uint8).reshape(len(rows), HASH_BYTES)
+        differing = np.unpackbits(candidates ^ np.frombuffer(fingerprint, dtype=np.uint8), axis=1)
+        per_frame = differing.reshape(len(rows), FINGERPRINT_FRAMES, -1).sum(axis=2)
+
+        matches = np.flatnonzero(per_frame.max(axis=1) <= FINGERPRINT_MAX_DISTANCE)
+        if not len(matches):
+            return None
+        best = matches[per_frame[matches].sum(axis=1).argmin()]
+        LOGGER.info(f"Fingerprint match at distance {int(per_frame[best].sum())}")
+        return rows[best][1]
+
+    except (sqlite3.Error, ImportError) as e:
+        LOGGER.warning(f"Fingerprint lookup failed: {e}")
+        return None
+
+def remember_result(fingerprint: Optional[bytes], duration: float, settings: str, file_id: Optional[str]):
+    """Record a delivered output so later copies of the same clip can reuse it"""
+    store = cache_db("fingerprints", FINGERPRINT_SCHEMA)
+    if not fingerprint or not file_id or not store:
+        return
+    try:
+        store.execute(
+            "INSERT INTO results (settings, duration, hash, file_id, created) VALUES (?, ?, ?, ?, ?)",
+            (settings, duration, fingerprint, file_id, time.time())
+        )
+        store.execute(
+            "DELETE FROM results WHERE id IN "
+            "(SELECT id FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)",
+            (FINGERPRINT_CACHE_ENTRIES,)
+        )
+    except sqlite3.Error as e:
+        LOGGER.warning(f"Fingerprint store failed: {e}")
+
+def forget_result(file_id: str):
+    """Drop an entry whose file Telegram no longer serves"""
+    store = cache_db("fingerprints", FINGERPRINT_SCHEMA)
+    if not store:
+        return
+    try:
+        store.execute("DELETE FROM results WHERE file_id = ?", (file_id,))
+    except sqlite3.Error as e:
+        LOGGER.warning(f"Fingerprint delete failed: {e}")
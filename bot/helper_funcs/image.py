@@ -0,0 +1,144 @@
+# bot/helper_funcs/image.py - Image compression in a worker process pool
+
+import asyncio
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, List
+
+from bot import IMAGE_WORKERS
+
+LOGGER = logging.getLogger(__name__)
+
+# Extensions treated as images when sent as documents
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tif', '.tiff')
+
+# Image types Pillow cannot open without plugins (HEIC/HEIF needs pillow-heif)
+UNSUPPORTED_IMAGE_TYPES = ('image/heic', 'image/heif')
+
+# Output format -> (Pillow format name, extension)
+IMAGE_FORMATS = {
+    'jpeg': ('JPEG', '.jpg'),
+    'webp': ('WEBP', '.webp')
+}
+
+# Quality search range when fitting a target size
+MIN_QUALITY = 10
+MAX_QUALITY = 95
+
+_pool = None
+
+def is_image_message(message) -> bool:
+    """Photos, and documents that are images by MIME type or extension"""
+    if message.photo:
+        return True
+    document = message.document
+    if not document:
+        return False
+    mime_type = document.mime_type or ''
+    if mime_type in UNSUPPORTED_IMAGE_TYPES:
+        return False
+    if mime_type.startswith('image/'):
+        return True
+    return os.path.splitext(document.file_name or '')[1].lower() in IMAGE_EXTENSIONS
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """Shared pool so Pillow's CPU work never runs on the event loop"""
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: a fork would copy the event loop, Pyrogram's threads and open handles
+        _pool = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS or os.cpu_count() or 1,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _pool
+
+def shutdown_image_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def _encode(image, pil_format: str, quality: int) -> bytes:
+    buffer = io.BytesIO()
+    options = {'method': 6} if pil_format == 'WEBP' else {'optimize': True, 'progressive': True}
+    # Only pixels are written: no EXIF, ICC profile, XMP or comments carry over
+    image.save(buffer, format=pil_format, quality=quality, **options)
+    return buffer.getvalue()
+
+def compress_image_sync(image_file: str, output_file: str, max_dimension: int, image_format: str,
+                        quality: Optional[int] = None, target_size: Optional[int] = None) -> Optional[str]:
+    """
+    Resize to fit max_dimension, re-encode and strip metadata. With target_size,
+    binary-search the highest quality that fits; otherwise use `quality`.
+    Returns image_file itself when re-encoding would not make it smaller.
+    Runs in a worker process, so it must stay a picklable top-level function.
+    """
+    from PIL import Image, ImageOps
+
+    pil_format, _ = IMAGE_FORMATS.get(image_format, IMAGE_FORMATS['jpeg'])
+
+    with Image.open(image_file) as source:
+        # Bake the EXIF rotation into the pixels before the tag is dropped
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'L') and pil_format == 'JPEG':
+            image = image.convert('RGB')
+        elif image.mode not in ('RGB', 'RGBA', 'L'):
+            image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+        if max(image.size) > max_dimension:
+            image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+        if target_size:
+            low, high = MIN_QUALITY, MAX_QUALITY
+            data = _encode(image, pil_format, low)
+            while low <= high:
+                middle = (low + high) // 2
+                candidate = _encode(image, pil_format, middle)
+                if len(candidate) <= target_size:
+                    data = candidate
+                    low = middle + 1
+                else:
+                    high = middle - 1
+        else:
+            data = _encode(image, pil_format, quality or MAX_QUALITY)
+
+    if len(data) >= os.path.getsize(image_file):
+        return image_file
+
+    with open(output_file, 'wb') as f:
+        f.write(data)
+    return output_file
+
+async def compress_image(image_file: str, output_directory: str, max_dimension: int,
+                         image_format: str = "jpeg", quality: Optional[int] = None,
+                         target_size: Optional[int] = None) -> Optional[str]:
+    """Compress one image in the process pool"""
+    try:
+        _, extension = IMAGE_FORMATS.get(image_format, IMAGE_FORMATS['jpeg'])
+        base = os.path.basename(image_file).replace('.', '_')
+        output_file = os.path.join(output_directory, f"{base}_{round(time.time())}_compressed{extension}")
+
+        return await asyncio.get_running_loop().run_in_executor(
+            get_image_pool(), compress_image_sync,
+            image_file, output_file, max_dimension, image_format, quality, target_size
+        )
+
+    except Exception as e:
+        LOGGER.error(f"Image compression error for {image_file}: {e}")
+        return None
+
+async def compress_images(image_files: List[str], output_directory: str, max_dimension: int,
+                          image_format: str = "jpeg", quality: Optional[int] = None,
+                          target_percentage: Optional[int] = None) -> List[Optional[str]]:
+    """Compress a batch in parallel across the pool; failed entries come back as None"""
+    return await asyncio.gather(*[
+        compress_image(
+            image_file, output_directory, max_dimension, image_format, quality,
+            int(os.path.getsize(image_file) * (100 - target_percentage) / 100) if target_percentage else None
+        )
+        for image_file in image_files
+    ])
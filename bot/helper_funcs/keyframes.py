@@ -0,0 +1,168 @@
+# bot/helper_funcs/keyframes.py - Keyframe/packet index per source file
+
+import asyncio
+import logging
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Optional, List, Tuple
+
+LOGGER = logging.getLogger(__name__)
+
+# Indexes kept for running jobs; the oldest is dropped past this many
+INDEX_CACHE_SIZE = 8
+
+class KeyframeIndex:
+    """
+    Video packets of one source in decode order, stored column-wise in arrays
+    (timestamp, byte offset, size, keyframe flag) with a separate sorted
+    keyframe timestamp column for O(log n) seeks. Timestamps are seconds
+    from the start of the stream.
+    """
+
+    def __init__(self):
+        self.pts = array('d')
+        self.pos = array('q')
+        self.size = array('l')
+        self.keyframe = bytearray()
+        self.key_pts = array('d')
+        self.key_rows = array('l')
+
+    def append(self, pts: float, pos: int, size: int, is_key: bool):
+        if is_key:
+            self.key_pts.append(pts)
+            self.key_rows.append(len(self.pts))
+        self.pts.append(pts)
+        self.pos.append(pos)
+        self.size.append(size)
+        self.keyframe.append(1 if is_key else 0)
+
+    def __len__(self) -> int:
+        return len(self.pts)
+
+    def keyframe_before(self, t: float) -> Optional[float]:
+        """Timestamp of the last keyframe at or before t"""
+        i = bisect_right(self.key_pts, t)
+        return self.key_pts[i - 1] if i else (self.key_pts[0] if self.key_pts else None)
+
+    def keyframe_after(self, t: float) -> Optional[float]:
+        """Timestamp of the first keyframe at or after t"""
+        i = bisect_left(self.key_pts, t)
+        return self.key_pts[i] if i < len(self.key_pts) else None
+
+    def keyframes_between(self, start: float, end: float) -> List[float]:
+        return list(self.key_pts[bisect_left(self.key_pts, start):bisect_left(self.key_pts, end)])
+
+    def byte_offset(self, t: float) -> Optional[int]:
+        """File position of the keyframe a decoder would start from to reach t"""
+        i = bisect_right(self.key_pts, t)
+        if not i:
+            return None
+        pos = self.pos[self.key_rows[i - 1]]
+        return pos if pos >= 0 else None
+
+    def split_points(self, chunk_seconds: float, duration: float) -> List[Tuple[float, float]]:
+        """(start, length) windows of about chunk_seconds that each begin on a keyframe"""
+        starts = [0.0]
+        target = chunk_seconds
+        while target < duration:
+            key = self.keyframe_after(target)
+            if key is None or key >= duration:
+                break
+            if key > starts[-1]:
+                starts.append(key)
+            target = key + chunk_seconds
+
+        ends = starts[1:] + [duration]
+        return [(start, end - start) for start, end in zip(starts, ends)]
+
+_cache = OrderedDict()
+_building = {}
+
+def _cache_key(video_file: str):
+    stat = os.stat(video_file)
+    return (os.path.abspath(video_file), stat.st_size, stat.st_mtime)
+
+async def build_keyframe_index(video_file: str) -> Optional[KeyframeIndex]:
+    """Index the first video stream's packets with a single ffprobe pass"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffprobe", "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,pos,size,flags",
+            "-of", "csv=p=0",
+            video_file,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL
+        )
+
+        index = KeyframeIndex()
+        async for line in process.stdout:
+            fields = line.decode().strip().split(',')
+            if len(fields) < 4:
+                continue
+            try:
+                pts = float(fields[0])
+            except ValueError:
+                # Packets without a timestamp cannot be seeked to
+                continue
+            pos = int(fields[2]) if fields[2].lstrip('-').isdigit() else -1
+            index.append(pts, pos, int(fields[1] or 0), 'K' in fields[3])
+
+        await process.wait()
+        if process.returncode != 0 or not len(index):
+            LOGGER.warning(f"Could not index packets of {video_file}")
+            return None
+
+        # Times are kept relative to the first packet, matching what ffmpeg -ss expects
+        origin = min(index.pts)
+        if origin:
+            index.pts = array('d', (t - origin for t in index.pts))
+            index.key_pts = array('d', (t - origin for t in index.key_pts))
+
+        # Keyframes arrive in decode order; B-frame reordering can leave them unsorted
+        if any(a > b for a, b in zip(index.key_pts, index.key_pts[1:])):
+            pairs = sorted(zip(index.key_pts, index.key_rows))
+            index.key_pts = array('d', (p for p, _ in pairs))
+            index.key_rows = array('l', (r for _, r in pairs))
+
+        LOGGER.info(f"Indexed {len(index)} packets, {len(index.key_pts)} keyframes of {video_file}")
+        return index
+
+    except Exception as e:
+        LOGGER.error(f"Keyframe index error: {e}")
+        return None
+
+async def get_keyframe_index(video_file: str) -> Optional[KeyframeIndex]:
+    """Return the cached index for this source, building it once per job"""
+    try:
+        key = _cache_key(video_file)
+    except OSError:
+        return None
+
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    # Concurrent stages asking for the same source share one ffprobe run
+    if key not in _building:
+        _building[key] = asyncio.ensure_future(build_keyframe_index(video_file))
+    task = _building[key]
+    try:
+        index = await asyncio.shield(task)
+    finally:
+        if task.done():
+            _building.pop(key, None)
+
+    if index is not None:
+        _cache[key] = index
+        while len(_cache) > INDEX_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
+
+def release_keyframe_index(video_file: str):
+    """Drop every cached index of this path once its job is done"""
+    path = os.path.abspath(video_file)
+    for key in [key for key in _cache if key[0] == path]:
+        del _cache[key]
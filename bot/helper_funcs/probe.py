@@ -0,0 +1,241 @@
+# bot/helper_funcs/probe.py - One ffprobe call per source, shared by every stage
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+
+from bot import PROBE_CACHE_ENTRIES
+from bot.helper_funcs.cache_db import cache_db
+from bot.helper_funcs.checkpoint import source_identity
+from bot.helper_funcs.keyframes import get_keyframe_index, KeyframeIndex
+
+LOGGER = logging.getLogger(__name__)
+
+# Probes kept in memory for running jobs; the oldest is dropped past this many
+PROBE_CACHE_SIZE = 32
+
+# On-disk store: raw ffprobe JSON keyed by "tg:<file_unique_id>" and "local:<identity>"
+PROBE_STORE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS probes (
+    key TEXT PRIMARY KEY,
+    data TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS probes_last_used ON probes (last_used);
+"""
+
+class MediaProbeError(Exception):
+    """ffprobe failed or the file has nothing it can read"""
+
+def _parse_frame_rate(rate: Optional[str]) -> float:
+    """Parse an ffprobe rational like '30000/1001' without eval()"""
+    try:
+        if not rate:
+            return 0
+        numerator, _, denominator = rate.partition('/')
+        denominator = float(denominator) if denominator else 1.0
+        return float(numerator) / denominator if denominator else 0
+    except ValueError:
+        return 0
+
+def _int(value) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+def _float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+class MediaProbe:
+    """
+    Parsed `ffprobe -show_format -show_streams` of one file.
+
+    `video` and `audio` describe the first stream of each kind (empty dicts
+    when absent); `streams` keeps every raw stream for anything else.
+    Durations are seconds as floats, bitrates bits per second.
+    """
+
+    def __init__(self, path: str, data: Dict[str, Any]):
+        self.path = path
+        self.data = data
+        self.format = data.get('format', {})
+        self.streams: List[Dict[str, Any]] = data.get('streams', [])
+
+        self.format_name = self.format.get('format_name', '')
+        self.size = _int(self.format.get('size')) or os.path.getsize(path)
+        self.bitrate = _int(self.format.get('bit_rate'))
+        self.start_time = _float(self.format.get('start_time'))
+
+        video_stream = next((s for s in self.streams if s.get('codec_type') == 'video'
+                             and not (s.get('disposition') or {}).get('attached_pic')), None)
+        audio_stream = next((s for s in self.streams if s.get('codec_type') == 'audio'), None)
+
+        self.video: Dict[str, Any] = {}
+        if video_stream:
+            self.video = {
+                'codec': video_stream.get('codec_name', ''),
+                'width': _int(video_stream.get('width')),
+                'height': _int(video_stream.get('height')),
+                'fps': _parse_frame_rate(video_stream.get('avg_frame_rate'))
+                       or _parse_frame_rate(video_stream.get('r_frame_rate')),
+                'pix_fmt': video_stream.get('pix_fmt'),
+                'time_base': video_stream.get('time_base'),
+                'bitrate': _int(video_stream.get('bit_rate')),
+                'frames': _int(video_stream.get('nb_frames')),
+                # Streams with B-frames reorder, so packet and display order differ
+                'has_b_frames': _int(video_stream.get('has_b_frames')) > 0,
+                'profile': video_stream.get('profile'),
+                'level': _int(video_stream.get('level')),
+                # Parameter sets (SPS/PPS); probes stored before the hash was asked for only have the size
+                'extradata': video_stream.get('extradata_hash') or video_stream.get('extradata_size')
+            }
+
+        self.audio: Dict[str, Any] = {}
+        if audio_stream:
+            self.audio = {
+                'codec': audio_stream.get('codec_name', ''),
+                'bitrate': _int(audio_stream.get('bit_rate')),
+                'sample_rate': _int(audio_stream.get('sample_rate')),
+                'channels': _int(audio_stream.get('channels'))
+            }
+
+        # Containers without a format duration (some TS/MKV) still carry it per stream
+        self.duration = _float(self.format.get('duration')) or max(
+            [_float(s.get('duration')) for s in self.streams] or [0.0]
+        )
+        if not self.bitrate and self.duration:
+            self.bitrate = int(self.size * 8 / self.duration)
+
+    @property
+    def fps(self) -> float:
+        return self.video.get('fps', 0)
+
+    @property
+    def has_video(self) -> bool:
+        return bool(self.video)
+
+    @property
+    def has_audio(self) -> bool:
+        return bool(self.audio)
+
+    async def keyframes(self) -> Optional[KeyframeIndex]:
+        """Keyframe index of the video stream, built on first use and shared"""
+        return await get_keyframe_index(self.path) if self.video else None
+
+    def __repr__(self) -> str:
+        return f"<MediaProbe {os.path.basename(self.path)} {self.duration:.3f}s {self.video} {self.audio}>"
+
+    @classmethod
+    async def run(cls, path: str) -> "MediaProbe":
+        """Probe `path`, raising MediaProbeError with ffprobe's reason on failure"""
+        try:
+            process = await asyncio.create_subprocess_exec(
+                'ffprobe', '-v', 'error', '-print_format', 'json',
+                '-show_format', '-show_streams', '-show_data_hash', 'SHA256', path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            stdout, stderr = await process.communicate()
+        except OSError as e:
+            raise MediaProbeError(f"could not run ffprobe: {e}")
+
+        if process.returncode != 0:
+            raise MediaProbeError(stderr.decode(errors='ignore').strip() or f"ffprobe exited with {process.returncode}")
+
+        try:
+            data = json.loads(stdout.decode(errors='ignore'))
+        except ValueError as e:
+            raise MediaProbeError(f"unreadable ffprobe output: {e}")
+
+        if not data.get('streams'):
+            raise MediaProbeError("no audio or video streams found")
+
+        return cls(path, data)
+
+_cache = OrderedDict()
+
+def _load_stored(keys: List[str]) -> Optional[Dict[str, Any]]:
+    store = cache_db("probe_cache", PROBE_STORE_SCHEMA)
+    if not store:
+        return None
+    try:
+        for key in keys:
+            row = store.execute("SELECT data FROM probes WHERE key = ?", (key,)).fetchone()
+            if row:
+                store.execute("UPDATE probes SET last_used = ? WHERE key = ?", (time.time(), key))
+                return json.loads(row[0])
+    except (sqlite3.Error, ValueError) as e:
+        LOGGER.warning(f"Probe cache read failed: {e}")
+    return None
+
+def _store(keys: List[str], data: Dict[str, Any]):
+    store = cache_db("probe_cache", PROBE_STORE_SCHEMA)
+    if not store:
+        return
+    try:
+        raw = json.dumps({'format': data.get('format', {}), 'streams': data.get('streams', [])})
+        now = time.time()
+        store.executemany(
+            "INSERT OR REPLACE INTO probes (key, data, last_used) VALUES (?, ?, ?)",
+            [(key, raw, now) for key in keys]
+        )
+        # Least recently used entries go once the store outgrows its budget
+        store.execute(
+            "DELETE FROM probes WHERE key IN "
+            "(SELECT key FROM probes ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (PROBE_CACHE_ENTRIES,)
+        )
+    except sqlite3.Error as e:
+        LOGGER.warning(f"Probe cache write failed: {e}")
+
+async def get_media_probe(path: str, file_unique_id: Optional[str] = None) -> MediaProbe:
+    """
+    Return the probe for this file: from memory for the running job, else
+    from the on-disk store (by Telegram file_unique_id, then by content
+    identity), running ffprobe only for sources never seen before
+    """
+    try:
+        stat = os.stat(path)
+    except OSError as e:
+        raise MediaProbeError(str(e))
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime)
+
+    if key in _cache:
+        _cache.move_to_end(key)
+        return _cache[key]
+
+    keys = [f"tg:{file_unique_id}"] if file_unique_id else []
+    data = _load_stored(keys) if keys else None
+    if data is None:
+        # Size plus head/tail hash: a re-downloaded copy maps to the same entry
+        keys.append(f"local:{source_identity(path)}")
+        data = _load_stored(keys[-1:])
+
+    if data is not None:
+        probe = MediaProbe(path, data)
+        if len(keys) > 1:
+            # Found by content; remember the Telegram id for the next time too
+            _store(keys[:1], data)
+    else:
+        probe = await MediaProbe.run(path)
+        _store(keys, probe.data)
+
+    _cache[key] = probe
+    while len(_cache) > PROBE_CACHE_SIZE:
+        _cache.popitem(last=False)
+    return probe
+
+def release_media_probe(path: str):
+    """Drop every cached probe of this path once its job is done"""
+    path = os.path.abspath(path)
+    for key in [key for key in _cache if key[0] == path]:
+        del _cache[key]
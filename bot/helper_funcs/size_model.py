@@ -0,0 +1,206 @@
+# bot/helper_funcs/size_model.py - Learn how far x264 lands from the requested bitrate on this host
+
+import json
+import logging
+import math
+import sqlite3
+import statistics
+import time
+from typing import Optional, Dict, Any, List
+
+from bot.helper_funcs.cache_db import cache_db
+
+LOGGER = logging.getLogger(__name__)
+
+# One row per percentage-mode job, plus running least-squares sums per preset
+SIZE_HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    created REAL NOT NULL,
+    codec TEXT,
+    height INTEGER,
+    source_bitrate INTEGER,
+    preset TEXT,
+    target INTEGER,
+    duration REAL,
+    audio_bitrate INTEGER,
+    requested_bitrate INTEGER,
+    target_bytes INTEGER,
+    predicted_bytes INTEGER,
+    actual_bytes INTEGER
+);
+CREATE TABLE IF NOT EXISTS model (
+    preset TEXT PRIMARY KEY,
+    xtx TEXT NOT NULL,
+    xty TEXT NOT NULL,
+    jobs INTEGER NOT NULL
+);
+"""
+
+# Rows kept for /status and later analysis
+HISTORY_ROWS = 5000
+
+# Older jobs count for less, so a changed host or ffmpeg is learnt again quickly
+FORGETTING = 0.98
+
+# Pulls the fit towards "the encoder hits the request" while data is scarce
+RIDGE = 2.0
+
+# Jobs needed before corrections are applied, and the largest correction either way
+MIN_JOBS = 5
+MAX_CORRECTION = 2.0
+
+def _features(requested_bitrate: float, source_bitrate: float, height: int) -> List[float]:
+    """Log bitrate, log compression ratio and frame height explain most ABR misses"""
+    return [
+        1.0,
+        math.log(requested_bitrate / 1e6),
+        math.log(max(source_bitrate, requested_bitrate) / requested_bitrate),
+        (height or 720) / 1080
+    ]
+
+def _solve(a: List[List[float]], b: List[float]) -> Optional[List[float]]:
+    """Gaussian elimination with partial pivoting; the system is only 4x4"""
+    n = len(b)
+    m = [row[:] + [b[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        for r in range(col + 1, n):
+            factor = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= factor * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+def _load(store, preset: str):
+    row = store.execute("SELECT xtx, xty, jobs FROM model WHERE preset = ?", (preset,)).fetchone()
+    if row:
+        return json.loads(row[0]), json.loads(row[1]), row[2]
+    size = len(_features(1e6, 1e6, 720))
+    return [[0.0] * size for _ in range(size)], [0.0] * size, 0
+
+def _coefficients(store, preset: str) -> Optional[List[float]]:
+    xtx, xty, jobs = _load(store, preset)
+    if jobs < MIN_JOBS:
+        return None
+    ridge = [[value + (RIDGE if i == j else 0.0) for j, value in enumerate(row)] for i, row in enumerate(xtx)]
+    return _solve(ridge, xty)
+
+def corrections_active(preset: str) -> bool:
+    """Whether plan_size currently changes the requested bitrate for this preset"""
+    store = cache_db("size_history", SIZE_HISTORY_SCHEMA)
+    if not store:
+        return False
+    try:
+        return _load(store, preset)[2] >= MIN_JOBS
+    except (sqlite3.Error, ValueError):
+        return False
+
+def _ratio(coefficients: Optional[List[float]], features: List[float]) -> float:
+    """Expected actual/requested video bitrate"""
+    if not coefficients:
+        return 1.0
+    log_ratio = sum(c * f for c, f in zip(coefficients, features))
+    limit = math.log(MAX_CORRECTION)
+    return math.exp(min(max(log_ratio, -limit), limit))
+
+def plan_size(target_bitrate: int, preset: str, video: Dict[str, Any], filesize: int, duration: float,
+              audio_bitrate: int, target_percentage: int) -> Dict[str, Any]:
+    """
+    Bitrate to ask x264 for so the video lands on target_bitrate, corrected by
+    this host's history, and the job record that record_job completes later
+    """
+    source_bitrate = int(filesize * 8 / duration)
+    height = min(video.get('width', 0), video.get('height', 0)) or video.get('height', 0)
+    requested = target_bitrate
+    ratio = 1.0
+
+    store = cache_db("size_history", SIZE_HISTORY_SCHEMA)
+    try:
+        coefficients = _coefficients(store, preset) if store else None
+        # The correction depends on the request itself; a few rounds settle it
+        for _ in range(3):
+            ratio = _ratio(coefficients, _features(requested, source_bitrate, height))
+            requested = int(min(max(target_bitrate / ratio, target_bitrate / MAX_CORRECTION),
+                                target_bitrate * MAX_CORRECTION))
+    except (sqlite3.Error, ValueError) as e:
+        LOGGER.warning(f"Size model unavailable: {e}")
+        requested, ratio = target_bitrate, 1.0
+
+    if requested != target_bitrate:
+        LOGGER.info(f"Size model: asking for {requested // 1000}k to get {target_bitrate // 1000}k ({preset})")
+
+    return {
+        'codec': video.get('codec'),
+        'height': height,
+        'source_bitrate': source_bitrate,
+        'preset': preset,
+        'target': target_percentage,
+        'duration': duration,
+        'audio_bitrate': int(audio_bitrate or 0),
+        'requested_bitrate': requested,
+        'target_bytes': int(filesize * (100 - target_percentage) / 100),
+        'predicted_bytes': int((requested * ratio + (audio_bitrate or 0)) * duration / 8)
+    }
+
+def record_job(job: Dict[str, Any], actual_bytes: int):
+    """Store predicted versus actual size and fold the job into its preset's fit"""
+    store = cache_db("size_history", SIZE_HISTORY_SCHEMA)
+    if not store or not actual_bytes or not job.get('duration'):
+        return
+    try:
+        store.execute(
+            "INSERT INTO jobs (created, codec, height, source_bitrate, preset, target, duration, audio_bitrate, "
+            "requested_bitrate, target_bytes, predicted_bytes, actual_bytes) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (time.time(), job['codec'], job['height'], job['source_bitrate'], job['preset'], job['target'],
+             job['duration'], job['audio_bitrate'], job['requested_bitrate'], job['target_bytes'],
+             job['predicted_bytes'], actual_bytes)
+        )
+        store.execute(
+            "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs ORDER BY id DESC LIMIT -1 OFFSET ?)",
+            (HISTORY_ROWS,)
+        )
+
+        # Whatever is not the copied audio is what the encoder actually spent on video
+        video_bitrate = actual_bytes * 8 / job['duration'] - job['audio_bitrate']
+        if video_bitrate <= 0:
+            return
+        x = _features(job['requested_bitrate'], job['source_bitrate'], job['height'])
+        y = math.log(video_bitrate / job['requested_bitrate'])
+
+        xtx, xty, jobs = _load(store, job['preset'])
+        xtx = [[FORGETTING * xtx[i][j] + x[i] * x[j] for j in range(len(x))] for i in range(len(x))]
+        xty = [FORGETTING * xty[i] + y * x[i] for i in range(len(x))]
+        store.execute(
+            "INSERT OR REPLACE INTO model (preset, xtx, xty, jobs) VALUES (?, ?, ?, ?)",
+            (job['preset'], json.dumps(xtx), json.dumps(xty), jobs + 1)
+        )
+        LOGGER.info(
+            f"Size model: target {job['target_bytes']} bytes, predicted {job['predicted_bytes']}, "
+            f"got {actual_bytes} ({actual_bytes / job['target_bytes'] - 1:+.1%})"
+        )
+    except (sqlite3.Error, ValueError) as e:
+        LOGGER.warning(f"Size history write failed: {e}")
+
+def size_model_summary() -> str:
+    """One line for /status: how close recent jobs came to the size users asked for"""
+    store = cache_db("size_history", SIZE_HISTORY_SCHEMA)
+    if not store:
+        return "unavailable"
+    try:
+        rows = store.execute(
+            "SELECT target_bytes, actual_bytes FROM jobs WHERE target_bytes > 0 ORDER BY id DESC LIMIT 20"
+        ).fetchall()
+        total = store.execute("SELECT COUNT(*) FROM jobs").fetchone()[0]
+    except sqlite3.Error:
+        return "unavailable"
+    if not rows:
+        return "no jobs recorded yet"
+    error = statistics.median(abs(actual / target - 1) for target, actual in rows)
+    return f"{total} jobs, last {len(rows)} within ±{error:.0%} of target (median)"
@@ -0,0 +1,112 @@
+# bot/helper_funcs/stream_encode.py - Encode while downloading
+
+import logging
+import os
+import struct
+from typing import Optional, AsyncIterator
+
+import aiofiles
+from pyrogram import Client
+from pyrogram.types import Message
+
+LOGGER = logging.getLogger(__name__)
+
+# Containers ffmpeg can demux front to back from a pipe
+STREAMABLE_EXTENSIONS = ('mkv', 'webm', 'ts', 'mts', 'm2ts')
+
+# ISO-BMFF containers; only streamable when the moov atom precedes mdat
+MP4_EXTENSIONS = ('mp4', 'm4v', 'mov', '3gp')
+
+def container_from(file_name: Optional[str], mime_type: Optional[str]) -> str:
+    """Best guess of the container extension from Telegram metadata"""
+    if file_name and '.' in file_name:
+        return os.path.splitext(file_name)[1].lower().lstrip('.')
+
+    mime_map = {
+        'video/mp4': 'mp4',
+        'video/quicktime': 'mov',
+        'video/x-matroska': 'mkv',
+        'video/webm': 'webm',
+        'video/mp2t': 'ts',
+        'video/3gpp': '3gp'
+    }
+    return mime_map.get((mime_type or '').lower(), '')
+
+def mp4_moov_first(head: bytes) -> bool:
+    """Walk top-level ISO-BMFF boxes in `head` and report whether moov comes before mdat"""
+    offset = 0
+    while offset + 8 <= len(head):
+        size, box_type = struct.unpack('>I4s', head[offset:offset + 8])
+        if box_type == b'moov':
+            return True
+        if box_type == b'mdat':
+            return False
+
+        if size == 1:
+            if offset + 16 > len(head):
+                return False
+            size = struct.unpack('>Q', head[offset + 8:offset + 16])[0]
+        elif size == 0:
+            # Box runs to end of file, nothing can follow it
+            return False
+
+        if size < 8:
+            return False
+        offset += size
+
+    return False
+
+def is_streamable(head: bytes, file_name: Optional[str], mime_type: Optional[str]) -> bool:
+    """Decide from the first downloaded chunk whether ffmpeg can encode from a pipe"""
+    # Trust the bytes over the file name: Matroska/WebM EBML header, TS sync bytes
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return True
+    if len(head) > 376 and head[0] == head[188] == head[376] == 0x47:
+        return True
+    if head[4:8] == b'ftyp':
+        return mp4_moov_first(head)
+
+    container = container_from(file_name, mime_type)
+
+    if container in STREAMABLE_EXTENSIONS:
+        return True
+
+    if container in MP4_EXTENSIONS:
+        return mp4_moov_first(head)
+
+    return False
+
+async def open_media_stream(client: Client, message: Message, file_name: Optional[str],
+                            mime_type: Optional[str]) -> Optional[AsyncIterator[bytes]]:
+    """
+    Start streaming `message`'s media and return a chunk iterator if the
+    container can be encoded while downloading, otherwise None
+    """
+    stream = client.stream_media(message)
+    try:
+        head = await stream.__anext__()
+    except StopAsyncIteration:
+        return None
+    except Exception as e:
+        LOGGER.warning(f"Could not start media stream: {e}")
+        await stream.aclose()
+        return None
+
+    if not is_streamable(head, file_name, mime_type):
+        LOGGER.info(f"{file_name or mime_type} is not streamable, using full download")
+        await stream.aclose()
+        return None
+
+    async def chunks():
+        yield head
+        async for chunk in stream:
+            yield chunk
+
+    return chunks()
+
+async def tee_to_file(stream: AsyncIterator[bytes], file_path: str) -> AsyncIterator[bytes]:
+    """Pass chunks through while also saving them, so later stages still have the source"""
+    async with aiofiles.open(file_path, 'wb') as f:
+        async for chunk in stream:
+            await f.write(chunk)
+            yield chunk
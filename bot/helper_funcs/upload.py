@@ -0,0 +1,186 @@
+# bot/helper_funcs/upload.py - Upload while encoding
+
+import asyncio
+import logging
+import math
+import os
+from typing import Optional
+
+from pyrogram import Client, raw, types, utils
+from pyrogram.errors import FilePartMissing
+from pyrogram.session import Session
+
+LOGGER = logging.getLogger(__name__)
+
+# Telegram requires every part except the last to be exactly this size
+UPLOAD_PART_SIZE = 512 * 1024
+
+# Streamed (unknown size) uploads are only allowed for big files
+BIG_FILE_THRESHOLD = 10 * 1024 * 1024
+
+# Seconds between checks of the growing output file
+POLL_INTERVAL = 1
+
+class StreamingUploader:
+    """
+    Upload a file that is still being written as Telegram big-file parts.
+
+    The writer must only append (fragmented MP4 with an empty moov does).
+    Parts are sent with file_total_parts=-1 while the size is unknown and
+    the real count on the last part, once finish() reports the writer exited.
+    """
+
+    def __init__(self, client: Client, file_path: str):
+        self.client = client
+        self.file_path = file_path
+        self.file_id = client.rnd_id()
+        self.parts_sent = 0
+        self.failed = False
+        self._finished = asyncio.Event()
+        self._task = None
+
+    def start(self):
+        """Begin tailing the output file in the background"""
+        self._task = asyncio.create_task(self._run())
+
+    def finish(self):
+        """Signal that the writer has exited and the file size is final"""
+        self._finished.set()
+
+    async def cancel(self):
+        """Stop uploading; the parts already sent are simply never committed"""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self):
+        session = Session(
+            self.client, await self.client.storage.dc_id(), await self.client.storage.auth_key(),
+            await self.client.storage.test_mode(), is_media=True
+        )
+
+        try:
+            await session.start()
+
+            while not os.path.exists(self.file_path):
+                if self._finished.is_set():
+                    self.failed = True
+                    return
+                await asyncio.sleep(POLL_INTERVAL)
+
+            with open(self.file_path, 'rb') as fp:
+                while True:
+                    done = self._finished.is_set()
+                    size = os.path.getsize(self.file_path)
+
+                    if done and size <= BIG_FILE_THRESHOLD:
+                        # Too small for a streamed upload; caller sends it normally
+                        self.failed = True
+                        return
+
+                    # Until the writer exits, hold back the tail so the part that
+                    # turns out to be last is always sent with the real count
+                    offset = self.parts_sent * UPLOAD_PART_SIZE
+                    if not done and (size < BIG_FILE_THRESHOLD or size - offset <= UPLOAD_PART_SIZE):
+                        await asyncio.sleep(POLL_INTERVAL)
+                        continue
+
+                    fp.seek(offset)
+                    chunk = fp.read(UPLOAD_PART_SIZE)
+                    if not chunk:
+                        return
+
+                    total_parts = math.ceil(size / UPLOAD_PART_SIZE) if done else -1
+                    is_last = done and self.parts_sent + 1 == total_parts
+
+                    await session.invoke(
+                        raw.functions.upload.SaveBigFilePart(
+                            file_id=self.file_id,
+                            file_part=self.parts_sent,
+                            file_total_parts=total_parts if is_last else -1,
+                            bytes=chunk
+                        )
+                    )
+                    self.parts_sent += 1
+
+                    if is_last:
+                        return
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            LOGGER.error(f"Streaming upload error: {e}")
+            self.failed = True
+        finally:
+            await session.stop()
+
+    async def commit(
+        self,
+        chat_id,
+        caption: str = "",
+        duration: int = 0,
+        width: int = 0,
+        height: int = 0,
+        thumb: Optional[str] = None,
+        reply_to_message_id: Optional[int] = None
+    ) -> Optional["types.Message"]:
+        """
+        Wait for the remaining parts and send the uploaded file as a video.
+        Returns None when the streamed upload could not be used.
+        """
+        try:
+            if self._task:
+                await self._task
+
+            if self.failed or not self.parts_sent:
+                return None
+
+            file = raw.types.InputFileBig(
+                id=self.file_id,
+                parts=self.parts_sent,
+                name=os.path.basename(self.file_path)
+            )
+            media = raw.types.InputMediaUploadedDocument(
+                mime_type="video/mp4",
+                file=file,
+                thumb=await self.client.save_file(thumb) if thumb else None,
+                attributes=[
+                    raw.types.DocumentAttributeVideo(
+                        supports_streaming=True,
+                        duration=duration,
+                        w=width,
+                        h=height
+                    ),
+                    raw.types.DocumentAttributeFilename(file_name=os.path.basename(self.file_path))
+                ]
+            )
+
+            while True:
+                try:
+                    r = await self.client.invoke(
+                        raw.functions.messages.SendMedia(
+                            peer=await self.client.resolve_peer(chat_id),
+                            media=media,
+                            reply_to_msg_id=reply_to_message_id,
+                            random_id=self.client.rnd_id(),
+                            **await utils.parse_text_entities(self.client, caption, None, None)
+                        )
+                    )
+                except FilePartMissing as e:
+                    await self.client.save_file(self.file_path, file_id=self.file_id, file_part=e.value)
+                else:
+                    for i in r.updates:
+                        if isinstance(i, (raw.types.UpdateNewMessage, raw.types.UpdateNewChannelMessage)):
+                            return await types.Message._parse(
+                                self.client, i.message,
+                                {i.id: i for i in r.users},
+                                {i.id: i for i in r.chats}
+                            )
+                    return None
+
+        except Exception as e:
+            LOGGER.error(f"Streaming upload commit failed: {e}")
+            return None
@@ -4,19 +4,18 @@ import os
 import shutil
 import asyncio
 import hashlib
+import importlib.util
 import mimetypes
 import logging
+import math
 from typing import Optional, List, Dict, Any, Tuple
 from pathlib import Path
 import tempfile
 import time
 from datetime import datetime, timedelta
 
-try:
-    import psutil
-    HAS_PSUTIL = True
-except ImportError:
-    HAS_PSUTIL = False
+# psutil is only needed by /status and process control; it is imported there
+HAS_PSUTIL = importlib.util.find_spec("psutil") is not None
 
 try:
     import aiofiles
@@ -165,6 +164,7 @@ class SystemUtils:
                     'disk_percent': 0
                 }
             
+            import psutil
             memory = psutil.virtual_memory()
             disk = psutil.disk_usage('/')
             cpu_count = psutil.cpu_count()
@@ -190,6 +190,7 @@ class SystemUtils:
             if not HAS_PSUTIL:
                 return None
                 
+            import psutil
             process = psutil.Process(pid)
             return {
                 'pid': pid,
@@ -210,6 +211,7 @@ class SystemUtils:
             if not HAS_PSUTIL:
                 return False
                 
+            import psutil
             process = psutil.Process(pid)
             process.terminate()
             
@@ -355,3 +357,17 @@ def mb_to_bytes(mb_value: float) -> int:
     """Convert megabytes to bytes"""
     return int(mb_value * 1024 * 1024)
 
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """Parse '90', '1:30' or '01:01:30.5' into seconds; None for anything else"""
+    try:
+        seconds = 0.0
+        for part in value.strip().split(':'):
+            number = float(part)
+            # float() also takes 'inf', 'nan', '1e309' and signs
+            if not math.isfinite(number) or number < 0:
+                return None
+            seconds = seconds * 60 + number
+        return seconds if math.isfinite(seconds) else None
+    except ValueError:
+        return None
@@ -30,13 +30,21 @@ class Localisation:
         "• <code>/compress [quality]</code> - Compress video (10-90)\\n"
         "• <code>/queue</code> - Check compression queue\\n"
         "• <code>/settings</code> - User settings\\n\\n"
+        "<b>🔸 Media Tools:</b>\\n"
+        "• <code>/trim 1:30 2:45</code> - Cut a segment without re-encoding (add <code>exact</code> for frame-exact start)\\n"
+        "• <code>/merge</code> - Join an album in order (or <code>/merge 3</code> for this and the next 2 videos)\\n"
+        "• <code>/audio</code> - Extract a video's audio track instantly (or <code>/audio opus 64</code> to re-encode)\\n"
+        "• <code>/screens 9</code> - Contact sheet of 9 evenly spaced frames (reply to a video)\\n"
+        "• <code>/compress</code> on audio or voice - Audio-only compression to Opus\\n"
+        "• <code>/compress</code> on photos - Resize, re-encode and strip metadata (albums in parallel)\\n\\n"
         "<b>🔸 Usage Examples:</b>\\n"
         "• <code>/compress</code> - Auto compression\\n"
         "• <code>/compress 50</code> - 50% compression\\n"
         "• <code>/compress high</code> - High quality preset\\n"
         "• <code>/compress medium</code> - Medium quality preset\\n"
-        "• <code>/compress low</code> - Low quality preset\\n\\n"
-        "<b>📝 Note:</b> Reply to a video file with the compress command!"
+        "• <code>/compress low</code> - Low quality preset\\n"
+        "• <code>/compress 50 5</code> - Batch: this and the next 4 messages\\n\\n"
+        "<b>📝 Note:</b> Reply to a video file with the compress command! Replying inside an album compresses the whole album."
     )
     
     # Process Messages
@@ -68,7 +76,9 @@ class Localisation:
         'upload_failed': "❌ <b>Upload failed!</b>\\n🔄 Please try again",
         'queue_full': "⏳ <b>Queue is full!</b>\\n⏰ Please wait and try again later",
         'process_exists': "⚠️ <b>You already have a compression in progress!</b>\\n⏳ Please wait for it to complete",
-        'invalid_quality': "❌ <b>Invalid quality value!</b>\\n📊 Use values between 10-90 or presets: high, medium, low"
+        'invalid_quality': "❌ <b>Invalid quality value!</b>\\n📊 Use values between 10-90 or presets: high, medium, low",
+        'rejected': "❌ <b>This video can't be compressed!</b>\\n🔍 {}",
+        'banned': "🚫 <b>You are banned from using this bot!</b>\\n📝 Reason: {}"
     }
     
     # Status Messages
@@ -92,6 +102,9 @@ class Localisation:
     # Queue Messages  
     QUEUE_EMPTY = "📋 <b>Queue is empty!</b>\\n✨ Ready to process new compressions."
     ADDED_TO_QUEUE = "📝 <b>Added to compression queue!</b>\\n🔢 Position: {}\\n⏱️ Estimated wait time: {} minutes"
+    BATCH_QUEUED = "📦 <b>Batch of {} videos queued!</b>\\n🎯 Quality: {}"
+    RESULT_REUSED = "♻️ <b>Already compressed at this quality!</b> Here is the earlier result."
+    BATCH_DONE = "✅ <b>Batch Complete!</b>\\n\\n🎬 Compressed: {}/{}\\n⏱️ Total time: {}"
     
     # Other Messages
     FF_MPEG_RO_BOT_STOR_AGE_ALREADY_EXISTS = "⚠️ <b>Already one process running!</b>\\n\\nCheck status with /queue"
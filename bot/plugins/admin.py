@@ -6,15 +6,14 @@ import os
 from pyrogram import Client, filters
 from pyrogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 
-try:
-    from bot.database import Database
-    from bot import DATABASE_URL, SESSION_NAME
-    db = Database(DATABASE_URL, SESSION_NAME) if DATABASE_URL else None
-except:
-    db = None
+from bot.database import get_db
 
-from bot import AUTH_USERS, LOG_FILE_ZZGEVC
+from bot import AUTH_USERS, LOG_FILE_ZZGEVC, DOWNLOAD_LOCATION
 from bot.helper_funcs.utils import SystemUtils
+from bot.helper_funcs.autotune import run_autotune, is_running, profile_summary
+from bot.helper_funcs.capabilities import capabilities_summary
+from bot.helper_funcs.size_model import size_model_summary
+from bot.helper_funcs.edit_scheduler import edit_scheduler_summary, edit_now
 from bot.helper_funcs.display_progress import humanbytes
 from datetime import datetime
 
@@ -22,6 +21,7 @@ LOGGER = logging.getLogger(__name__)
 
 async def sts(bot: Client, update: Message):
     """Enhanced status command"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available for statistics")
@@ -54,6 +54,11 @@ async def sts(bot: Client, update: Message):
             status_text += f"💽 **Total Disk:** {humanbytes(system_info['disk_total'])}\\n"
             status_text += f"💾 **Free Disk:** {humanbytes(system_info['disk_free'])}\\n"
         
+        status_text += f"🎛️ **Encoder:** {profile_summary()}\\n"
+        status_text += f"🎞️ **FFmpeg:** {capabilities_summary()}\\n"
+        status_text += f"📐 **Size Model:** {size_model_summary()}\\n"
+        status_text += f"✏️ **Progress Edits:** {edit_scheduler_summary()}\\n"
+        
         status_text += f"\\n🤖 **Enhanced VideoCompress Bot v2.0**\\n"
         status_text += f"📅 **Current Time:** {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
         
@@ -70,6 +75,7 @@ async def sts(bot: Client, update: Message):
 
 async def ban(bot: Client, update: Message):
     """Enhanced ban user command"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available")
@@ -132,6 +138,7 @@ async def ban(bot: Client, update: Message):
 
 async def unban(bot: Client, update: Message):
     """Enhanced unban user command"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available")
@@ -190,6 +197,7 @@ async def unban(bot: Client, update: Message):
 
 async def _banned_usrs(bot: Client, update: Message):
     """Show banned users with pagination"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available")
@@ -311,6 +319,42 @@ async def get_logs(bot: Client, update: Message):
         LOGGER.error(f"Logs command error: {e}")
         await update.reply_text("❌ Error sending logs")
 
+async def autotune(bot: Client, update: Message):
+    """Benchmark encoder presets on this host and keep the fastest good one (admin only)"""
+    try:
+        if is_running():
+            await update.reply_text("⏳ Autotune is already running.")
+            return
+        
+        if os.path.exists(os.path.join(DOWNLOAD_LOCATION, "status.json")):
+            await update.reply_text("⚠️ A compression is running; autotune would skew its timings. Try again when idle.")
+            return
+        
+        sent_message = await update.reply_text(
+            "🎛️ **Autotuning encoder...**\\n\\n"
+            "⏰ Encoding a synthetic clip with every preset and thread count"
+        )
+        
+        profile = await run_autotune()
+        if not profile:
+            await edit_now(sent_message, "❌ Autotune failed, keeping current settings. Check /logs.")
+            return
+        
+        lines = [
+            f"`{r['preset']:<9}` {r['threads']:>2}t  {r['fps']:>6.1f} fps  {humanbytes(r['bytes']):>9}  {r['psnr']:.1f} dB"
+            for r in profile['results']
+        ]
+        await edit_now(
+            sent_message,
+            f"✅ **Autotune Complete!**\\n\\n"
+            + "\\n".join(lines)
+            + f"\\n\\n🎛️ **Selected:** {profile_summary()}"
+        )
+        
+    except Exception as e:
+        LOGGER.error(f"Autotune command error: {e}")
+        await update.reply_text("❌ Error running autotune")
+
 async def restart_bot(bot: Client, update: Message):
     """Restart bot (admin only)"""
     try:
@@ -378,5 +422,3 @@ async def sys_info(bot: Client, update: Message):
     except Exception as e:
         LOGGER.error(f"System info error: {e}")
         await update.reply_text("❌ Error getting system information")
-
-print("Created enhanced admin module")
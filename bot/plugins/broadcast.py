@@ -5,17 +5,14 @@ import logging
 from pyrogram import Client
 from pyrogram.types import Message
 
-try:
-    from bot.database import Database
-    from bot import DATABASE_URL, SESSION_NAME
-    db = Database(DATABASE_URL, SESSION_NAME) if DATABASE_URL else None
-except:
-    db = None
+from bot.database import get_db
+from bot.helper_funcs.edit_scheduler import schedule_edit, edit_now
 
 LOGGER = logging.getLogger(__name__)
 
 async def broadcast_(bot: Client, update: Message):
     """Enhanced broadcast function with better error handling and progress"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available for broadcast")
@@ -119,7 +116,7 @@ async def broadcast_(bot: Client, update: Message):
                         f"⚡ **Speed:** {processed/elapsed_time:.1f} users/sec"
                     )
                     
-                    await progress_msg.edit_text(progress_text)
+                    schedule_edit(progress_msg, progress_text)
                     
                 except Exception as e:
                     LOGGER.error(f"Error updating progress: {e}")
@@ -148,7 +145,7 @@ async def broadcast_(bot: Client, update: Message):
             f"💡 **Tip:** Clean up deleted/blocked users regularly for better performance"
         )
         
-        await progress_msg.edit_text(final_text)
+        await edit_now(progress_msg, final_text)
         
         # Log broadcast completion
         LOGGER.info(
@@ -163,6 +160,7 @@ async def broadcast_(bot: Client, update: Message):
 
 async def broadcast_stats(bot: Client, update: Message):
     """Get broadcast statistics"""
+    db = get_db()
     try:
         if not db:
             await update.reply_text("❌ Database not available")
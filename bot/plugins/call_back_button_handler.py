@@ -8,15 +8,11 @@ from pyrogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardBu
 from bot.localisation import Localisation
 from bot import DOWNLOAD_LOCATION, AUTH_USERS
 
-try:
-    from bot.database import Database
-    from bot import DATABASE_URL, SESSION_NAME
-    db = Database(DATABASE_URL, SESSION_NAME) if DATABASE_URL else None
-except:
-    db = None
+from bot.database import get_db
 
 from bot.helper_funcs.utils import SystemUtils, delete_downloads
 from bot.helper_funcs.display_progress import humanbytes
+from bot.helper_funcs.edit_scheduler import settle_edits
 
 LOGGER = logging.getLogger(__name__)
 
@@ -78,7 +74,8 @@ async def button(bot: Client, update: CallbackQuery):
                 
         # Keep process callback
         elif cb_data == "keep_process" or cb_data == "keep_job":
-            await update.message.edit_text(
+            await edit_callback_message(
+                update,
                 "✅ **Process Continued**\\n\\n"
                 "🔄 The compression will continue as normal\\n"
                 "⏰ You can check status anytime"
@@ -115,6 +112,7 @@ async def button(bot: Client, update: CallbackQuery):
 
 async def show_user_settings(bot: Client, update: CallbackQuery):
     """Show user settings menu"""
+    db = get_db()
     try:
         if not db:
             await update.message.edit_text(
@@ -159,6 +157,7 @@ async def show_user_settings(bot: Client, update: CallbackQuery):
 
 async def show_bot_status(bot: Client, update: CallbackQuery):
     """Show detailed bot status"""
+    db = get_db()
     try:
         system_info = SystemUtils.get_system_info()
         
@@ -259,10 +258,20 @@ async def show_system_info(bot: Client, update: CallbackQuery):
         LOGGER.error(f"System info error: {e}")
         await update.message.edit_text("❌ Error loading system info")
 
+async def edit_callback_message(update: CallbackQuery, text: str, reply_markup=None):
+    """Edit the message a button belongs to; media messages (the preview) only have a caption"""
+    # The cancel buttons sit on progress messages; a queued progress text must not overwrite the answer
+    await settle_edits(update.message)
+    if update.message.media:
+        await update.message.edit_caption(text, reply_markup=reply_markup)
+    else:
+        await update.message.edit_text(text, reply_markup=reply_markup)
+
 async def handle_compression_cancel(bot: Client, update: CallbackQuery):
     """Handle compression cancellation request"""
     try:
-        await update.message.edit_text(
+        await edit_callback_message(
+            update,
             "🗑️ **Cancel Compression Process?**\\n\\n"
             "⚠️ This will stop the current compression job\\n"
             "❌ This action cannot be undone!\\n\\n"
@@ -293,6 +302,10 @@ async def confirm_cancel_compression(bot: Client, update: CallbackQuery):
                     from bot.helper_funcs.utils import SystemUtils
                     success = await SystemUtils.kill_process(pid)
                     
+                    # Batch jobs record every encoder they started
+                    for other_pid in set(status_data.get('pids', [])) - {pid}:
+                        await SystemUtils.kill_process(other_pid)
+                    
                     if success:
                         result_text = "✅ **Compression Cancelled Successfully!**"
                     else:
@@ -310,7 +323,8 @@ async def confirm_cancel_compression(bot: Client, update: CallbackQuery):
         else:
             result_text = "❌ **No active compression found**"
         
-        await update.message.edit_text(
+        await edit_callback_message(
+            update,
             f"{result_text}\\n\\n"
             f"🧹 Temporary files cleaned up\\n"
             f"✨ Bot is ready for new compressions"
@@ -351,5 +365,3 @@ async def clean_downloads_callback(bot: Client, update: CallbackQuery):
     except Exception as e:
         LOGGER.error(f"Clean downloads callback error: {e}")
         await update.message.edit_text("❌ Error during cleanup")
-
-print("Created broadcast and callback handler modules")
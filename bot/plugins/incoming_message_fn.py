@@ -6,34 +6,63 @@ import os
 import time
 import asyncio
 import json
-from typing import Optional
+import math
+from typing import Optional, Tuple
 from pyrogram.enums import ParseMode
 from pyrogram import Client, filters
-from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+from pyrogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message, InputMediaVideo
+from pyrogram.errors import BadRequest
 from pyrogram.errors.exceptions.bad_request_400 import UserNotParticipant, UsernameNotOccupied
 
-try:
-    from bot.database import Database  
-except ImportError:
-    Database = None
-    
+from bot.database import get_db
 from bot.localisation import Localisation
 from bot import (
     DOWNLOAD_LOCATION,
     AUTH_USERS,
     LOG_CHANNEL,
     UPDATES_CHANNEL,
-    DATABASE_URL,
-    SESSION_NAME,
     ALLOWED_FILE_TYPES,
-    TG_MAX_FILE_SIZE
+    TG_MAX_FILE_SIZE,
+    FREE_USER_MAX_FILE_SIZE,
+    ENABLE_STREAM_ENCODE,
+    ENABLE_STREAM_UPLOAD,
+    ENABLE_PREVIEW,
+    PREVIEW_MIN_DURATION,
+    ENABLE_RESULT_REUSE,
+    MAX_CONCURRENT_PROCESSES,
+    QUEUE_SIZE,
+    FINISHED_PROGRESS_STR,
+    UN_FINISHED_PROGRESS_STR
 )
 
 from bot.helper_funcs.ffmpeg import (
     convert_video,
-    media_info,
-    take_screen_shot
+    encode_preview,
+    take_screen_shot,
+    usable_thumbnail,
+    progress_seconds,
+    PROGRESS_EDIT_INTERVAL
+)
+
+from bot.helper_funcs.stream_encode import (
+    open_media_stream,
+    tee_to_file
+)
+
+from bot.helper_funcs.upload import StreamingUploader
+
+from bot.helper_funcs.keyframes import release_keyframe_index
+from bot.helper_funcs.probe import get_media_probe, release_media_probe, MediaProbeError
+from bot.helper_funcs.admission import admit, check_metadata, needs_head_probe, probe_head
+from bot.helper_funcs.fingerprint import (
+    video_fingerprint,
+    find_result,
+    remember_result,
+    forget_result,
+    result_settings
 )
+from bot.helper_funcs.image import is_image_message
+from bot.helper_funcs.edit_scheduler import schedule_edit, edit_now, discard_edits
 
 from bot.helper_funcs.display_progress import (
     progress_for_pyrogram,
@@ -48,20 +77,16 @@ from bot.helper_funcs.utils import (
 
 LOGGER = logging.getLogger(__name__)
 
-# Initialize database if available
-db = None
-if Database and DATABASE_URL:
-    try:
-        db = Database(DATABASE_URL, SESSION_NAME)
-    except Exception as e:
-        LOGGER.error(f"Database initialization failed: {e}")
-
 # Track current processes
 CURRENT_PROCESSES = {}
 CHAT_FLOOD = {}
 
+# Telegram albums hold at most this many items
+MEDIA_GROUP_LIMIT = 10
+
 async def incoming_start_message_f(bot: Client, update: Message):
     """Enhanced /start command handler"""
+    db = get_db()
     try:
         # Add user to database if available
         if db and not await db.is_user_exist(update.from_user.id):
@@ -107,24 +132,12 @@ async def incoming_start_message_f(bot: Client, update: Message):
 async def incoming_compress_message_f(bot: Client, update: Message):
     """Enhanced /compress command handler"""
     try:
-        # Add user if not exists
-        if db and not await db.is_user_exist(update.from_user.id):
-            await db.add_user(
-                update.from_user.id,
-                update.from_user.username, 
-                update.from_user.first_name
-            )
-        
-        # Update activity
-        if db:
-            await db.update_user_activity(update.from_user.id)
-        
-        # Check subscription
-        if UPDATES_CHANNEL and not await check_subscription(bot, update):
+        if not await check_user(bot, update):
             return
         
         # Check if reply to media
-        if not update.reply_to_message or not update.reply_to_message.video:
+        reply = update.reply_to_message
+        if not reply or not (reply.video or reply.audio or reply.voice or is_image_message(reply)):
             await update.reply_text(
                 Localisation.ERROR_MESSAGES['no_reply'],
                 reply_markup=InlineKeyboardMarkup([[
@@ -136,6 +149,7 @@ async def incoming_compress_message_f(bot: Client, update: Message):
         # Parse compression settings
         target_percentage = 50
         isAuto = False
+        batch_count = 0
         
         if len(update.command) > 1:
             try:
@@ -143,20 +157,45 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                 if arg.lower() in ['high', 'medium', 'low']:
                     quality_map = {'high': 25, 'medium': 50, 'low': 75}
                     target_percentage = quality_map[arg.lower()]
+                elif arg.lower() == 'auto':
+                    isAuto = True
                 elif arg.isdigit() and 10 <= int(arg) <= 90:
                     target_percentage = int(arg)
                 else:
                     await update.reply_text(Localisation.ERROR_MESSAGES['invalid_quality'])
                     return
+                
+                # /compress <quality> <count>: this and the next count-1 messages
+                if len(update.command) > 2:
+                    batch_count = int(update.command[2])
+                    if not 1 <= batch_count <= QUEUE_SIZE:
+                        await update.reply_text(f"❌ Batch size must be between 1 and {QUEUE_SIZE}.")
+                        return
             except:
                 await update.reply_text(Localisation.ERROR_MESSAGES['invalid_quality'])
                 return
         else:
             isAuto = True
+        
+        # Audio, voice and image messages skip the video machinery entirely
+        if not reply.video:
+            from bot.plugins.media_tools_fn import compress_audio_message, compress_image_message
+            if is_image_message(reply):
+                await compress_image_message(bot, update, target_percentage, isAuto, batch_count)
+            else:
+                await compress_audio_message(bot, update, target_percentage, isAuto)
+            return
+        
+        # Albums and message ranges go through the batch pipeline
+        if batch_count or update.reply_to_message.media_group_id:
+            batch = await collect_batch_videos(bot, update, batch_count)
+            if len(batch) > 1:
+                await compress_batch(bot, update, batch, target_percentage, isAuto)
+                return
 
         # Validate file
         video = update.reply_to_message.video
-        if not await validate_video_file(video, update):
+        if not await validate_video_file(bot, video, update):
             return
         
         # Check if user has active process
@@ -169,6 +208,10 @@ async def incoming_compress_message_f(bot: Client, update: Message):
 
         user_file = str(update.from_user.id) + ".FFMpegRoBot.mkv"
         saved_file_path = DOWNLOAD_LOCATION + "/" + user_file
+        # Written by the encode itself; must not be a leftover of an earlier job
+        thumb_image_path = DOWNLOAD_LOCATION + "/" + str(update.from_user.id) + ".thumb.jpg"
+        if os.path.exists(thumb_image_path):
+            os.remove(thumb_image_path)
         
         LOGGER.info(f"Starting compression for user {update.from_user.id}")
         
@@ -182,6 +225,11 @@ async def incoming_compress_message_f(bot: Client, update: Message):
             # Mark user as having active process
             CURRENT_PROCESSES[update.from_user.id] = True
             
+            # Fetching the head costs a partial download, so only once the bot can take the job
+            if not await admit_head(bot, video, update):
+                CURRENT_PROCESSES.pop(update.from_user.id, None)
+                return
+            
             sent_message = await bot.send_message(
                 chat_id=update.chat.id,
                 text=Localisation.DOWNLOAD_START,
@@ -211,6 +259,9 @@ async def incoming_compress_message_f(bot: Client, update: Message):
             else:
                 download_start = None
 
+            compressed_file = None
+            uploader = None
+            
             try:
                 # Download file - FIXED PROGRESS ARGS
                 d_start = time.time()
@@ -224,25 +275,37 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                 with open(status, 'w') as f:
                     json.dump(status_data, f, indent=2)
 
-                video_download = await bot.download_media(
-                    message=update.reply_to_message,
-                    file_name=saved_file_path,
-                    progress=progress_for_pyrogram,
-                    progress_args=(
-                        "Downloading",  # ud_type (3rd arg)
-                        sent_message,   # message (4th arg) 
-                        d_start,        # start_time (5th arg)
-                        bot             # bot (6th arg - optional)
+                # Auto mode samples random windows, so it needs the whole file first
+                if ENABLE_STREAM_ENCODE and not isAuto and video.duration:
+                    compressed_file, uploader = await stream_and_convert(
+                        bot, update, video, saved_file_path, sent_message,
+                        target_percentage, download_start, thumb_image_path
+                    )
+                    if compressed_file is None and not os.path.exists(status):
+                        # Cancelled while streaming
+                        await cleanup_process(update.from_user.id, sent_message, download_start, "Process cancelled")
+                        return
+                
+                if compressed_file is None:
+                    video_download = await bot.download_media(
+                        message=update.reply_to_message,
+                        file_name=saved_file_path,
+                        progress=progress_for_pyrogram,
+                        progress_args=(
+                            "Downloading",  # ud_type (3rd arg)
+                            sent_message,   # message (4th arg) 
+                            d_start,        # start_time (5th arg)
+                            bot             # bot (6th arg - optional)
+                        )
                     )
-                )
 
-                LOGGER.info(f"Download completed: {video_download}")
+                    LOGGER.info(f"Download completed: {video_download}")
 
-                if video_download is None:
-                    await cleanup_process(update.from_user.id, sent_message, download_start, "Download cancelled")
-                    return
+                    if video_download is None:
+                        await cleanup_process(update.from_user.id, sent_message, download_start, "Download cancelled")
+                        return
 
-                await sent_message.edit_text(Localisation.SAVED_RECVD_DOC_FILE)
+                    await edit_now(sent_message, Localisation.SAVED_RECVD_DOC_FILE)
 
             except Exception as e:
                 LOGGER.error(f"Download error: {e}")
@@ -256,64 +319,109 @@ async def incoming_compress_message_f(bot: Client, update: Message):
         if os.path.exists(saved_file_path):
             downloaded_time = TimeFormatter((time.time() - d_start) * 1000)
             
-            duration, bitrate = await media_info(saved_file_path)
+            try:
+                probe = await get_media_probe(saved_file_path, video.file_unique_id)
+            except MediaProbeError as e:
+                await cleanup_process(
+                    update.from_user.id, sent_message, download_start, 
+                    f"Failed to get video metadata: {e}"
+                )
+                return
             
-            if duration is None or bitrate is None:
+            # Streamed jobs already used Telegram's duration for their progress bar
+            duration = probe.duration or video.duration
+            if not duration or not probe.has_video:
                 await cleanup_process(
                     update.from_user.id, sent_message, download_start, 
-                    "Failed to get video metadata"
+                    "Failed to get video metadata: no video stream or duration"
                 )
                 return
 
-            thumb_image_path = await take_screen_shot(
-                saved_file_path,
-                os.path.dirname(os.path.abspath(saved_file_path)),
-                (duration / 2)
-            )
+            # A re-upload of a clip already compressed at this quality gets that output back
+            settings = result_settings(target_percentage, isAuto)
+            fingerprint = await video_fingerprint(saved_file_path, duration) if ENABLE_RESULT_REUSE else None
+            if compressed_file is None and await send_reused_result(bot, update, fingerprint, duration, settings):
+                # A reused output still counts as a compression for the user's usage
+                await record_usage(update.from_user.id, saved_file_path)
+                if download_start:
+                    try:
+                        await download_start.delete()
+                    except:
+                        pass
+                await sent_message.delete()
+                await cleanup_files_and_process(update.from_user.id, [saved_file_path, thumb_image_path])
+                return
 
-            if LOG_CHANNEL and download_start:
-                try:
-                    await download_start.delete()
-                    utc_now = datetime.datetime.utcnow()
-                    ist_now = utc_now + datetime.timedelta(minutes=30, hours=5)
-                    ist = ist_now.strftime("%d/%m/%Y, %H:%M:%S")
+            if compressed_file is not None:
+                compress_start = download_start
+                compressed_time = downloaded_time
+            else:
+                if LOG_CHANNEL and download_start:
+                    try:
+                        await download_start.delete()
+                        utc_now = datetime.datetime.utcnow()
+                        ist_now = utc_now + datetime.timedelta(minutes=30, hours=5)
+                        ist = ist_now.strftime("%d/%m/%Y, %H:%M:%S")
                     
-                    compress_start = await bot.send_message(
-                        LOG_CHANNEL,
-                        f"🎬 **Compressing Video...** \n\n"
-                        f"👤 **User:** {update.from_user.first_name} ({update.from_user.id})\n"
-                        f"⏱️ **Duration:** {TimeFormatter(duration * 1000)}\n"
-                        f"🎯 **Target:** {target_percentage}%\n"
-                        f"⏰ **Started:** `{ist}` (GMT+05:30)",
-                        parse_mode=ParseMode.MARKDOWN
-                    )
-                except:
+                        compress_start = await bot.send_message(
+                            LOG_CHANNEL,
+                            f"🎬 **Compressing Video...** \n\n"
+                            f"👤 **User:** {update.from_user.first_name} ({update.from_user.id})\n"
+                            f"⏱️ **Duration:** {TimeFormatter(duration * 1000)}\n"
+                            f"🎯 **Target:** {target_percentage}%\n"
+                            f"⏰ **Started:** `{ist}` (GMT+05:30)",
+                            parse_mode=ParseMode.MARKDOWN
+                        )
+                    except:
+                        compress_start = None
+                else:
                     compress_start = None
-            else:
-                compress_start = None
 
-            await sent_message.edit_text(Localisation.COMPRESS_START)
+                await edit_now(sent_message, Localisation.COMPRESS_START)
 
-            c_start = time.time()
-            
-            compressed_file = await convert_video(
-                saved_file_path,
-                DOWNLOAD_LOCATION,
-                duration,
-                bot,
-                sent_message,
-                target_percentage,
-                isAuto,
-                compress_start
-            )
+                c_start = time.time()
+                
+                preview_task = None
+                if ENABLE_PREVIEW and duration >= PREVIEW_MIN_DURATION:
+                    preview_task = asyncio.create_task(
+                        send_preview(bot, update, saved_file_path, duration, target_percentage, isAuto)
+                    )
+                
+                uploader, output_options = new_streaming_upload(bot)
+                
+                compressed_file = await convert_video(
+                    saved_file_path,
+                    DOWNLOAD_LOCATION,
+                    duration,
+                    bot,
+                    sent_message,
+                    target_percentage,
+                    isAuto,
+                    compress_start,
+                    thumbnail=(thumb_image_path, duration / 2),
+                    **output_options
+                )
+                
+                uploader = await end_streaming_upload(uploader, compressed_file)
+                
+                # A preview still pending once the full encode is done has no use
+                if preview_task and not preview_task.done():
+                    preview_task.cancel()
 
-            compressed_time = TimeFormatter((time.time() - c_start) * 1000)
+                compressed_time = TimeFormatter((time.time() - c_start) * 1000)
             
             LOGGER.info(f"Compression result: {compressed_file}")
+            
+            # The encode writes thumb_image_path; both it and any fallback are cleaned up below
+            upload_thumb = thumb_image_path
+            if compressed_file is not None and not usable_thumbnail(thumb_image_path):
+                # Checkpointed encodes have no thumbnail output; take a keyframe instead
+                upload_thumb = await take_screen_shot(saved_file_path, DOWNLOAD_LOCATION, duration / 2)
 
             if compressed_file is not None:
                 if LOG_CHANNEL and compress_start:
                     try:
+                        discard_edits(compress_start)
                         await compress_start.delete()
                         utc_now = datetime.datetime.utcnow()
                         ist_now = utc_now + datetime.timedelta(minutes=30, hours=5)
@@ -331,7 +439,7 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                 else:
                     upload_start = None
 
-                await sent_message.edit_text(Localisation.UPLOAD_START)
+                await edit_now(sent_message, Localisation.UPLOAD_START)
 
                 u_start = time.time()
                 
@@ -339,25 +447,39 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                     downloaded_time, compressed_time, "{}"
                 )
 
-                upload = await bot.send_video(
-                    chat_id=update.chat.id,
-                    video=compressed_file,
-                    caption=caption,
-                    supports_streaming=True,
-                    duration=int(duration),
-                    thumb=thumb_image_path,
-                    reply_to_message_id=update.id,
-                    progress=progress_for_pyrogram,
-                    progress_args=(
-                        "Uploading",    # ud_type (3rd arg)
-                        sent_message,   # message (4th arg)
-                        u_start,        # start_time (5th arg) 
-                        bot             # bot (6th arg - optional)
+                upload = None
+                if uploader:
+                    # Most parts went up during the encode; this sends the tail and commits
+                    upload = await uploader.commit(
+                        update.chat.id,
+                        caption=caption,
+                        duration=int(duration),
+                        thumb=upload_thumb,
+                        reply_to_message_id=update.id
+                    )
+                
+                if upload is None:
+                    upload = await bot.send_video(
+                        chat_id=update.chat.id,
+                        video=compressed_file,
+                        caption=caption,
+                        supports_streaming=True,
+                        duration=int(duration),
+                        thumb=upload_thumb,
+                        reply_to_message_id=update.id,
+                        progress=progress_for_pyrogram,
+                        progress_args=(
+                            "Uploading",    # ud_type (3rd arg)
+                            sent_message,   # message (4th arg)
+                            u_start,        # start_time (5th arg) 
+                            bot             # bot (6th arg - optional)
+                        )
                     )
-                )
 
                 if upload is not None:
                     uploaded_time = TimeFormatter((time.time() - u_start) * 1000)
+                    if upload.video:
+                        remember_result(fingerprint, duration, settings, upload.video.file_id)
                     
                     try:
                         await upload.edit_caption(
@@ -366,13 +488,7 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                     except:
                         pass
 
-                    if db:
-                        try:
-                            original_size = os.path.getsize(saved_file_path)
-                            compressed_size = os.path.getsize(compressed_file)
-                            await db.increment_user_compression(update.from_user.id, original_size)
-                        except:
-                            pass
+                    await record_usage(update.from_user.id, saved_file_path)
 
                     if LOG_CHANNEL and upload_start:
                         try:
@@ -393,6 +509,7 @@ async def incoming_compress_message_f(bot: Client, update: Message):
                         except:
                             pass
 
+                    discard_edits(sent_message)
                     await sent_message.delete()
                     
                 else:
@@ -405,7 +522,9 @@ async def incoming_compress_message_f(bot: Client, update: Message):
             await cleanup_process(update.from_user.id, sent_message, download_start, "Downloaded file not found")
             return
 
-        await cleanup_files_and_process(update.from_user.id, [saved_file_path, compressed_file, thumb_image_path])
+        await cleanup_files_and_process(
+            update.from_user.id, [saved_file_path, compressed_file, thumb_image_path, upload_thumb]
+        )
 
     except Exception as e:
         LOGGER.error(f"Error in compress handler: {e}")
@@ -480,13 +599,55 @@ async def check_subscription(bot: Client, update: Message) -> bool:
     
     return True
 
-async def validate_video_file(video, update: Message) -> bool:
-    """Validate video file for compression"""
-    if video.file_size > TG_MAX_FILE_SIZE:
-        max_size_mb = TG_MAX_FILE_SIZE // (1024 * 1024)
-        await update.reply_text(
-            Localisation.ERROR_MESSAGES['file_too_large'].format(max_size_mb)
-        )
+async def check_user(bot: Client, update: Message) -> bool:
+    """Register the user and turn away banned or unsubscribed ones; replies and returns False on reject"""
+    db = get_db()
+    if db:
+        if not await db.is_user_exist(update.from_user.id):
+            await db.add_user(
+                update.from_user.id,
+                update.from_user.username,
+                update.from_user.first_name
+            )
+        await db.update_user_activity(update.from_user.id)
+        
+        ban_status = await db.get_ban_status(update.from_user.id)
+        if ban_status.get('is_banned', False):
+            await update.reply_text(
+                Localisation.ERROR_MESSAGES['banned'].format(ban_status.get('ban_reason') or "Not given")
+            )
+            return False
+    
+    if UPDATES_CHANNEL and not await check_subscription(bot, update):
+        return False
+    
+    return True
+
+def max_file_size(user_id: int) -> int:
+    """Largest file a user may send; users outside AUTH_USERS get the free-user limit"""
+    if user_id in AUTH_USERS:
+        return TG_MAX_FILE_SIZE
+    return min(TG_MAX_FILE_SIZE, FREE_USER_MAX_FILE_SIZE)
+
+async def check_file_sizes(update: Message, messages: list) -> bool:
+    """Reject when any message's media is over the user's size limit; replies and returns False"""
+    limit = max_file_size(update.from_user.id)
+    for message in messages:
+        media = message.video or message.audio or message.voice or message.photo or message.document
+        if media and (media.file_size or 0) > limit:
+            await update.reply_text(
+                Localisation.ERROR_MESSAGES['file_too_large'].format(limit // (1024 * 1024))
+            )
+            return False
+    return True
+
+async def pre_check(bot: Client, update: Message, messages: list) -> bool:
+    """Checks every job passes before anything is downloaded: the user, then the file sizes"""
+    return await check_user(bot, update) and await check_file_sizes(update, messages)
+
+async def validate_video_file(bot: Client, video, update: Message) -> bool:
+    """Validate video file for compression, before any of it is downloaded"""
+    if not await check_file_sizes(update, [update.reply_to_message]):
         return False
     
     if hasattr(video, 'file_name') and video.file_name:
@@ -494,15 +655,446 @@ async def validate_video_file(video, update: Message) -> bool:
             await update.reply_text(Localisation.ERROR_MESSAGES['invalid_file'])
             return False
     
+    # Metadata only here; the head probe waits until the bot can take the job (admit_head)
+    reason = check_metadata(video)
+    if reason:
+        LOGGER.info(f"Rejected before download: {reason}")
+        await update.reply_text(Localisation.ERROR_MESSAGES['rejected'].format(reason))
+        return False
+    
+    return True
+
+async def admit_head(bot: Client, video, update: Message) -> bool:
+    """Probe the first megabytes when Telegram's metadata is incomplete; replies and returns False on reject"""
+    if not needs_head_probe(video):
+        return True
+    
+    reason = await probe_head(bot, update.reply_to_message, video)
+    if reason:
+        LOGGER.info(f"Rejected before download: {reason}")
+        await update.reply_text(Localisation.ERROR_MESSAGES['rejected'].format(reason))
+        return False
+    
     return True
 
+async def stream_and_convert(bot: Client, update: Message, video, saved_file_path: str,
+                             sent_message, target_percentage, log_message,
+                             thumb_image_path=None) -> Tuple[Optional[str], Optional[StreamingUploader]]:
+    """
+    Encode straight from the Telegram download for streamable containers.
+    Returns (None, None) when the input is not streamable or the streamed
+    encode failed, so the caller falls back to the full download path.
+    """
+    try:
+        stream = await open_media_stream(
+            bot, update.reply_to_message, video.file_name, video.mime_type
+        )
+        if stream is None:
+            return None, None
+        
+        await edit_now(sent_message, Localisation.COMPRESS_START)
+        
+        uploader, output_options = new_streaming_upload(bot)
+        
+        compressed_file = await convert_video(
+            saved_file_path,
+            DOWNLOAD_LOCATION,
+            video.duration,
+            bot,
+            sent_message,
+            target_percentage,
+            False,
+            log_message,
+            input_stream=tee_to_file(stream, saved_file_path),
+            source_size=video.file_size,
+            video_info={'width': video.width, 'height': video.height, 'fps': 0},
+            thumbnail=(thumb_image_path, video.duration / 2) if thumb_image_path else None,
+            **output_options
+        )
+        
+        uploader = await end_streaming_upload(uploader, compressed_file)
+        
+        if compressed_file is None:
+            LOGGER.warning("Streamed encode failed, falling back to full download")
+            if os.path.exists(saved_file_path):
+                os.remove(saved_file_path)
+        
+        return compressed_file, uploader
+        
+    except Exception as e:
+        LOGGER.error(f"Stream encode error: {e}")
+        return None, None
+
+async def collect_batch_videos(bot: Client, update: Message, count: int, accept=None) -> list:
+    """
+    Video messages selected by /compress: `count` messages from the replied one, or its album.
+    `accept` picks other media kinds instead of videos.
+    """
+    reply = update.reply_to_message
+    try:
+        if count:
+            messages = await bot.get_messages(update.chat.id, list(range(reply.id, reply.id + count)))
+            # In groups the range also holds other members' messages; only the requester's join the replied one
+            messages = [
+                m for m in messages
+                if m and (m.id == reply.id or (m.from_user and m.from_user.id == update.from_user.id))
+            ]
+        else:
+            messages = await bot.get_media_group(update.chat.id, reply.id)
+    except Exception as e:
+        LOGGER.warning(f"Could not collect batch messages: {e}")
+        return [reply]
+    
+    accept = accept or (lambda m: m.video)
+    return [m for m in messages if m and not m.empty and accept(m)][:QUEUE_SIZE]
+
+class BatchProgress:
+    """One status message for a whole batch: a line per file plus an overall bar"""
+    
+    def __init__(self, message: Message, count: int, quality: str):
+        self.message = message
+        self.quality = quality
+        self.states = [("⏳ Queued", 0.0)] * count
+    
+    def set(self, index: int, stage: str, percent: float = 0.0):
+        self.states[index] = (stage, min(percent, 100.0))
+    
+    async def on_download(self, current, total, index):
+        self.set(index, "📥 Downloading", current * 100 / total if total else 0)
+    
+    def encoder(self, index: int, duration):
+        """ffmpeg progress callback for one file of the batch"""
+        async def on_progress(block):
+            if block.get('progress') == "end" or not duration:
+                return
+            self.set(index, "📦 Compressing", progress_seconds(block) * 100 / duration)
+        return on_progress
+    
+    def overall(self) -> float:
+        # Downloads count for the first 30% of a file, the encode for the rest
+        weights = {"📥 Downloading": (0, 0.3), "📦 Compressing": (30, 0.7)}
+        total = 0
+        for stage, percent in self.states:
+            if stage in weights:
+                base, scale = weights[stage]
+                total += base + percent * scale
+            elif stage != "⏳ Queued":
+                total += 100
+        return total / len(self.states)
+    
+    def render(self) -> str:
+        overall = self.overall()
+        lines = [
+            f"📦 **Batch Compressing** {self.quality}",
+            "[{0}{1}] {2:.0f}%".format(
+                FINISHED_PROGRESS_STR * math.floor(overall / 10),
+                UN_FINISHED_PROGRESS_STR * (10 - math.floor(overall / 10)),
+                overall
+            ),
+            ""
+        ]
+        for index, (stage, percent) in enumerate(self.states, 1):
+            suffix = f" {percent:.0f}%" if stage in ("📥 Downloading", "📦 Compressing") else ""
+            lines.append(f"{index}. {stage}{suffix}")
+        return "\n".join(lines)
+    
+    async def flush(self):
+        schedule_edit(
+            self.message,
+            self.render(),
+            InlineKeyboardMarkup([[
+                InlineKeyboardButton('❌ Cancel ❌', callback_data='cancel_compression')
+            ]])
+        )
+    
+    async def run(self):
+        while True:
+            await self.flush()
+            await asyncio.sleep(PROGRESS_EDIT_INTERVAL)
+
+async def compress_batch(bot: Client, update: Message, messages: list, target_percentage, isAuto):
+    """Download, compress and deliver several videos as one job with a shared status message"""
+    user_id = update.from_user.id
+    status = DOWNLOAD_LOCATION + "/status.json"
+    
+    if os.path.exists(status):
+        await update.reply_text(Localisation.FF_MPEG_RO_BOT_STOR_AGE_ALREADY_EXISTS)
+        return
+    
+    if user_id in CURRENT_PROCESSES:
+        await update.reply_text(
+            "⚠️ You already have a compression in progress!\n"
+            "⏰ Please wait for it to complete."
+        )
+        return
+    
+    CURRENT_PROCESSES[user_id] = True
+    quality = "Auto" if isAuto else f"{target_percentage}%"
+    settings = result_settings(target_percentage, isAuto)
+    b_start = time.time()
+    files = []
+    
+    sent_message = await bot.send_message(
+        chat_id=update.chat.id,
+        text=Localisation.BATCH_QUEUED.format(len(messages), quality),
+        reply_to_message_id=update.id
+    )
+    
+    with open(status, 'w') as f:
+        json.dump({
+            'running': True,
+            'message': sent_message.id,
+            'user_id': user_id,
+            'batch': len(messages)
+        }, f, indent=2)
+    
+    progress = BatchProgress(sent_message, len(messages), quality)
+    ticker = asyncio.create_task(progress.run())
+    
+    # Downloads of later files overlap encodes of earlier ones, each stage capped separately
+    download_slots = asyncio.Semaphore(MAX_CONCURRENT_PROCESSES)
+    encode_slots = asyncio.Semaphore(MAX_CONCURRENT_PROCESSES)
+    
+    async def process(index, message):
+        video = message.video
+        source = f"{DOWNLOAD_LOCATION}/{user_id}_{index}.FFMpegRoBot.mkv"
+        output = f"{DOWNLOAD_LOCATION}/{user_id}_{index}_batch.mp4"
+        files.extend([source, output])
+        
+        result = None
+        try:
+            result = await compress_one(index, message, video, source, output)
+            return result
+        finally:
+            # The source is done with once encoded, reused or failed; a failed encode's output too
+            remove_files([source] if result else [source, output])
+    
+    async def compress_one(index, message, video, source, output):
+        if video.file_size > max_file_size(user_id) or (
+            video.file_name and not ValidationUtils.validate_file_extension(video.file_name, ALLOWED_FILE_TYPES)
+        ):
+            progress.set(index, "⚠️ Skipped")
+            return None
+        
+        try:
+            async with download_slots:
+                if not os.path.exists(status):
+                    return None
+                reason = await admit(bot, message, video)
+                if reason:
+                    progress.set(index, f"⚠️ Skipped: {reason}")
+                    return None
+                progress.set(index, "📥 Downloading")
+                if await bot.download_media(
+                    message=message,
+                    file_name=source,
+                    progress=progress.on_download,
+                    progress_args=(index,)
+                ) is None:
+                    progress.set(index, "❌ Download failed")
+                    return None
+            
+            duration = (await get_media_probe(source, video.file_unique_id)).duration or video.duration
+            
+            fingerprint = await video_fingerprint(source, duration) if ENABLE_RESULT_REUSE else None
+            file_id = find_result(fingerprint, duration, settings)
+            if file_id:
+                # Sent by file_id: Telegram serves the earlier output, nothing is encoded or uploaded
+                progress.set(index, "♻️ Reused")
+                await record_usage(user_id, source)
+                return file_id, duration, None
+            
+            async with encode_slots:
+                if not os.path.exists(status):
+                    return None
+                progress.set(index, "📦 Compressing")
+                compressed = await convert_video(
+                    source, DOWNLOAD_LOCATION, duration, bot, sent_message,
+                    target_percentage, isAuto,
+                    output_file=output,
+                    progress=progress.encoder(index, duration),
+                    keep_status=True
+                )
+            
+            if compressed is None:
+                progress.set(index, "❌ Failed")
+                return None
+            
+            progress.set(index, "✅ Done")
+            await record_usage(user_id, source)
+            return compressed, duration, fingerprint
+            
+        except Exception as e:
+            LOGGER.error(f"Batch item {index} error: {e}")
+            progress.set(index, "❌ Failed")
+            return None
+    
+    try:
+        results = await asyncio.gather(*[process(i, m) for i, m in enumerate(messages)])
+        ticker.cancel()
+        
+        if not os.path.exists(status):
+            await edit_now(sent_message, "❌ **Batch Cancelled**")
+            return
+        
+        await progress.flush()
+        done = [result for result in results if result]
+        
+        for start in range(0, len(done), MEDIA_GROUP_LIMIT):
+            group = done[start:start + MEDIA_GROUP_LIMIT]
+            caption = f"🎬 Compressed {start + 1}-{start + len(group)} of {len(done)} ({quality})"
+            
+            if len(group) == 1:
+                path, duration, _ = group[0]
+                sent = [await bot.send_video(
+                    chat_id=update.chat.id,
+                    video=path,
+                    caption=caption,
+                    supports_streaming=True,
+                    duration=int(duration),
+                    reply_to_message_id=update.id
+                )]
+            else:
+                sent = await bot.send_media_group(
+                    chat_id=update.chat.id,
+                    media=[
+                        InputMediaVideo(
+                            path,
+                            caption=caption if i == 0 else "",
+                            supports_streaming=True,
+                            duration=int(duration)
+                        )
+                        for i, (path, duration, _) in enumerate(group)
+                    ],
+                    reply_to_message_id=update.id
+                )
+            
+            for (_, duration, fingerprint), message in zip(group, sent):
+                if message.video:
+                    remember_result(fingerprint, duration, settings, message.video.file_id)
+            
+            # Reused results are file_ids, not files; only encoded outputs are on disk
+            remove_files([path for path, _, _ in group])
+        
+        await edit_now(
+            sent_message,
+            Localisation.BATCH_DONE.format(
+                len(done), len(messages), TimeFormatter((time.time() - b_start) * 1000)
+            )
+        )
+        
+    except Exception as e:
+        LOGGER.error(f"Batch compression error: {e}")
+        try:
+            await edit_now(sent_message, f"❌ **Batch Failed**\n\n🔍 **Reason:** {e}")
+        except:
+            pass
+    finally:
+        ticker.cancel()
+        await cleanup_files_and_process(user_id, files)
+
+async def record_usage(user_id: int, source_file: str):
+    """Count one compression of source_file towards the user's usage"""
+    db = get_db()
+    if db:
+        try:
+            await db.increment_user_compression(user_id, os.path.getsize(source_file))
+        except:
+            pass
+
+async def send_reused_result(bot: Client, update: Message, fingerprint, duration, settings: str) -> bool:
+    """Send an earlier output of a near-identical clip by file_id instead of encoding again"""
+    file_id = find_result(fingerprint, duration, settings)
+    if not file_id:
+        return False
+    
+    try:
+        await bot.send_video(
+            chat_id=update.chat.id,
+            video=file_id,
+            caption=Localisation.RESULT_REUSED,
+            supports_streaming=True,
+            reply_to_message_id=update.id
+        )
+        return True
+    except BadRequest as e:
+        # The stored file is gone or not accessible to this bot any more
+        LOGGER.warning(f"Reused result rejected: {e}")
+        forget_result(file_id)
+    except Exception as e:
+        LOGGER.warning(f"Could not send reused result: {e}")
+    return False
+
+async def send_preview(bot: Client, update: Message, saved_file_path, duration, target_percentage, isAuto):
+    """Send a short clip at the chosen quality so the user can cancel early if it looks wrong"""
+    preview_file = None
+    try:
+        preview_file = await encode_preview(
+            saved_file_path, DOWNLOAD_LOCATION, duration, target_percentage, isAuto
+        )
+        
+        # status.json disappears on /cancel; nothing to preview then
+        if preview_file is None or not os.path.exists(DOWNLOAD_LOCATION + "/status.json"):
+            return
+        
+        quality = "Auto" if isAuto else f"{target_percentage}%"
+        await bot.send_video(
+            chat_id=update.chat.id,
+            video=preview_file,
+            caption=f"👀 **Preview** ({quality})\n\n"
+                    f"🔄 Full compression is still running.\n"
+                    f"❌ Not happy with the quality? Cancel now and retry with another level.",
+            supports_streaming=True,
+            reply_to_message_id=update.id,
+            reply_markup=InlineKeyboardMarkup([[
+                InlineKeyboardButton('❌ Cancel ❌', callback_data='cancel_compression')
+            ]])
+        )
+        
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        LOGGER.warning(f"Preview error: {e}")
+    finally:
+        if preview_file and os.path.exists(preview_file):
+            os.remove(preview_file)
+
+def new_streaming_upload(bot: Client) -> Tuple[Optional[StreamingUploader], dict]:
+    """Start an upload-while-encoding pipe; returns the uploader and convert_video options"""
+    if not ENABLE_STREAM_UPLOAD:
+        return None, {}
+    
+    output_file = DOWNLOAD_LOCATION + "/" + str(round(time.time())) + ".mp4"
+    uploader = StreamingUploader(bot, output_file)
+    uploader.start()
+    return uploader, {'fragmented': True, 'output_file': output_file}
+
+async def end_streaming_upload(uploader: Optional[StreamingUploader], compressed_file) -> Optional[StreamingUploader]:
+    """Let the uploader drain after a good encode, or drop it after a failed one"""
+    if uploader is None:
+        return None
+    
+    if compressed_file is None:
+        await uploader.cancel()
+        return None
+    
+    uploader.finish()
+    return uploader
+
 async def cleanup_process(user_id: int, sent_message, log_message, reason: str):
     """Cleanup failed process"""
     try:
         if user_id in CURRENT_PROCESSES:
             del CURRENT_PROCESSES[user_id]
         
-        await sent_message.edit_text(f"❌ **Process Failed**\n\n🔍 **Reason:** {reason}")
+        status = DOWNLOAD_LOCATION + "/status.json"
+        if os.path.exists(status):
+            try:
+                os.remove(status)
+            except:
+                pass
+        
+        await edit_now(sent_message, f"❌ **Process Failed**\n\n🔍 **Reason:** {reason}")
         
         if log_message:
             try:
@@ -522,18 +1114,25 @@ async def cleanup_process(user_id: int, sent_message, log_message, reason: str):
     except Exception as e:
         LOGGER.error(f"Cleanup error: {e}")
 
+def remove_files(files: list):
+    """Delete job files and drop their cached keyframe indexes and probes"""
+    for file_path in files:
+        if file_path:
+            release_keyframe_index(file_path)
+            release_media_probe(file_path)
+        if file_path and os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except:
+                pass
+
 async def cleanup_files_and_process(user_id: int, files: list):
     """Cleanup files and process"""
     try:
         if user_id in CURRENT_PROCESSES:
             del CURRENT_PROCESSES[user_id]
         
-        for file_path in files:
-            if file_path and os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
+        remove_files(files)
         
         status = DOWNLOAD_LOCATION + "/status.json"
         if os.path.exists(status):
@@ -0,0 +1,417 @@
+# bot/plugins/media_tools_fn.py - Quick media tools (trim, merge, audio, images, screens)
+
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+from pyrogram import Client
+from pyrogram.types import Message, InputMediaDocument
+
+from bot import (
+    DOWNLOAD_LOCATION,
+    QUEUE_SIZE,
+    DEFAULT_COMPRESSION,
+    AUDIO_CODEC,
+    AUDIO_MIN_BITRATE,
+    AUDIO_MAX_BITRATE,
+    IMAGE_MAX_DIMENSION,
+    IMAGE_FORMAT,
+    IMAGE_QUALITY
+)
+from bot.localisation import Localisation
+from bot.helper_funcs.ffmpeg import (
+    take_screen_shot,
+    trim_video,
+    merge_videos,
+    extract_audio,
+    compress_audio,
+    contact_sheet,
+    pid_recorder,
+    AUDIO_ENCODERS,
+    SCREENS_DEFAULT,
+    SCREENS_MAX
+)
+from bot.helper_funcs.display_progress import (
+    progress_for_pyrogram,
+    TimeFormatter,
+    humanbytes
+)
+from bot.helper_funcs.image import compress_images, is_image_message
+from bot.helper_funcs.edit_scheduler import edit_now
+from bot.helper_funcs.keyframes import release_keyframe_index
+from bot.helper_funcs.probe import get_media_probe, release_media_probe, MediaProbeError
+from bot.helper_funcs.utils import parse_timestamp
+from bot.plugins.incoming_message_fn import (
+    CURRENT_PROCESSES,
+    MEDIA_GROUP_LIMIT,
+    check_file_sizes,
+    collect_batch_videos,
+    pre_check
+)
+
+LOGGER = logging.getLogger(__name__)
+
+async def trim_message_f(bot: Client, update: Message):
+    """/trim start end [exact] - cut a segment by stream copy"""
+    try:
+        reply = update.reply_to_message
+        if not reply or not reply.video:
+            await update.reply_text("❌ Please reply to a video with `/trim start end`")
+            return
+
+        args = update.command[1:]
+        start = parse_timestamp(args[0]) if len(args) > 0 else None
+        end = parse_timestamp(args[1]) if len(args) > 1 else None
+        exact = len(args) > 2 and args[2].lower() == "exact"
+
+        if start is None or end is None or end <= start:
+            await update.reply_text(
+                "❌ **Usage:** `/trim start end [exact]`\n\n"
+                "⏱️ Times as `90`, `1:30` or `01:01:30`\n"
+                "🎯 `exact` re-encodes the first GOP to cut on the exact frame"
+            )
+            return
+
+        if reply.video.duration and start >= reply.video.duration:
+            await update.reply_text("❌ Start time is past the end of the video.")
+            return
+
+        await run_media_tool(
+            bot, update, [reply],
+            lambda sources, on_spawn: trim_video(sources[0], DOWNLOAD_LOCATION, start, end, exact, on_spawn),
+            f"✂️ Trimmed {TimeFormatter(start * 1000)} → {TimeFormatter(end * 1000)}"
+        )
+
+    except Exception as e:
+        LOGGER.error(f"Trim handler error: {e}")
+        await update.reply_text("❌ An error occurred while trimming.")
+
+async def merge_message_f(bot: Client, update: Message):
+    """/merge [count] - join an album, or this and the next count-1 videos, in order"""
+    try:
+        reply = update.reply_to_message
+        if not reply or not reply.video:
+            await update.reply_text("❌ Please reply to the first video of an album, or use `/merge count`")
+            return
+
+        count = 0
+        if len(update.command) > 1:
+            if not update.command[1].isdigit() or not 2 <= int(update.command[1]) <= QUEUE_SIZE:
+                await update.reply_text(f"❌ **Usage:** `/merge [count]` with 2-{QUEUE_SIZE} videos")
+                return
+            count = int(update.command[1])
+        elif not reply.media_group_id:
+            await update.reply_text("❌ Reply to an album, or give the number of videos: `/merge 3`")
+            return
+
+        videos = await collect_batch_videos(bot, update, count)
+        if len(videos) < 2:
+            await update.reply_text("❌ Need at least two videos to merge.")
+            return
+
+        await run_media_tool(
+            bot, update, videos,
+            lambda sources, on_spawn: merge_videos(sources, DOWNLOAD_LOCATION, on_spawn),
+            f"🔗 Merged {len(videos)} videos"
+        )
+
+    except Exception as e:
+        LOGGER.error(f"Merge handler error: {e}")
+        await update.reply_text("❌ An error occurred while merging.")
+
+async def audio_message_f(bot: Client, update: Message):
+    """/audio [opus|aac kbps] - extract a video's audio track, or re-encode it to a bitrate"""
+    try:
+        reply = update.reply_to_message
+        if not reply or not (reply.video or reply.audio or reply.voice):
+            await update.reply_text("❌ Please reply to a video, audio or voice message with `/audio`")
+            return
+
+        args = update.command[1:]
+        if not args:
+            if not reply.video:
+                await update.reply_text("❌ Give a codec and bitrate to re-encode audio: `/audio opus 64`")
+                return
+            await run_media_tool(
+                bot, update, [reply],
+                lambda sources, on_spawn: extract_audio(sources[0], DOWNLOAD_LOCATION, on_spawn),
+                "🎵 Extracted audio (stream copy)",
+                send=send_audio_result
+            )
+            return
+
+        codec = args[0].lower()
+        bitrate = int(args[1]) if len(args) > 1 and args[1].isdigit() else 0
+        if codec not in AUDIO_ENCODERS or not AUDIO_MIN_BITRATE <= bitrate <= AUDIO_MAX_BITRATE:
+            await update.reply_text(
+                "❌ **Usage:** `/audio` or `/audio opus|aac kbps`\n\n"
+                f"🎚️ Bitrate between {AUDIO_MIN_BITRATE} and {AUDIO_MAX_BITRATE} kbps"
+            )
+            return
+
+        await run_media_tool(
+            bot, update, [reply],
+            lambda sources, on_spawn: compress_audio(sources[0], DOWNLOAD_LOCATION, bitrate, codec, on_spawn),
+            f"🎵 Audio re-encoded to {codec.upper()} {bitrate}k",
+            send=send_audio_result
+        )
+
+    except Exception as e:
+        LOGGER.error(f"Audio handler error: {e}")
+        await update.reply_text("❌ An error occurred while processing audio.")
+
+async def screens_message_f(bot: Client, update: Message):
+    """/screens [N] - one image tiling N evenly spaced frames of a video"""
+    try:
+        reply = update.reply_to_message
+        if not reply or not reply.video:
+            await update.reply_text("❌ Please reply to a video with `/screens N`")
+            return
+
+        count = SCREENS_DEFAULT
+        if len(update.command) > 1:
+            if not update.command[1].isdigit() or not 2 <= int(update.command[1]) <= SCREENS_MAX:
+                await update.reply_text(f"❌ **Usage:** `/screens [N]` with 2-{SCREENS_MAX} frames")
+                return
+            count = int(update.command[1])
+
+        await run_media_tool(
+            bot, update, [reply],
+            lambda sources, on_spawn: contact_sheet(sources[0], DOWNLOAD_LOCATION, count, on_spawn),
+            f"🎞️ {count} frames of {TimeFormatter((reply.video.duration or 0) * 1000)}",
+            send=send_photo_result
+        )
+
+    except Exception as e:
+        LOGGER.error(f"Screens handler error: {e}")
+        await update.reply_text("❌ An error occurred while generating screenshots.")
+
+async def compress_audio_message(bot: Client, update: Message, target_percentage, isAuto):
+    """/compress on an audio or voice message: audio-only re-encode, no video pipeline"""
+    reply = update.reply_to_message
+    media = reply.audio or reply.voice
+    percentage = DEFAULT_COMPRESSION if isAuto else target_percentage
+
+    # Source bitrate from Telegram metadata; fall back to the ceiling when unknown
+    source_kbps = AUDIO_MAX_BITRATE
+    if media.duration and media.file_size:
+        source_kbps = media.file_size * 8 / media.duration / 1000
+    bitrate = int(min(max(source_kbps * (100 - percentage) / 100, AUDIO_MIN_BITRATE), AUDIO_MAX_BITRATE))
+
+    await run_media_tool(
+        bot, update, [reply],
+        lambda sources, on_spawn: compress_audio(sources[0], DOWNLOAD_LOCATION, bitrate, AUDIO_CODEC, on_spawn),
+        f"🎵 Compressed to {AUDIO_CODEC.upper()} {bitrate}k",
+        send=send_audio_result,
+        user_checked=True
+    )
+
+async def compress_image_message(bot: Client, update: Message, target_percentage, isAuto, count: int = 0):
+    """/compress on a photo or image document; albums and ranges are compressed in parallel"""
+    reply = update.reply_to_message
+    images = [reply]
+    if count or reply.media_group_id:
+        images = await collect_batch_videos(bot, update, count, accept=is_image_message) or [reply]
+
+    # Auto uses a fixed quality; a percentage is a size reduction, as for videos
+    quality = IMAGE_QUALITY if isAuto else None
+    percentage = None if isAuto else target_percentage
+
+    # Pillow runs in the worker pool, so there is no ffmpeg to record for /cancel
+    async def tool(sources, on_spawn):
+        outputs = await compress_images(sources, DOWNLOAD_LOCATION, IMAGE_MAX_DIMENSION, IMAGE_FORMAT, quality, percentage)
+        return [path for path in outputs if path]
+
+    await run_media_tool(
+        bot, update, images, tool,
+        f"🖼️ Compressed {len(images)} image{'s' if len(images) > 1 else ''} "
+        f"({'Auto' if isAuto else f'{target_percentage}%'})",
+        send=send_image_results,
+        user_checked=True
+    )
+
+async def run_media_tool(bot: Client, update: Message, source_messages: list, tool, caption: str,
+                         send=None, user_checked: bool = False):
+    """
+    Download the sources, run `tool(source_paths, on_spawn)` and send back the
+    file (or files) it returns. Runs the same user and size checks as
+    /compress, unless the caller already checked the user, and holds
+    status.json like any other job so /cancel can stop its ffmpeg.
+    """
+    user_id = update.from_user.id
+    if user_checked:
+        if not await check_file_sizes(update, source_messages):
+            return
+    elif not await pre_check(bot, update, source_messages):
+        return
+
+    if user_id in CURRENT_PROCESSES:
+        await update.reply_text(
+            "⚠️ You already have a job in progress!\n"
+            "⏰ Please wait for it to complete."
+        )
+        return
+
+    status = DOWNLOAD_LOCATION + "/status.json"
+    if os.path.exists(status):
+        await update.reply_text(Localisation.FF_MPEG_RO_BOT_STOR_AGE_ALREADY_EXISTS)
+        return
+
+    CURRENT_PROCESSES[user_id] = True
+    sources = []
+    output = None
+    sent_message = None
+    try:
+        sent_message = await update.reply_text("📥 **Downloading...**")
+
+        with open(status, 'w') as f:
+            json.dump({
+                'running': True,
+                'message': sent_message.id,
+                'user_id': user_id
+            }, f, indent=2)
+
+        for message in source_messages:
+            source = await download_source(bot, message, sent_message)
+            if source is None:
+                await edit_now(sent_message, "❌ **Download failed**")
+                return
+            sources.append(source)
+
+        await edit_now(sent_message, "⚙️ **Processing...**")
+        t_start = time.time()
+        output = await tool(sources, pid_recorder(status, sent_message))
+        if not os.path.exists(status):
+            await edit_now(sent_message, "❌ **Process cancelled**")
+            return
+        if not output:
+            await edit_now(sent_message, "❌ **Processing failed**")
+            return
+
+        await edit_now(sent_message, "📤 **Uploading...**")
+        await (send or send_result)(bot, update, sent_message, output, f"{caption}\n⚡ Done in {TimeFormatter((time.time() - t_start) * 1000)}")
+        await sent_message.delete()
+
+    except Exception as e:
+        LOGGER.error(f"Media tool error: {e}")
+        if sent_message:
+            await edit_now(sent_message, "❌ **Processing failed**")
+        else:
+            await update.reply_text("❌ An error occurred while processing.")
+
+    finally:
+        CURRENT_PROCESSES.pop(user_id, None)
+        if os.path.exists(status):
+            os.remove(status)
+        for path in sources + (output if isinstance(output, list) else [output]):
+            if path:
+                release_keyframe_index(path)
+                release_media_probe(path)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+async def download_source(bot: Client, message: Message, sent_message: Message) -> Optional[str]:
+    """Download `message`'s media into the download location"""
+    media = message.video or message.audio or message.voice or message.photo or message.document
+    extension = os.path.splitext(getattr(media, 'file_name', None) or "")[1] or (
+        ".ogg" if message.voice else ".jpg" if message.photo else ".mkv"
+    )
+    file_path = f"{DOWNLOAD_LOCATION}/{message.chat.id}_{message.id}_{round(time.time())}{extension}"
+
+    path = await bot.download_media(
+        message=message,
+        file_name=file_path,
+        progress=progress_for_pyrogram,
+        progress_args=("Downloading", sent_message, time.time(), bot)
+    )
+
+    # Seed the probe under the Telegram id, so re-runs on the same file skip ffprobe
+    if path and not message.photo:
+        try:
+            await get_media_probe(path, media.file_unique_id)
+        except MediaProbeError:
+            pass
+    return path
+
+async def send_result(bot: Client, update: Message, sent_message: Message, file_path: str, caption: str):
+    """Send a tool's output video with a thumbnail and its real duration"""
+    duration = (await get_media_probe(file_path)).duration
+    thumb = await take_screen_shot(file_path, DOWNLOAD_LOCATION, (duration or 0) / 2)
+    try:
+        await bot.send_video(
+            chat_id=update.chat.id,
+            video=file_path,
+            caption=caption,
+            supports_streaming=True,
+            duration=int(duration or 0),
+            thumb=thumb,
+            reply_to_message_id=update.id,
+            progress=progress_for_pyrogram,
+            progress_args=("Uploading", sent_message, time.time(), bot)
+        )
+    finally:
+        if thumb and os.path.exists(thumb):
+            os.remove(thumb)
+
+async def send_audio_result(bot: Client, update: Message, sent_message: Message, file_path: str, caption: str):
+    """Send a tool's output audio, as a voice note when the source was one"""
+    duration = (await get_media_probe(file_path)).duration
+    progress_args = ("Uploading", sent_message, time.time(), bot)
+
+    if update.reply_to_message.voice and file_path.endswith(".ogg"):
+        await bot.send_voice(
+            chat_id=update.chat.id,
+            voice=file_path,
+            caption=caption,
+            duration=int(duration or 0),
+            reply_to_message_id=update.id,
+            progress=progress_for_pyrogram,
+            progress_args=progress_args
+        )
+        return
+
+    await bot.send_audio(
+        chat_id=update.chat.id,
+        audio=file_path,
+        caption=caption,
+        duration=int(duration or 0),
+        reply_to_message_id=update.id,
+        progress=progress_for_pyrogram,
+        progress_args=progress_args
+    )
+
+async def send_photo_result(bot: Client, update: Message, sent_message: Message, file_path: str, caption: str):
+    """Send a generated preview image as a photo"""
+    await bot.send_photo(
+        chat_id=update.chat.id,
+        photo=file_path,
+        caption=caption,
+        reply_to_message_id=update.id
+    )
+
+async def send_image_results(bot: Client, update: Message, sent_message: Message, file_paths: list, caption: str):
+    """Send compressed images as documents so Telegram does not re-compress them"""
+    caption = f"{caption}\n📦 {humanbytes(sum(os.path.getsize(path) for path in file_paths))} total"
+    if len(file_paths) == 1:
+        await bot.send_document(
+            chat_id=update.chat.id,
+            document=file_paths[0],
+            caption=caption,
+            reply_to_message_id=update.id,
+            progress=progress_for_pyrogram,
+            progress_args=("Uploading", sent_message, time.time(), bot)
+        )
+        return
+
+    for start in range(0, len(file_paths), MEDIA_GROUP_LIMIT):
+        group = file_paths[start:start + MEDIA_GROUP_LIMIT]
+        await bot.send_media_group(
+            chat_id=update.chat.id,
+            media=[
+                InputMediaDocument(path, caption=caption if index == len(group) - 1 else "")
+                for index, path in enumerate(group)
+            ],
+            reply_to_message_id=update.id
+        )
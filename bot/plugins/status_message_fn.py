@@ -319,5 +319,3 @@ async def server_stats(bot: Client, update: Message):
     except Exception as e:
         LOGGER.error(f"Server stats error: {e}")
         await update.reply_text("❌ Error getting server statistics")
-
-print("Created help and status modules")
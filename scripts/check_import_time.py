@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# scripts/check_import_time.py - Cold-start import budget check
+
+"""
+Import the bot the way `python -m bot` does, in fresh interpreters with
+`-X importtime`, and fail when startup regresses:
+
+  * the median cumulative import time of bot.__main__ is over the budget, or
+  * a dependency that must load lazily (database driver, psutil, Pillow,
+    NumPy) is imported at startup.
+
+Usage: python scripts/check_import_time.py [--budget MS] [--runs N]
+The budget defaults to IMPORT_TIME_BUDGET_MS, or 1500 ms.
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_BUDGET_MS = int(os.environ.get("IMPORT_TIME_BUDGET_MS", "1500"))
+
+# Loaded on first use by the code that needs them; never at import time
+LAZY_MODULES = ("motor", "pymongo", "psutil", "PIL", "numpy")
+
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+def measure() -> dict:
+    """One cold import; returns {module: (cumulative_us, depth, top-level module it was imported under)}"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot.__main__"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    modules, nested = {}, []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        # One leading space at the top level, two more per nesting level
+        depth = (len(indent) - 1) // 2
+        if depth:
+            nested.append((name, int(cumulative_us), depth))
+            continue
+        # Nested imports are reported before the top-level import that caused them
+        for child, child_us, child_depth in nested:
+            modules[child] = (child_us, child_depth, name)
+        nested = []
+        modules[name] = (int(cumulative_us), 0, name)
+    if "bot.__main__" not in modules:
+        sys.exit(f"Importing bot.__main__ failed:\n{result.stderr[-2000:]}")
+    return modules
+
+def startup_us(modules: dict) -> int:
+    """`bot` and `bot.__main__` are both imported at the top level; together they are the startup cost"""
+    return sum(cumulative for name, (cumulative, depth, _) in modules.items()
+               if depth == 0 and name.split(".")[0] == "bot")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=int, default=DEFAULT_BUDGET_MS, help="cumulative budget in ms")
+    parser.add_argument("--runs", type=int, default=5, help="cold imports to take the median of")
+    args = parser.parse_args()
+
+    # The first run may compile bytecode; it is not a cold start a dyno would see
+    measure()
+    runs = [measure() for _ in range(max(1, args.runs))]
+    total_ms = statistics.median(startup_us(run) for run in runs) / 1000
+
+    last = runs[-1]
+    print(f"bot imports in {total_ms:.0f} ms (median of {len(runs)}, budget {args.budget} ms)")
+    print("Slowest imports made by the bot:")
+    top = sorted(
+        ((cumulative, name) for name, (cumulative, depth, parent) in last.items()
+         if depth == 1 and parent.split(".")[0] == "bot"),
+        reverse=True
+    )[:8]
+    for cumulative, name in top:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failed = False
+    eager = sorted({name.split(".")[0] for name in last} & set(LAZY_MODULES))
+    if eager:
+        print(f"FAIL: imported at startup but should load lazily: {', '.join(eager)}")
+        failed = True
+    if total_ms > args.budget:
+        print(f"FAIL: import time {total_ms:.0f} ms is over the {args.budget} ms budget")
+        failed = True
+
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import shutil
+import subprocess
+
+import pytest
+
+from bot.helper_funcs.ffmpeg import merge_videos
+
+pytestmark = pytest.mark.skipif(
+    not (shutil.which("ffmpeg") and shutil.which("ffprobe")), reason="ffmpeg is not installed"
+)
+
+def make_clip(path, size, x264_params):
+    subprocess.run([
+        "ffmpeg", "-v", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc=size={size}:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", "2", "-map", "0:v", "-map", "1:a",
+        "-c:v", "libx264", "-profile:v", "high", "-g", "30", "-pix_fmt", "yuv420p",
+        "-x264-params", x264_params,
+        "-c:a", "aac", "-ac", "2",
+        str(path)
+    ], check=True)
+    return str(path)
+
+def decode_counts(path):
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0", "-count_frames", "-count_packets",
+        "-show_entries", "stream=nb_read_frames,nb_read_packets", "-of", "json", path
+    ], capture_output=True, text=True)
+    stream = json.loads(result.stdout)['streams'][0]
+    return int(stream['nb_read_frames']), int(stream['nb_read_packets']), result.stderr.strip()
+
+@pytest.mark.parametrize("order", [("odd", "copy", "copy"), ("copy", "odd", "copy"), ("copy", "copy", "odd")])
+def test_merge_decodes_whichever_part_is_transcoded(tmp_path, order):
+    # The copied clips use CAVLC without 8x8 transforms, so the transcoded
+    # part's parameter sets cannot decode them
+    clips = {
+        "copy": lambda name: make_clip(tmp_path / name, "320x240", "cabac=0:8x8dct=0"),
+        "odd": lambda name: make_clip(tmp_path / name, "640x480", "cabac=1")
+    }
+    inputs = [clips[kind](f"in_{index}_{kind}.mp4") for index, kind in enumerate(order)]
+
+    output = asyncio.run(merge_videos(inputs, str(tmp_path)))
+
+    assert output is not None
+    frames, packets, errors = decode_counts(output)
+    assert frames == packets == 180
+    assert errors == ""
@@ -0,0 +1,21 @@
+import pytest
+
+from bot.helper_funcs.utils import parse_timestamp
+
+@pytest.mark.parametrize("value, expected", [
+    ("90", 90.0),
+    ("1:30", 90.0),
+    ("01:01:30.5", 3690.5),
+    (" 0 ", 0.0),
+    ("0:00", 0.0)
+])
+def test_parses_seconds_and_clock_times(value, expected):
+    assert parse_timestamp(value) == expected
+
+@pytest.mark.parametrize("value", [
+    "inf", "-inf", "nan", "1e309", "1:inf", "1e308:0",
+    "-5", "1:-30", "-1:30", "0:0:-1",
+    "", "abc", "1::30", "1:30:"
+])
+def test_rejects_non_finite_negative_and_malformed(value):
+    assert parse_timestamp(value) is None